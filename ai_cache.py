@@ -0,0 +1,144 @@
+"""Кэш ответов Гёдзена для повторяющихся вопросов (LRU + TTL)."""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+from config import AI_CACHE_MAX_ENTRIES, AI_CACHE_PATH, AI_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+_TRIGGER_RE = re.compile(r"г[ёе]д[зс][еэ]н\w*", re.IGNORECASE)
+_PUNCT_RE = re.compile(r"[^\w\s]|_")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Приводит вопрос к ключу кэша: регистр, «ё», пунктуация и слово-триггер
+    «гёдзен» (в любой форме) не влияют на ключ.
+    """
+    text = prompt.casefold().replace("ё", "е")
+    text = _TRIGGER_RE.sub(" ", text)
+    text = _PUNCT_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+class ResponseCache:
+    """
+    Ограниченный по размеру LRU-кэш с TTL на каждую запись.
+
+    Срок жизни хранится как абсолютное время (time.time()), поэтому записи
+    корректно переживают перезапуск, если кэш сохраняется на диск.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        path: Path | None = None,
+        *,
+        key_func: Callable[[str], str] = normalize_prompt,
+        name: str = "кэш ответов",
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        # key_func превращает запрос в ключ; пустой ключ — не кэшируем
+        self.key_func = key_func
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, prompt: str) -> str | None:
+        key = self.key_func(prompt)
+        entry = self._entries.get(key) if key else None
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, reply = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return reply
+
+    def put(self, prompt: str, reply: str) -> None:
+        key = self.key_func(prompt)
+        if not key or not reply:
+            return
+        self._entries[key] = (time.time() + self.ttl, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def flush(self) -> int:
+        """Очищает кэш (и файл на диске). Возвращает число удалённых записей."""
+        count = len(self._entries)
+        self._entries.clear()
+        self.save()
+        return count
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def load(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать {self.name} {self.path}: {e}")
+            return
+        now = time.time()
+        for key, expires_at, reply in raw.get("entries", []):
+            if expires_at > now:
+                self._entries[key] = (expires_at, reply)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        logger.info(f"{self.name.capitalize()}: загружено {len(self._entries)} записей")
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        now = time.time()
+        entries = [
+            [key, expires_at, reply]
+            for key, (expires_at, reply) in self._entries.items()
+            if expires_at > now
+        ]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(
+                json.dumps({"entries": entries}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            tmp_path.replace(self.path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить {self.name} {self.path}: {e}")
+
+
+response_cache = ResponseCache(
+    max_entries=AI_CACHE_MAX_ENTRIES,
+    ttl=AI_CACHE_TTL,
+    path=Path(__file__).resolve().parent / AI_CACHE_PATH if AI_CACHE_PATH else None,
+)
+response_cache.load()
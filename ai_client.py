@@ -1,40 +1,327 @@
+import json
 import logging
-from openai import OpenAI
-from dialogue_styles import gyozen_style
+import re
+import time
+from typing import AsyncIterator
+
+import deadline
+from ai_cache import response_cache
+from ai_providers import (
+    HEAVY, LIGHT, LatencyTracker, Provider, http_client, provider_pool,
+)
+from dialogue_styles import GYOZEN_PERSONA, gyozen_style
+from lore_retriever import lore_retriever
 from config import (
-    AI_PROVIDER, DEEPSEEK_API_KEY, OPENAI_API_KEY,
-    TEMPERATURE, MAX_TOKENS, FINE_TUNED_MODEL
+    TEMPERATURE, MAX_TOKENS,
+    AI_LORE_RETRIEVAL, AI_LORE_TOP_K,
+    AI_MODEL_ROUTING, AI_LIGHT_MAX_TOKENS, AI_LIGHT_MAX_CHARS, AI_LIGHT_MAX_LORE_SCORE,
+)
+
+FALLBACK_REPLY = "Извини, духи сегодня молчат. Попробуй ещё раз позже."
+
+SUMMARY_PROMPT = (
+    "Сожми этот диалог в несколько коротких фраз: о чём спрашивал собеседник "
+    "и что ему ответили. Только факты, без стилизации."
+)
+SUMMARY_MAX_TOKENS = 200
+
+VARIANTS_INSTRUCTION = (
+    "Напиши {count} разных вариантов. Ответь только JSON-массивом из {count} строк, "
+    "без пояснений и разметки."
+)
+VARIANT_MAX_TOKENS = 300          # на один вариант сверх обычного лимита (рассуждения reasoner)
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (кириллица — примерно 3 символа на токен)."""
+    return len(text) // 3 + 1
+
+
+class PromptTokenStats:
+    """Счётчики входных токенов по ответам провайдера (usage.prompt_tokens)."""
+
+    __slots__ = ("requests", "total", "max", "last")
+
+    def __init__(self):
+        self.requests = 0
+        self.total = 0
+        self.max = 0
+        self.last = 0
+
+    def record(self, usage, provider: Provider) -> None:
+        if usage is None:
+            return
+        prompt_tokens = usage.prompt_tokens or 0
+        self.requests += 1
+        self.total += prompt_tokens
+        self.max = max(self.max, prompt_tokens)
+        self.last = prompt_tokens
+        logging.info(
+            f"AI usage ({provider.name}): prompt_tokens={prompt_tokens}, "
+            f"completion_tokens={usage.completion_tokens or 0}"
+        )
+
+    @property
+    def average(self) -> float:
+        return self.total / self.requests if self.requests else 0.0
+
+
+prompt_token_stats = PromptTokenStats()
+
+
+# Вопросы, которые просят развёрнутого ответа, даже если они короткие
+_DEEP_QUESTION_RE = re.compile(
+    r"\b(почему|зачем|объясни|расскажи|опиши|сравни|посоветуй|что\s+такое|кто\s+так(ой|ая|ие)"
+    r"|как\s+(пройти|победить|убить|играть|собрать))",
+    re.IGNORECASE,
 )
 
-# Выбор провайдера/модели
-if AI_PROVIDER == "deepseek":
-    client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
-    model_name = "deepseek-reasoner"
-elif AI_PROVIDER == "openai":
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    model_name = FINE_TUNED_MODEL if FINE_TUNED_MODEL else "gpt-4o"
-else:
-    raise ValueError("AI_PROVIDER должен быть 'openai' или 'deepseek'.")
-
-async def get_response(prompt: str) -> str:
+
+def classify_prompt(prompt: str, history: list[dict] | None = None) -> tuple[str, str]:
+    """
+    Локальная оценка сложности вопроса: (уровень модели, причина).
+
+    На основную модель идут продолжения диалога, длинные и развёрнутые вопросы
+    и всё, что заметно совпадает с лором; остальное (приветствия, короткие
+    реплики) — на лёгкую модель.
+    """
+    if not AI_MODEL_ROUTING:
+        return HEAVY, "маршрутизация выключена"
+    if history:
+        return HEAVY, "диалог"
+    text = prompt.strip()
+    if len(text) > AI_LIGHT_MAX_CHARS:
+        return HEAVY, f"длинный ({len(text)} симв.)"
+    if _DEEP_QUESTION_RE.search(text):
+        return HEAVY, "развёрнутый вопрос"
+    lore_score = max(lore_retriever.scores(text), default=0.0)
+    if lore_score > AI_LIGHT_MAX_LORE_SCORE:
+        return HEAVY, f"лор (счёт {lore_score:.1f})"
+    return LIGHT, f"короткий ({len(text)} симв., лор {lore_score:.1f})"
+
+
+def _max_tokens_for(tier: str) -> int:
+    return AI_LIGHT_MAX_TOKENS if tier == LIGHT else MAX_TOKENS
+
+
+class RouteStats:
+    """Число запросов и задержки по уровням моделей — для подбора порогов маршрутизации."""
+
+    def __init__(self):
+        self.requests = {HEAVY: 0, LIGHT: 0}
+        # Полное время ответа (для потока — до последнего куска)
+        self.latency = {HEAVY: LatencyTracker(), LIGHT: LatencyTracker()}
+
+    def record(self, tier: str, reason: str, seconds: float, provider: Provider | None) -> None:
+        self.requests[tier] += 1
+        self.latency[tier].record(seconds)
+        logging.info(
+            f"AI маршрут {tier} ({reason}): {provider.model_for(tier) if provider else '—'}, "
+            f"{seconds:.2f} c"
+        )
+
+    def stats(self) -> dict:
+        return {
+            tier: {
+                "requests": self.requests[tier],
+                "p50": tracker.percentile(0.5),
+                "p95": tracker.percentile(0.95),
+            }
+            for tier, tracker in self.latency.items()
+        }
+
+
+route_stats = RouteStats()
+
+
+def build_system_prompt(prompt: str, history: list[dict] | None = None) -> str:
+    """
+    Ядро персоны + разделы лора, относящиеся к вопросу (и к последней реплике
+    собеседника в диалоге). Если ничего не нашлось — только ядро.
+    """
+    if not AI_LORE_RETRIEVAL:
+        return gyozen_style
+    query = prompt
+    if history:
+        last_user = next((m["content"] for m in reversed(history) if m["role"] == "user"), "")
+        query = f"{last_user} {prompt}"
+    sections = lore_retriever.select(query, AI_LORE_TOP_K)
+    if not sections:
+        return GYOZEN_PERSONA
+    lore = "\n\n".join(text for _, text in sections)
+    return f"{GYOZEN_PERSONA}\n=== ЛЕГЕНДЫ, О КОТОРЫХ ИДЁТ РЕЧЬ ===\n{lore}\n"
+
+
+def _messages_factory(prompt: str, history: list[dict] | None = None):
+    """Сообщения для конкретного провайдера: fine-tune модели идут без system-промпта."""
+    system_prompt = build_system_prompt(prompt, history)
+
+    def messages_for(provider: Provider) -> list[dict]:
+        messages = []
+        if provider.uses_system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    return messages_for
+
+
+async def get_response(
+    prompt: str,
+    *,
+    history: list[dict] | None = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Ответ Гёдзена целиком. history — предыдущие реплики диалога
+    (см. ai_memory); ответы с контекстом не кэшируются. DeadlineExceeded
+    (дедлайн апдейта) пробрасывается, а не превращается в FALLBACK_REPLY.
+    """
+    use_cache = use_cache and not history
+    if use_cache:
+        cached = response_cache.get(prompt)
+        if cached is not None:
+            return cached
+    tier, reason = classify_prompt(prompt, history)
+    started = time.monotonic()
+    try:
+        resp, provider = await provider_pool.complete(
+            _messages_factory(prompt, history),
+            tier=tier,
+            temperature=TEMPERATURE,
+            max_tokens=_max_tokens_for(tier),
+        )
+        prompt_token_stats.record(resp.usage, provider)
+        route_stats.record(tier, reason, time.monotonic() - started, provider)
+        reply = (resp.choices[0].message.content or "").strip()
+    except deadline.DeadlineExceeded:
+        # Обрыв по дедлайну апдейта — не сбой AI: его считает и объявляет DeadlineMiddleware
+        raise
+    except Exception as e:
+        logging.error(f"AI error: {e}")
+        return FALLBACK_REPLY
+    if use_cache:
+        response_cache.put(prompt, reply)
+    return reply
+
+
+async def stream_response(
+    prompt: str,
+    *,
+    history: list[dict] | None = None,
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Потоковый ответ: отдаёт куски текста по мере генерации.
+
+    Рассуждения deepseek-reasoner (reasoning_content) пропускаются — наружу идёт
+    только сам ответ. Если провайдер упал до первого куска, отдаётся FALLBACK_REPLY;
+    если посреди ответа — поток просто заканчивается на том, что успели получить.
+    Ответ из кэша отдаётся одним куском; в кэш попадают только целые ответы
+    без контекста диалога. DeadlineExceeded (дедлайн апдейта) пробрасывается.
+    """
+    use_cache = use_cache and not history
+    if use_cache:
+        cached = response_cache.get(prompt)
+        if cached is not None:
+            yield cached
+            return
+    produced = False
+    parts: list[str] = []
+    tier, reason = classify_prompt(prompt, history)
+    started = time.monotonic()
+    provider = None
     try:
-        # Если есть кастомная Fine-Tune — без system-промпта
-        if AI_PROVIDER == "openai" and FINE_TUNED_MODEL:
-            messages = [{"role": "user", "content": prompt}]
-        else:
-            messages = [
-                {"role": "system", "content": gyozen_style},
-                {"role": "user", "content": prompt},
-            ]
-
-        resp = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
+        stream = provider_pool.stream(
+            _messages_factory(prompt, history),
+            tier=tier,
             temperature=TEMPERATURE,
-            max_tokens=MAX_TOKENS,
-            stream=False,
+            max_tokens=_max_tokens_for(tier),
+            stream_options={"include_usage": True},
         )
-        return (resp.choices[0].message.content or "").strip()
+        async for chunk, provider in stream:
+            if chunk.usage:
+                prompt_token_stats.record(chunk.usage, provider)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                produced = True
+                parts.append(delta)
+                yield delta
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
-        logging.error(f"AI error ({AI_PROVIDER}): {e}")
-        return "Извини, духи сегодня молчат. Попробуй ещё раз позже."
+        logging.error(f"AI stream error: {e}")
+        parts.clear()
+    if produced:
+        route_stats.record(tier, reason, time.monotonic() - started, provider)
+    if not produced:
+        yield FALLBACK_REPLY
+    elif use_cache and parts:
+        response_cache.put(prompt, "".join(parts).strip())
+
+
+def _parse_variants(content: str) -> list[str]:
+    """Достаёт JSON-массив строк из ответа (модель может обернуть его в ```json)."""
+    start, end = content.find("["), content.rfind("]")
+    if start == -1 or end <= start:
+        return []
+    try:
+        items = json.loads(content[start:end + 1])
+    except ValueError:
+        return []
+    return [item.strip() for item in items if isinstance(item, str) and item.strip()]
+
+
+async def get_variants(prompt: str, count: int) -> list[str]:
+    """
+    Несколько разных ответов Гёдзена на одну просьбу за один запрос
+    (например, запас приветствий). Пустой список — если не вышло.
+    """
+    tier, reason = HEAVY, f"пачка из {count}"
+    started = time.monotonic()
+    try:
+        resp, provider = await provider_pool.complete(
+            _messages_factory(f"{prompt}\n\n{VARIANTS_INSTRUCTION.format(count=count)}"),
+            tier=tier,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS + VARIANT_MAX_TOKENS * count,
+        )
+        prompt_token_stats.record(resp.usage, provider)
+        route_stats.record(tier, reason, time.monotonic() - started, provider)
+        content = resp.choices[0].message.content or ""
+    except Exception as e:
+        logging.error(f"AI variants error: {e}")
+        return []
+    variants = _parse_variants(content)
+    if not variants:
+        logging.error(f"AI variants: не удалось разобрать ответ: {content[:200]!r}")
+    return variants
+
+
+async def summarize(text: str) -> str | None:
+    """Краткое изложение старой части диалога для ai_memory. None — если не вышло."""
+    try:
+        resp, provider = await provider_pool.complete(
+            lambda provider: [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": text},
+            ],
+            # Пересказ не требует персоны и рассуждений — лёгкая модель
+            tier=LIGHT,
+            temperature=0.3,
+            max_tokens=SUMMARY_MAX_TOKENS,
+        )
+        prompt_token_stats.record(resp.usage, provider)
+        return (resp.choices[0].message.content or "").strip() or None
+    except Exception as e:
+        logging.error(f"AI summarize error: {e}")
+        return None
+
+
+async def close():
+    """Закрывает общий пул соединений (вызывается при остановке бота)."""
+    await http_client.aclose()
@@ -0,0 +1,218 @@
+"""Память диалогов Гёдзена по цепочкам ответов (reply) с бюджетом токенов."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable
+
+from ai_client import estimate_tokens, summarize
+from ai_scheduler import SYSTEM_USER_ID, text_scheduler
+from config import (
+    AI_HISTORY_TOKEN_BUDGET,
+    AI_MEMORY_MAX_CHAINS_PER_CHAT,
+    AI_MEMORY_MAX_TURNS,
+    AI_MEMORY_SUMMARIZE_AFTER,
+    AI_MEMORY_SUMMARY_MAX_CHARS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _Turn:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        self.tokens = estimate_tokens(content)
+
+
+class _Chain:
+    """Одна цепочка диалога: кольцевой буфер реплик + сжатое резюме старых."""
+
+    __slots__ = ("turns", "summary", "summarizing")
+
+    def __init__(self, max_turns: int):
+        self.turns: deque[_Turn] = deque(maxlen=max_turns)
+        self.summary = ""
+        self.summarizing = False
+
+
+class _ChatMemory:
+    """Память одного чата: LRU цепочек и индекс «сообщение бота → цепочка»."""
+
+    __slots__ = ("chains", "message_index")
+
+    def __init__(self):
+        self.chains: OrderedDict[int, _Chain] = OrderedDict()
+        self.message_index: OrderedDict[int, int] = OrderedDict()
+
+
+class ConversationMemory:
+    """
+    Хранит контекст диалогов по цепочкам: сообщение, не являющееся ответом
+    на Гёдзена, начинает новую цепочку; ответ (reply) на его сообщение её продолжает.
+
+    Память на чат ограничена: не больше max_chains цепочек (LRU), в каждой —
+    не больше max_turns реплик. Когда реплик набирается summarize_after,
+    старая половина в фоне сворачивается в короткое резюме.
+    """
+
+    def __init__(
+        self,
+        summarizer: Callable[[str], Awaitable[str | None]],
+        *,
+        max_turns: int = AI_MEMORY_MAX_TURNS,
+        max_chains: int = AI_MEMORY_MAX_CHAINS_PER_CHAT,
+        summarize_after: int = AI_MEMORY_SUMMARIZE_AFTER,
+        summary_max_chars: int = AI_MEMORY_SUMMARY_MAX_CHARS,
+    ):
+        self._summarizer = summarizer
+        self.max_turns = max_turns
+        self.max_chains = max_chains
+        self.summarize_after = summarize_after
+        self.summary_max_chars = summary_max_chars
+        self._chats: dict[int, _ChatMemory] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def resolve_chain(self, chat_id: int, reply_to_message_id: int | None) -> int | None:
+        """Цепочка, которую продолжает ответ на сообщение reply_to_message_id (или None)."""
+        chat = self._chats.get(chat_id)
+        if chat is None or reply_to_message_id is None:
+            return None
+        root_id = chat.message_index.get(reply_to_message_id)
+        if root_id is None or root_id not in chat.chains:
+            return None
+        chat.chains.move_to_end(root_id)
+        return root_id
+
+    def build_history(
+        self,
+        chat_id: int,
+        root_id: int | None,
+        budget: int = AI_HISTORY_TOKEN_BUDGET,
+    ) -> list[dict]:
+        """
+        Сообщения контекста для ai_client в пределах budget токенов:
+        резюме (если есть) и самые свежие реплики, от новых к старым.
+        """
+        chat = self._chats.get(chat_id)
+        chain = chat.chains.get(root_id) if chat and root_id is not None else None
+        if chain is None:
+            return []
+
+        history: list[dict] = []
+        if chain.summary:
+            summary_tokens = estimate_tokens(chain.summary)
+            if summary_tokens <= budget:
+                budget -= summary_tokens
+                history.append({
+                    "role": "system",
+                    "content": f"Ранее в этом разговоре: {chain.summary}",
+                })
+
+        recent: list[dict] = []
+        for turn in reversed(chain.turns):
+            if turn.tokens > budget:
+                break
+            budget -= turn.tokens
+            recent.append({"role": turn.role, "content": turn.content})
+        recent.reverse()
+        # Начинаем с реплики пользователя, чтобы не оставлять «висящий» ответ
+        if recent and recent[0]["role"] == "assistant":
+            recent.pop(0)
+
+        history.extend(recent)
+        return history
+
+    def record(
+        self,
+        chat_id: int,
+        root_id: int | None,
+        user_text: str,
+        reply_text: str,
+        bot_message_ids: list[int],
+    ) -> int:
+        """
+        Запоминает обмен репликами. Если root_id не задан — начинает новую
+        цепочку с корнем в первом сообщении бота. Возвращает id цепочки.
+        """
+        chat = self._chats.setdefault(chat_id, _ChatMemory())
+        if root_id is None or root_id not in chat.chains:
+            root_id = bot_message_ids[0]
+            chat.chains[root_id] = _Chain(self.max_turns)
+        chain = chat.chains[root_id]
+        chat.chains.move_to_end(root_id)
+
+        chain.turns.append(_Turn("user", user_text))
+        chain.turns.append(_Turn("assistant", reply_text))
+        for message_id in bot_message_ids:
+            chat.message_index[message_id] = root_id
+            chat.message_index.move_to_end(message_id)
+
+        self._evict(chat)
+        if len(chain.turns) >= self.summarize_after and not chain.summarizing:
+            self._schedule_summary(chain)
+        return root_id
+
+    def stats(self) -> dict:
+        chains = sum(len(chat.chains) for chat in self._chats.values())
+        turns = sum(
+            len(chain.turns)
+            for chat in self._chats.values()
+            for chain in chat.chains.values()
+        )
+        return {"chats": len(self._chats), "chains": chains, "turns": turns}
+
+    def _evict(self, chat: _ChatMemory) -> None:
+        while len(chat.chains) > self.max_chains:
+            chat.chains.popitem(last=False)
+        # На каждую цепочку приходится не больше max_turns сообщений бота
+        max_index = self.max_chains * self.max_turns
+        while len(chat.message_index) > max_index:
+            chat.message_index.popitem(last=False)
+
+    def _schedule_summary(self, chain: _Chain) -> None:
+        chain.summarizing = True
+        task = asyncio.create_task(self._summarize_chain(chain))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize_chain(self, chain: _Chain) -> None:
+        """Сворачивает старую половину реплик в резюме (в фоне)."""
+        try:
+            count = len(chain.turns) // 2
+            count -= count % 2  # сворачиваем только целые пары «вопрос-ответ»
+            old_turns = list(chain.turns)[:count]
+            if not old_turns:
+                return
+            lines = []
+            if chain.summary:
+                lines.append(f"Резюме ранее: {chain.summary}")
+            for turn in old_turns:
+                speaker = "Собеседник" if turn.role == "user" else "Гёдзен"
+                lines.append(f"{speaker}: {turn.content}")
+
+            summary = await self._summarizer("\n".join(lines))
+            if not summary:
+                return
+            # Пока шло сжатие, буфер мог сдвинуться — удаляем только то, что сжали
+            for turn in old_turns:
+                if chain.turns and chain.turns[0] is turn:
+                    chain.turns.popleft()
+            chain.summary = summary[: self.summary_max_chars]
+            logger.debug(f"Цепочка диалога сжата: {count} реплик → резюме")
+        except Exception as e:
+            logger.error(f"Ошибка сжатия диалога: {e}")
+        finally:
+            chain.summarizing = False
+
+
+async def _scheduled_summarize(text: str) -> str | None:
+    # Фоновое сжатие стоит в общей очереди AI-запросов наравне с пользователями
+    return await text_scheduler.run(SYSTEM_USER_ID, lambda: summarize(text))
+
+
+conversation_memory = ConversationMemory(_scheduled_summarize)
@@ -0,0 +1,375 @@
+"""Пул OpenAI-совместимых AI-провайдеров: хеджирование запросов, выключатели, задержки."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from functools import partial
+from typing import Any, AsyncIterator, Callable
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+import deadline
+from circuit_breaker import CircuitBreaker
+from config import (
+    AI_BREAKER_MIN_CALLS, AI_BREAKER_RECOVERY, AI_BREAKER_WINDOW,
+    AI_HEDGE_AFTER, AI_HEDGE_MIN, AI_KEEPALIVE_CONNECTIONS, AI_LATENCY_WINDOW,
+    AI_MAX_CONNECTIONS, AI_PROVIDER, AI_REQUEST_TIMEOUT,
+    DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, DEEPSEEK_LIGHT_MODEL, FINE_TUNED_MODEL,
+    OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_LIGHT_MODEL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Общий пул HTTP-соединений для всех AI-клиентов (текст и картинки).
+# Соединения переиспользуются, запросы не блокируют event loop.
+http_client = DefaultAsyncHttpxClient(
+    limits=httpx.Limits(
+        max_connections=AI_MAX_CONNECTIONS,
+        max_keepalive_connections=AI_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=60,
+    ),
+    timeout=httpx.Timeout(AI_REQUEST_TIMEOUT, connect=10),
+)
+
+
+def make_client(api_key: str, base_url: str | None = None, max_retries: int = 2) -> AsyncOpenAI:
+    """Создаёт асинхронный OpenAI-совместимый клиент поверх общего пула соединений."""
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=http_client,
+        max_retries=max_retries,
+    )
+
+
+class NoProviderAvailable(RuntimeError):
+    """Все провайдеры выключены выключателями или не настроены."""
+
+
+class LatencyTracker:
+    """Скользящее окно задержек с перцентилями."""
+
+    __slots__ = ("_samples",)
+
+    def __init__(self, window: int = AI_LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+        return ordered[index]
+
+
+# Уровни моделей: основная (heavy) и быстрая дешёвая (light)
+HEAVY = "heavy"
+LIGHT = "light"
+
+
+def latency_key(kind: str, tier: str = HEAVY) -> str:
+    """Ключ статистики задержек: "complete", "stream", "complete:light", ..."""
+    return kind if tier == HEAVY else f"{kind}:{tier}"
+
+
+class Provider:
+    """Один OpenAI-совместимый провайдер со своим выключателем и статистикой задержек."""
+
+    def __init__(
+        self,
+        name: str,
+        client: AsyncOpenAI,
+        model: str,
+        *,
+        light_model: str | None = None,
+        uses_system_prompt: bool = True,
+    ):
+        self.name = name
+        self.client = client
+        self.model = model
+        # Без лёгкой модели лёгкие запросы идут на основную
+        self.light_model = light_model or model
+        self.uses_system_prompt = uses_system_prompt
+        self.breaker = CircuitBreaker(
+            f"ai:{name}",
+            window=AI_BREAKER_WINDOW,
+            min_calls=AI_BREAKER_MIN_CALLS,
+            recovery_time=AI_BREAKER_RECOVERY,
+        )
+        # Для обычных запросов — полное время ответа, для потоковых — время до первого куска;
+        # у лёгкой модели своя статистика, иначе она занижала бы задержку хеджирования основной
+        self.latency = {
+            latency_key(kind, tier): LatencyTracker()
+            for tier in (HEAVY, LIGHT)
+            for kind in ("complete", "stream")
+        }
+
+    def model_for(self, tier: str) -> str:
+        return self.light_model if tier == LIGHT else self.model
+
+    def stats(self) -> dict:
+        result: dict[str, Any] = {"state": self.breaker.state}
+        for key, tracker in self.latency.items():
+            result[key] = {
+                "samples": len(tracker),
+                "p50": tracker.percentile(0.5),
+                "p95": tracker.percentile(0.95),
+            }
+        return result
+
+
+MessagesFactory = Callable[[Provider], list[dict]]
+
+# Сколько замеров нужно, чтобы доверять перцентилям провайдера
+MIN_LATENCY_SAMPLES = 5
+# Во сколько раз основной должен быть медленнее запасного, чтобы поменять их местами
+REROUTE_FACTOR = 1.5
+
+
+class ProviderPool:
+    """
+    Маршрутизация между провайдерами.
+
+    Запрос уходит первому по маршруту; если он не ответил (для потока — не прислал
+    первый кусок) за время хеджирования, тот же запрос дублируется следующему,
+    и побеждает первый ответивший. Ошибка провайдера сразу переводит запрос
+    на следующего. Выключатель убирает падающего провайдера из маршрута.
+    """
+
+    def __init__(self, providers: list[Provider]):
+        self.providers = providers
+        # Учёт итогов отменённых попыток (закрытие потоков) — держим ссылки до конца
+        self._settling: set[asyncio.Task] = set()
+
+    def route(self, key: str = "complete") -> list[Provider]:
+        """Доступные провайдеры в порядке попыток (key — см. latency_key)."""
+        available = [p for p in self.providers if p.breaker.state != CircuitBreaker.OPEN]
+        if len(available) >= 2:
+            first, second = available[0], available[1]
+            first_p50 = first.latency[key].percentile(0.5)
+            second_p50 = second.latency[key].percentile(0.5)
+            if (
+                len(first.latency[key]) >= MIN_LATENCY_SAMPLES
+                and len(second.latency[key]) >= MIN_LATENCY_SAMPLES
+                and first_p50 > second_p50 * REROUTE_FACTOR
+            ):
+                available[0], available[1] = second, first
+        return available
+
+    def hedge_delay(self, provider: Provider, key: str) -> float:
+        """Через сколько секунд дублировать запрос: p95 провайдера в пределах [AI_HEDGE_MIN, AI_HEDGE_AFTER]."""
+        tracker = provider.latency[key]
+        if len(tracker) < MIN_LATENCY_SAMPLES:
+            return AI_HEDGE_AFTER
+        return min(AI_HEDGE_AFTER, max(AI_HEDGE_MIN, tracker.percentile(0.95)))
+
+    async def complete(
+        self,
+        messages_for: MessagesFactory,
+        *,
+        tier: str = HEAVY,
+        **params,
+    ) -> tuple[Any, Provider]:
+        """Обычный (не потоковый) запрос. Возвращает (ответ, провайдер)."""
+        key = latency_key("complete", tier)
+
+        async def attempt(provider: Provider):
+            started = time.monotonic()
+            async with deadline.limit(f"AI {provider.name}"):
+                response = await provider.client.chat.completions.create(
+                    model=provider.model_for(tier),
+                    messages=messages_for(provider),
+                    stream=False,
+                    **params,
+                )
+            provider.latency[key].record(time.monotonic() - started)
+            return response
+
+        return await self._hedged(key, attempt)
+
+    async def stream(
+        self,
+        messages_for: MessagesFactory,
+        *,
+        tier: str = HEAVY,
+        **params,
+    ) -> AsyncIterator[tuple[Any, Provider]]:
+        """
+        Потоковый запрос: хеджирование по первому куску. После того как один
+        провайдер прислал первый кусок, остальные отменяются и поток идёт от него.
+        Отдаёт пары (кусок, провайдер).
+        """
+        key = latency_key("stream", tier)
+
+        async def attempt(provider: Provider):
+            started = time.monotonic()
+            # Дедлайн апдейта ограничивает ожидание первого куска; дальше поток идёт как есть
+            async with deadline.limit(f"AI {provider.name}"):
+                stream = await provider.client.chat.completions.create(
+                    model=provider.model_for(tier),
+                    messages=messages_for(provider),
+                    stream=True,
+                    **params,
+                )
+                try:
+                    first = await stream.__anext__()
+                except BaseException:
+                    await stream.close()
+                    raise
+            provider.latency[key].record(time.monotonic() - started)
+            return stream, first
+
+        async def discard(result) -> None:
+            await result[0].close()
+
+        (stream, first), provider = await self._hedged(
+            key, attempt, record_success=False, discard=discard
+        )
+        try:
+            yield first, provider
+            async for chunk in stream:
+                yield chunk, provider
+        except Exception:
+            provider.breaker.record_failure()
+            raise
+        else:
+            provider.breaker.record_success()
+        finally:
+            await stream.close()
+
+    async def _hedged(self, key: str, attempt, *, record_success: bool = True, discard=None):
+        """
+        Попытка на первом доступном провайдере, при задержке — дубль на следующем.
+        Возвращает (результат, провайдер) первой удачной. Проигравшие попытки
+        отменяются; у завершившихся учитывается настоящий итог на выключателе,
+        а их результат освобождается через discard (например, закрыть поток).
+        """
+        deadline.check(f"AI {key}")
+        candidates = self.route(key)
+        if not candidates:
+            raise NoProviderAvailable("все AI-провайдеры недоступны")
+
+        pending: dict[asyncio.Task, Provider] = {}
+        queue = list(candidates)
+        last_error: BaseException | None = None
+
+        def launch() -> bool:
+            while queue:
+                provider = queue.pop(0)
+                if provider.breaker.allow():
+                    pending[asyncio.create_task(attempt(provider))] = provider
+                    return True
+            return False
+
+        if not launch():
+            raise NoProviderAvailable("все AI-провайдеры недоступны")
+        try:
+            while pending:
+                leader = next(iter(pending.values()))
+                timeout = self.hedge_delay(leader, key) if queue else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.info(
+                        f"AI {leader.name} не ответил за {timeout:.1f} c, дублируем запрос"
+                    )
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if record_success:
+                            provider.breaker.record_success()
+                        return task.result(), provider
+                    last_error = error
+                    if isinstance(error, deadline.DeadlineExceeded):
+                        # Время вышло у апдейта, а не у провайдера — дублировать некуда
+                        provider.breaker.release_probe()
+                        raise error
+                    provider.breaker.record_failure()
+                    logger.warning(f"AI {provider.name} ошибка: {error}")
+                    if not pending:
+                        launch()
+        finally:
+            for task, provider in pending.items():
+                if task.done():
+                    # Завершилась вместе с победителем: в done, но до неё цикл не дошёл
+                    await self._settle_loser(task, provider, discard)
+                else:
+                    task.cancel()
+                    # Отмена доходит не сразу — итог учитываем, когда задача завершится
+                    task.add_done_callback(partial(self._settle_later, provider=provider, discard=discard))
+        raise last_error or NoProviderAvailable("все AI-провайдеры недоступны")
+
+    async def _settle_loser(self, task: asyncio.Task, provider: Provider, discard) -> None:
+        if task.cancelled():
+            provider.breaker.release_probe()
+            return
+        error = task.exception()
+        if error is None:
+            provider.breaker.record_success()
+            if discard is not None:
+                try:
+                    await discard(task.result())
+                except Exception as e:
+                    logger.debug(f"AI {provider.name}: не удалось закрыть лишний ответ: {e}")
+        elif isinstance(error, deadline.DeadlineExceeded):
+            provider.breaker.release_probe()
+        else:
+            provider.breaker.record_failure()
+
+    def _settle_later(self, task: asyncio.Task, *, provider: Provider, discard) -> None:
+        settle = asyncio.create_task(self._settle_loser(task, provider, discard))
+        self._settling.add(settle)
+        settle.add_done_callback(self._settling.discard)
+
+    def stats(self) -> dict:
+        return {provider.name: provider.stats() for provider in self.providers}
+
+
+def _build_providers() -> list[Provider]:
+    """Основной провайдер — AI_PROVIDER, второй добавляется, если для него есть ключ."""
+    configured = {
+        "openai": bool(OPENAI_API_KEY) or AI_PROVIDER == "openai",
+        "deepseek": bool(DEEPSEEK_API_KEY) or AI_PROVIDER == "deepseek",
+    }
+    if not configured.get(AI_PROVIDER):
+        raise ValueError("AI_PROVIDER должен быть 'openai' или 'deepseek'.")
+    # С запасным провайдером повторы внутри SDK не нужны — пул сам переключится
+    max_retries = 0 if all(configured.values()) else 2
+
+    available: dict[str, Provider] = {}
+    if configured["openai"]:
+        available["openai"] = Provider(
+            "openai",
+            make_client(OPENAI_API_KEY, OPENAI_BASE_URL, max_retries),
+            FINE_TUNED_MODEL if FINE_TUNED_MODEL else "gpt-4o",
+            # Fine-Tune модель знает персону сама, её не подменяем лёгкой
+            light_model=None if FINE_TUNED_MODEL else OPENAI_LIGHT_MODEL,
+            # Если есть кастомная Fine-Tune — без system-промпта
+            uses_system_prompt=not FINE_TUNED_MODEL,
+        )
+    if configured["deepseek"]:
+        available["deepseek"] = Provider(
+            "deepseek",
+            make_client(DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, max_retries),
+            "deepseek-reasoner",
+            light_model=DEEPSEEK_LIGHT_MODEL,
+        )
+    primary = available.pop(AI_PROVIDER)
+    return [primary, *available.values()]
+
+
+provider_pool = ProviderPool(_build_providers())
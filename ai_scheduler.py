@@ -0,0 +1,165 @@
+"""Планировщик AI-запросов: общий лимит, справедливая очередь по пользователям, склейка дублей."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+import deadline
+from config import AI_MAX_CONCURRENT_IMAGES, AI_MAX_CONCURRENT_REQUESTS
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# user_id для фоновых задач бота (приветствия, сжатие диалогов)
+SYSTEM_USER_ID = 0
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class _Ticket:
+    __slots__ = ("future", "on_position", "position")
+
+    def __init__(self, future: asyncio.Future, on_position: PositionCallback | None):
+        self.future = future
+        self.on_position = on_position
+        self.position = 0
+
+
+class AIScheduler:
+    """
+    Ограничивает число одновременных вызовов к провайдеру.
+
+    Ожидающие стоят в очередях по пользователям, слоты раздаются по кругу
+    (round-robin), поэтому один активный пользователь не занимает всю очередь.
+    Вызовы с одинаковым key склеиваются: к провайдеру уходит один запрос,
+    результат получают все. Общий запрос идёт отдельной задачей (SingleFlight):
+    отмена или дедлайн одного пользователя не роняют запрос остальным.
+    """
+
+    def __init__(self, name: str, max_concurrency: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._active = 0
+        self._queues: OrderedDict[int, deque[_Ticket]] = OrderedDict()
+        self._flight: SingleFlight = SingleFlight()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def run(
+        self,
+        user_id: int,
+        factory: Callable[[], Awaitable[T]],
+        *,
+        key: Hashable | None = None,
+        on_position: PositionCallback | None = None,
+    ) -> T:
+        """
+        Выполняет factory() в пределах лимита. on_position(n) вызывается, когда
+        меняется место в очереди (n — 1-based). key — ключ склейки одинаковых запросов.
+        """
+        if key is None:
+            return await self._run_slot(user_id, factory, on_position)
+        # Общий запрос — без дедлайна того, кто его начал; каждый ждёт в пределах своего
+        async with deadline.limit(f"AI {self.name}"):
+            result, shared = await self._flight.do(
+                key, lambda: self._run_slot(user_id, factory, on_position)
+            )
+        if shared:
+            logger.debug(f"[{self.name}] запрос пользователя {user_id} склеен с уже идущим")
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "coalesced": self._flight.shared,
+        }
+
+    async def _run_slot(
+        self,
+        user_id: int,
+        factory: Callable[[], Awaitable[T]],
+        on_position: PositionCallback | None,
+    ) -> T:
+        await self._acquire(user_id, on_position)
+        try:
+            return await factory()
+        finally:
+            self._release()
+
+    async def _acquire(self, user_id: int, on_position: PositionCallback | None) -> None:
+        if self._active < self.max_concurrency and not self._queues:
+            self._active += 1
+            return
+
+        ticket = _Ticket(asyncio.get_running_loop().create_future(), on_position)
+        self._queues.setdefault(user_id, deque()).append(ticket)
+        self._notify_positions()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # Слот уже выдан, но ждущий отменён — возвращаем слот
+                self._release()
+            else:
+                self._drop(user_id, ticket)
+            raise
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._active < self.max_concurrency and self._queues:
+            user_id, queue = self._queues.popitem(last=False)
+            ticket = queue.popleft()
+            # Пользователь уходит в конец круга, если у него ещё есть запросы
+            if queue:
+                self._queues[user_id] = queue
+            if ticket.future.done():
+                continue
+            self._active += 1
+            ticket.future.set_result(None)
+        self._notify_positions()
+
+    def _drop(self, user_id: int, ticket: _Ticket) -> None:
+        queue = self._queues.get(user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[user_id]
+        self._notify_positions()
+
+    def _notify_positions(self) -> None:
+        """Пересчитывает места в очереди в порядке раздачи слотов и сообщает об изменениях."""
+        queues = list(self._queues.values())
+        depth = max((len(queue) for queue in queues), default=0)
+        position = 0
+        for level in range(depth):
+            for queue in queues:
+                if level >= len(queue):
+                    continue
+                position += 1
+                ticket = queue[level]
+                if ticket.position != position:
+                    ticket.position = position
+                    if ticket.on_position:
+                        self._spawn(ticket.on_position(position))
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_callback_done)
+
+    def _on_callback_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.debug(f"[{self.name}] ошибка обратного вызова очереди: {task.exception()}")
+
+
+text_scheduler = AIScheduler("text", AI_MAX_CONCURRENT_REQUESTS)
+image_scheduler = AIScheduler("image", AI_MAX_CONCURRENT_IMAGES)
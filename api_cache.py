@@ -0,0 +1,248 @@
+"""Кэш ответов GET-запросов к miniapp_api: TTL по эндпоинтам, ревалидация ETag, LRU."""
+
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Mapping, Optional
+from urllib.parse import urlencode
+
+from multidict import CIMultiDict, CIMultiDictProxy
+
+import json_codec
+from config import API_CACHE_MAX_BYTES, API_CACHE_MAX_ENTRIES, API_CACHE_MAX_STALE
+
+logger = logging.getLogger(__name__)
+
+# Какие GET кэшируются и сколько секунд ответ считается свежим без запроса.
+# После TTL ответ перепроверяется по ETag / Last-Modified (304 — берём из кэша).
+CACHE_POLICIES: list[tuple[re.Pattern, float]] = [
+    (re.compile(r"^/api/user_info/\d+$"), 30),
+    (re.compile(r"^/api/notifications/user/\d+$"), 300),
+    (re.compile(r"^/api/notifications/[\w-]+$"), 300),
+    (re.compile(r"^/api/snippets/(all|my|\d+)$"), 300),
+    (re.compile(r"^/api/builds\.get/\d+$"), 120),
+]
+
+# Заголовки, которые храним вместе с телом
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+_NOT_DECODED = object()
+
+
+def policy_ttl(path: str) -> Optional[float]:
+    """TTL для пути или None, если путь не кэшируется."""
+    for pattern, ttl in CACHE_POLICIES:
+        if pattern.match(path):
+            return ttl
+    return None
+
+
+def cache_key(path: str, params: Optional[Mapping[str, Any]], use_bot_token: bool) -> str:
+    query = urlencode(sorted((str(k), str(v)) for k, v in params.items())) if params else ""
+    # Ответ с токеном бота может отличаться от публичного
+    return f"{path}?{query}#{'bot' if use_bot_token else 'anon'}"
+
+
+class CachedResponse:
+    """Буферизованный ответ с тем же интерфейсом, что нужен обработчикам от aiohttp.ClientResponse."""
+
+    __slots__ = ("status", "reason", "headers", "body", "from_cache", "stale", "_decoded")
+
+    def __init__(
+        self,
+        status: int,
+        reason: str,
+        headers: CIMultiDictProxy,
+        body: bytes,
+        from_cache: bool,
+        stale: bool = False,
+    ):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.from_cache = from_cache
+        # Просроченный ответ, отданный вместо ошибки, пока API недоступен
+        self.stale = stale
+        self._decoded: Any = _NOT_DECODED
+
+    @classmethod
+    def from_json(cls, status: int, data: Any) -> "CachedResponse":
+        """Ответ, собранный из уже разобранных данных (например, из пакетного запроса)."""
+        response = cls(
+            status,
+            "",
+            CIMultiDictProxy(CIMultiDict({"Content-Type": "application/json"})),
+            json_codec.dumps(data).encode("utf-8"),
+            from_cache=False,
+        )
+        response._decoded = data
+        return response
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def content_type(self) -> str:
+        return (self.headers.get("Content-Type") or "application/octet-stream").split(";")[0].strip()
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: str | None = None) -> str:
+        return self.body.decode(encoding or "utf-8", errors="replace")
+
+    async def json(self, *, loads=json_codec.loads, **_: Any) -> Any:
+        # Разбираем один раз: склеенные запросы делят один объект ответа
+        if self._decoded is _NOT_DECODED:
+            self._decoded = loads(self.body) if self.body else None
+        return self._decoded
+
+    def release(self) -> None:
+        """Соединение уже возвращено в пул при буферизации."""
+
+
+class _Entry:
+    __slots__ = ("status", "reason", "headers", "body", "expires_at")
+
+    def __init__(self, response: CachedResponse, expires_at: float):
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.body = response.body
+        self.expires_at = expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    @property
+    def validators(self) -> dict[str, str]:
+        headers = {}
+        if etag := self.headers.get("ETag"):
+            headers["If-None-Match"] = etag
+        if last_modified := self.headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def response(self, stale: bool = False) -> CachedResponse:
+        return CachedResponse(self.status, self.reason, self.headers, self.body, from_cache=True, stale=stale)
+
+
+class ApiResponseCache:
+    """
+    LRU по числу записей и суммарному размеру тел. Просроченные записи
+    не удаляются сразу: по ETag/Last-Modified они перепроверяются условным
+    запросом, а пока API недоступен, отдаются как устаревшие (не дольше
+    max_stale секунд после истечения TTL).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, max_stale: float = 0.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_served = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: str) -> tuple[Optional[CachedResponse], dict[str, str]]:
+        """
+        (свежий ответ, {}) — можно не ходить в API;
+        (None, заголовки условного запроса) — нужен запрос (заголовки могут быть пустыми).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, {}
+        self._entries.move_to_end(key)
+        now = time.time()
+        if entry.expires_at > now:
+            self.hits += 1
+            return entry.response(), {}
+        if now - entry.expires_at > self.max_stale:
+            self._remove(key)
+            return None, {}
+        return None, entry.validators
+
+    def stale(self, key: str) -> Optional[CachedResponse]:
+        """Запасной ответ при недоступности API: запись, даже просроченная (в пределах max_stale)."""
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry.expires_at > self.max_stale:
+            return None
+        self.stale_served += 1
+        return entry.response(stale=time.time() >= entry.expires_at)
+
+    def not_modified(self, key: str, ttl: float) -> Optional[CachedResponse]:
+        """Сервер ответил 304: продлеваем запись и отдаём её."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry.expires_at = time.time() + ttl
+        self.revalidated += 1
+        return entry.response()
+
+    def store(self, key: str, response: CachedResponse, ttl: float) -> None:
+        """Полный ответ API (промах кэша); сохраняются только 200."""
+        self.misses += 1
+        if response.status != 200 or len(response.body) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = _Entry(response, time.time() + ttl)
+        self._bytes += len(response.body)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, *prefixes: str) -> int:
+        """
+        Удаляет записи, путь которых начинается с любого из prefixes.
+        Вызывается после записей в API (создание сниппета, переключение уведомлений...).
+        """
+        doomed = [key for key in self._entries if key.startswith(prefixes)]
+        for key in doomed:
+            self._remove(key)
+        if doomed:
+            logger.debug(f"Кэш API: сброшено {len(doomed)} записей по {prefixes}")
+        return len(doomed)
+
+    def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+        return count
+
+    def stats(self) -> dict:
+        total = self.hits + self.revalidated + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale": self.stale_served,
+            "hit_rate": (self.hits + self.revalidated) / total if total else 0.0,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+
+def kept_headers(headers: Mapping[str, str]) -> CIMultiDictProxy:
+    return CIMultiDictProxy(CIMultiDict((name, headers[name]) for name in _KEPT_HEADERS if name in headers))
+
+
+api_cache = ApiResponseCache(API_CACHE_MAX_ENTRIES, API_CACHE_MAX_BYTES, API_CACHE_MAX_STALE)
@@ -2,18 +2,197 @@
 
 from __future__ import annotations
 
-from typing import Any, Iterable, Mapping, MutableMapping, Optional
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import time
+import uuid
+from typing import Any, Iterable, Mapping, MutableMapping, Optional, Union
 
 import aiohttp
+import yarl
 
-from config import API_BASE_URL, BOT_TOKEN
+import deadline as update_deadline
+import json_codec
+from api_cache import CachedResponse, api_cache, cache_key, kept_headers, policy_ttl
+from api_replica import replica
+from circuit_breaker import CircuitBreaker
+from config import (
+    API_BASE_URL, API_DNS_CACHE_TTL, API_KEEPALIVE_TIMEOUT, API_MAX_CONNECTIONS, API_TRANSPORT, BOT_TOKEN,
+    API_BREAKER_FAILURE_RATIO, API_BREAKER_MIN_CALLS, API_BREAKER_RECOVERY, API_BREAKER_WINDOW,
+    API_RETRY_ATTEMPTS, API_RETRY_BACKOFF, API_RETRY_BACKOFF_MAX, API_RETRY_DEADLINE,
+    API_USER_BATCH_MAX, API_USER_BATCH_PATH, API_USER_BATCH_WINDOW,
+)
+from metrics import registry
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5)
 
+# Методы, которые можно безопасно повторить без ключа идемпотентности
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT"})
+# Ответы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Ответы, которые выключатель считает сбоем API (наряду с обрывами и таймаутами)
+BREAKER_FAILURE_STATUSES = frozenset({500, 502, 503, 504})
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+IdempotencyKey = Optional[Union[str, bool]]
+
+# Метрики по эндпоинтам (каждая попытка отдельно; задержка — до получения заголовков ответа)
+REQUEST_SECONDS = registry.histogram(
+    "gyozenbot_api_request_seconds", "Задержка запросов к miniapp_api", ("method", "endpoint")
+)
+REQUESTS_TOTAL = registry.counter(
+    "gyozenbot_api_requests_total",
+    "Запросы к miniapp_api по статусу ответа (timeout / error — ответа не было)",
+    ("method", "endpoint", "status"),
+)
+TIMEOUTS_TOTAL = registry.counter(
+    "gyozenbot_api_timeouts_total", "Таймауты запросов к miniapp_api", ("method", "endpoint")
+)
+RETRIES_TOTAL = registry.counter(
+    "gyozenbot_api_retries_total", "Повторные попытки запросов к miniapp_api", ("method", "endpoint")
+)
+IN_FLIGHT = registry.gauge(
+    "gyozenbot_api_in_flight", "Запросы к miniapp_api, ожидающие ответа", ("method", "endpoint")
+)
+REJECTED_TOTAL = registry.counter(
+    "gyozenbot_api_rejected_total", "Запросы, отклонённые открытым выключателем", ("group",)
+)
+STALE_TOTAL = registry.counter(
+    "gyozenbot_api_stale_total", "GET, отданные из кэша устаревшими из-за сбоя API", ("endpoint",)
+)
+
+_ID_SEGMENT = re.compile(r"/-?\d+(?=/|$)")
+
+
+def endpoint_label(path: str) -> str:
+    """Шаблон пути для меток: /api/user_info/123 -> /api/user_info/{id}."""
+    return _ID_SEGMENT.sub("/{id}", path.split("?", 1)[0])
+
+
+class ApiUnavailable(aiohttp.ClientError):
+    """Выключатель группы эндпоинтов открыт: API недавно падал, запрос не отправлялся."""
+
+
+_GROUP = re.compile(r"^/api/([A-Za-z_]+)")
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def endpoint_group(path: str) -> str:
+    """Группа для выключателя: /api/snippets/5 -> snippets, /api/builds.get/1 -> builds."""
+    match = _GROUP.match(path if path.startswith("/") else f"/{path}")
+    return match.group(1) if match else "other"
+
+
+def breaker_for(path: str) -> CircuitBreaker:
+    group = endpoint_group(path)
+    breaker = _breakers.get(group)
+    if breaker is None:
+        breaker = _breakers[group] = CircuitBreaker(
+            f"api:{group}",
+            window=API_BREAKER_WINDOW,
+            min_calls=API_BREAKER_MIN_CALLS,
+            failure_ratio=API_BREAKER_FAILURE_RATIO,
+            recovery_time=API_BREAKER_RECOVERY,
+        )
+    return breaker
+
+
+def breaker_states() -> dict[str, str]:
+    return {group: breaker.state for group, breaker in _breakers.items()}
+
+
+# Отдавал ли текущий обработчик устаревшие данные из кэша (для пометки в ответе пользователю).
+# Каждый апдейт aiogram обрабатывается в своей задаче со своей копией контекста.
+_stale_served: contextvars.ContextVar[bool] = contextvars.ContextVar("api_stale_served", default=False)
+
+
+STALE_NOTE = "⚠️ Сервер недоступен — показаны сохранённые данные"
+
+
+def served_stale() -> bool:
+    """True, если в этом обработчике api_get вернул устаревший ответ из-за недоступности API."""
+    return _stale_served.get()
+
+
+# Одна долгоживущая сессия на весь бот: пул keep-alive соединений и кэш DNS.
+# Открывается в dp.startup (start), закрывается в dp.shutdown (close).
+_session: aiohttp.ClientSession | None = None
+
+# Склейка одинаковых одновременных GET; leaders / shared — сколько запросов
+# ушло в API и сколько получили чужой ответ
+get_flight: SingleFlight[CachedResponse] = SingleFlight()
+
+
+def _unix_socket_path() -> str | None:
+    if not API_TRANSPORT or not API_TRANSPORT.startswith("unix:"):
+        return None
+    path = API_TRANSPORT[len("unix:"):]
+    return path[2:] if path.startswith("//") else path
+
 
 def _build_url(path: str) -> str:
     cleaned = path if path.startswith("/") else f"/{path}"
-    return f"{API_BASE_URL.rstrip('/')}{cleaned}"
+    base = API_BASE_URL
+    if _unix_socket_path():
+        # Соединение идёт в сокет, из адреса берётся только хост — публичный, без TLS
+        base = str(yarl.URL(API_BASE_URL).with_scheme("http"))
+    elif API_TRANSPORT:
+        base = API_TRANSPORT
+    return f"{base.rstrip('/')}{cleaned}"
+
+
+def _transport_headers() -> dict[str, str]:
+    """
+    Заголовки, которые при прямом транспорте выставил бы обратный прокси:
+    miniapp_api видит тот же Host и ту же схему, что и по API_BASE_URL.
+    """
+    if not API_TRANSPORT:
+        return {}
+    public = yarl.URL(API_BASE_URL)
+    return {"Host": public.raw_authority, "X-Forwarded-Proto": public.scheme}
+
+
+async def start() -> None:
+    """Открывает общую сессию и реплику базы, если она включена (вызывается при запуске бота)."""
+    _get_session()
+    await replica.open()
+
+
+async def close() -> None:
+    """Закрывает общую сессию, все соединения пула и реплику (вызывается при остановке бота)."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    await replica.close()
+
+
+def _get_session() -> aiohttp.ClientSession:
+    # Создаётся лениво, если запрос пришёл раньше startup (скрипты, бенчмарки)
+    global _session
+    if _session is None or _session.closed:
+        socket_path = _unix_socket_path()
+        if socket_path:
+            connector = aiohttp.UnixConnector(
+                path=socket_path, limit=API_MAX_CONNECTIONS, keepalive_timeout=API_KEEPALIVE_TIMEOUT
+            )
+        else:
+            connector = aiohttp.TCPConnector(
+                limit=API_MAX_CONNECTIONS,
+                ttl_dns_cache=API_DNS_CACHE_TTL,
+                keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+            )
+        _session = aiohttp.ClientSession(
+            connector=connector, timeout=DEFAULT_TIMEOUT, json_serialize=json_codec.dumps
+        )
+        logger.info(f"Открыта общая сессия api_client ({API_TRANSPORT or API_BASE_URL})")
+    return _session
 
 
 async def api_get(
@@ -22,14 +201,299 @@ async def api_get(
     params: Optional[Mapping[str, Any]] = None,
     headers: Optional[Mapping[str, str]] = None,
     use_bot_token: bool = False,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+    use_cache: bool = True,
+    retry_deadline: float = API_RETRY_DEADLINE,
 ) -> aiohttp.ClientResponse:
-    return await _request(
-        "GET",
-        path,
-        params=params,
-        headers=headers,
-        use_bot_token=use_bot_token,
-    )
+    """
+    GET с кэшем для путей из api_cache.CACHE_POLICIES: свежий ответ отдаётся
+    без запроса, просроченный перепроверяется условным запросом.
+    use_cache=False — всегда свежие данные (ответ всё равно попадёт в кэш).
+    retry_deadline — срок на все попытки вместе (см. _request); timeout
+    ограничивает только одну попытку.
+
+    Одинаковые одновременные GET (путь, параметры, заголовки) склеиваются:
+    в API уходит один запрос, все получают один буферизованный ответ
+    (и одно разобранное JSON-тело — менять его нельзя).
+
+    Эндпоинты из API_REPLICA_ENDPOINTS читаются из локальной базы miniapp_api
+    мимо кэша; при ошибке базы запрос идёт в API как обычно.
+    """
+    if replica.serves(path):
+        local = await replica.get(path, params)
+        if local is not None:
+            return ResponseWrapper(local)
+
+    ttl = policy_ttl(path)
+    key = cache_key(path, params, use_bot_token)
+    validators: dict[str, str] = {}
+    if ttl is not None and use_cache:
+        cached, validators = api_cache.lookup(key)
+        if cached is not None:
+            return ResponseWrapper(cached)
+
+    async def fetch() -> CachedResponse:
+        return await _fetch_get(
+            path, key, ttl, validators,
+            params=params, headers=headers, use_bot_token=use_bot_token, timeout=timeout,
+            retry_deadline=retry_deadline,
+        )
+
+    # Срок повторов — часть ключа: короткий запрос не ждёт чужой длинный
+    flight_key = (key, tuple(sorted(headers.items())) if headers else (), retry_deadline)
+    try:
+        # Общий запрос идёт без чужого дедлайна; каждый ждёт его в пределах своего
+        async with update_deadline.limit(f"API GET {path}"):
+            response, _ = await get_flight.do(flight_key, fetch)
+    except update_deadline.DeadlineExceeded:
+        response = _stale_fallback(path, key, ttl, "дедлайн апдейта")
+        if response is None:
+            raise
+    if response.stale:
+        _stale_served.set(True)
+    return ResponseWrapper(response)
+
+
+async def _fetch_get(
+    path: str,
+    key: str,
+    ttl: Optional[float],
+    validators: Mapping[str, str],
+    *,
+    params: Optional[Mapping[str, Any]],
+    headers: Optional[Mapping[str, str]],
+    use_bot_token: bool,
+    timeout: Optional[aiohttp.ClientTimeout],
+    retry_deadline: float,
+) -> CachedResponse:
+    """
+    Сам запрос GET: ответ читается целиком, соединение сразу возвращается в пул.
+    Если API недоступен (ошибка сети, 5xx, открыт выключатель), а в кэше есть
+    ответ — отдаём его с пометкой stale.
+    """
+    request_headers = {**(headers or {}), **validators}
+    try:
+        response_wrapper = await _request(
+            "GET",
+            path,
+            params=params,
+            headers=request_headers,
+            use_bot_token=use_bot_token,
+            timeout=timeout,
+            deadline=retry_deadline,
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        fallback = _stale_fallback(path, key, ttl, type(e).__name__)
+        if fallback is None:
+            raise
+        return fallback
+
+    async with response_wrapper as response:
+        if response.status == 304 and ttl is not None:
+            revalidated = api_cache.not_modified(key, ttl)
+            if revalidated is not None:
+                return revalidated
+        if response.status in BREAKER_FAILURE_STATUSES:
+            fallback = _stale_fallback(path, key, ttl, f"статус {response.status}")
+            if fallback is not None:
+                return fallback
+        buffered = CachedResponse(
+            response.status,
+            response.reason or "",
+            kept_headers(response.headers),
+            await response.read(),
+            from_cache=False,
+        )
+    if ttl is not None:
+        api_cache.store(key, buffered, ttl)
+    return buffered
+
+
+def _stale_fallback(path: str, key: str, ttl: Optional[float], reason: str) -> Optional[CachedResponse]:
+    if ttl is None:
+        return None
+    cached = api_cache.stale(key)
+    if cached is not None:
+        STALE_TOTAL.inc(endpoint=endpoint_label(path))
+        logger.warning(f"API GET {path}: {reason}, отдаём ответ из кэша")
+    return cached
+
+
+def invalidate(*prefixes: str) -> int:
+    """Сбрасывает кэш GET по префиксам путей — вызывать после записи в API."""
+    return api_cache.invalidate(*prefixes)
+
+
+def _user_info_path(user_id: int) -> str:
+    return f"/api/user_info/{user_id}"
+
+
+def invalidate_user_info(user_id: int) -> int:
+    """Сбрасывает кэш user_info одного пользователя — после записей, меняющих его профиль или баланс."""
+    # "?" в конце: /api/user_info/12 не задевает /api/user_info/123
+    return api_cache.invalidate(f"{_user_info_path(user_id)}?")
+
+
+# Ответы пакетного эндпоинта, по которым понятно, что его на сервере нет
+_BULK_UNSUPPORTED_STATUSES = frozenset({404, 405, 501})
+# Через сколько секунд снова пробовать пакетный эндпоинт, если его не было
+BULK_RECHECK_AFTER = 3600.0
+
+
+class UserInfoLoader:
+    """
+    Пакетная загрузка /api/user_info (в духе DataLoader).
+
+    Запросы пользователей, пришедшие в пределах window секунд, собираются
+    и уходят одним GET {bulk_path}?ids=1,2,3 (ответ — {"users": [...]},
+    кого нет в списке — 404). Результаты раскладываются в кэш api_cache
+    под ключами одиночных запросов. Если пакетного эндпоинта нет на сервере
+    или пакет не удался, пользователи запрашиваются по одному через api_get.
+    """
+
+    def __init__(self, bulk_path: str | None, window: float, max_batch: int):
+        self.bulk_path = bulk_path
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: dict[int, asyncio.Future] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._bulk_disabled_until = 0.0
+        self.batches = 0       # пакетных запросов
+        self.batched = 0       # пользователей, полученных пакетами
+        self.fallbacks = 0     # пользователей, запрошенных по одному
+
+    async def load(self, user_id: int) -> ResponseWrapper:
+        """Ответ как у api_get(f"/api/user_info/{user_id}"): статус 200 / 404 / ошибка API."""
+        path = _user_info_path(user_id)
+        if replica.serves(path):
+            # Из локальной базы пользователь читается быстрее, чем собирается пакет
+            return await api_get(path)
+        ttl = policy_ttl(path)
+        if ttl is not None:
+            cached, _ = api_cache.lookup(cache_key(path, None, False))
+            if cached is not None:
+                return ResponseWrapper(cached)
+
+        future = self._pending.get(user_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[user_id] = future
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+        # Пакет общий, а дедлайн у каждого свой: ждём результат в пределах своего
+        async with update_deadline.limit(path):
+            return ResponseWrapper(await asyncio.shield(future))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "batched": self.batched,
+            "fallbacks": self.fallbacks,
+            "bulk_enabled": self._bulk_enabled(),
+        }
+
+    def _bulk_enabled(self) -> bool:
+        return bool(self.bulk_path) and time.monotonic() >= self._bulk_disabled_until
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            # Чистый контекст: пакет не наследует дедлайн того, чей запрос его открыл
+            task = asyncio.create_task(self._resolve(batch), context=contextvars.Context())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: dict[int, asyncio.Future]) -> None:
+        """Раскладывает результаты по ожидающим; любой сбой тоже доходит до каждого, никто не зависает."""
+        try:
+            await self._fill(batch)
+        except Exception as e:
+            logger.exception(f"Пакет user_info ({len(batch)} польз.) не загружен")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for future in batch.values():
+                if not future.done():
+                    future.cancel()
+
+    async def _fill(self, batch: dict[int, asyncio.Future]) -> None:
+        results: dict[int, CachedResponse] = {}
+        if len(batch) > 1 and self._bulk_enabled():
+            results = await self._load_bulk(list(batch))
+        missing = [user_id for user_id in batch if user_id not in results]
+        if missing:
+            self.fallbacks += len(missing)
+            singles = await asyncio.gather(
+                *(self._load_single(user_id) for user_id in missing), return_exceptions=True
+            )
+            results.update(zip(missing, singles))
+        for user_id, future in batch.items():
+            if future.done():
+                continue
+            result = results[user_id]
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _load_single(self, user_id: int) -> CachedResponse:
+        async with await api_get(_user_info_path(user_id)) as response:
+            return response
+
+    async def _load_bulk(self, user_ids: list[int]) -> dict[int, CachedResponse]:
+        """Пакетный запрос; пустой словарь — пакет не удался, грузим по одному."""
+        try:
+            async with await _request(
+                "GET", self.bulk_path, params={"ids": ",".join(map(str, user_ids))}
+            ) as response:
+                if response.status in _BULK_UNSUPPORTED_STATUSES:
+                    self._bulk_disabled_until = time.monotonic() + BULK_RECHECK_AFTER
+                    logger.info(
+                        f"API {self.bulk_path}: статус {response.status}, "
+                        f"пользователи загружаются по одному"
+                    )
+                    return {}
+                if response.status != 200:
+                    logger.warning(f"API {self.bulk_path}: статус {response.status}")
+                    return {}
+                data = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning(f"API {self.bulk_path}: {type(e).__name__}: {e}")
+            return {}
+
+        try:
+            found = {
+                int(user["user_id"]): user
+                for user in data.get("users", [])
+                if isinstance(user, dict) and "user_id" in user
+            }
+        except (AttributeError, TypeError, ValueError) as e:
+            # Ответ не того формата (не объект, user_id не число) — грузим по одному
+            logger.warning(f"API {self.bulk_path}: неожиданный ответ: {type(e).__name__}: {e}")
+            return {}
+        self.batches += 1
+        self.batched += len(user_ids)
+        results: dict[int, CachedResponse] = {}
+        for user_id in user_ids:
+            if user_id in found:
+                results[user_id] = CachedResponse.from_json(200, found[user_id])
+                path = _user_info_path(user_id)
+                ttl = policy_ttl(path)
+                if ttl is not None:
+                    api_cache.store(cache_key(path, None, False), results[user_id], ttl)
+            else:
+                results[user_id] = CachedResponse.from_json(404, {"detail": "User not found"})
+        return results
+
+
+user_info_loader = UserInfoLoader(API_USER_BATCH_PATH, API_USER_BATCH_WINDOW, API_USER_BATCH_MAX)
 
 
 async def api_post(
@@ -40,7 +504,14 @@ async def api_post(
     data: Optional[MutableMapping[str, Any] | Iterable[tuple[str, Any]]] = None,
     headers: Optional[Mapping[str, str]] = None,
     use_bot_token: bool = False,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+    idempotency_key: IdempotencyKey = None,
 ) -> aiohttp.ClientResponse:
+    """
+    Без idempotency_key повторяется только неустановленное соединение. Ключ
+    (True — сгенерировать) — лишь для эндпоинтов с отсевом дублей на сервере;
+    в miniapp_api таких нет, см. _request.
+    """
     return await _request(
         "POST",
         path,
@@ -49,6 +520,8 @@ async def api_post(
         data=data,
         headers=headers,
         use_bot_token=use_bot_token,
+        timeout=timeout,
+        idempotency_key=idempotency_key,
     )
 
 
@@ -58,13 +531,22 @@ async def api_delete(
     params: Optional[Mapping[str, Any]] = None,
     headers: Optional[Mapping[str, str]] = None,
     use_bot_token: bool = False,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+    idempotency_key: IdempotencyKey = None,
 ) -> aiohttp.ClientResponse:
+    """
+    Без idempotency_key повторяется только неустановленное соединение. Ключ
+    (True — сгенерировать) — лишь для эндпоинтов с отсевом дублей на сервере;
+    в miniapp_api таких нет, см. _request.
+    """
     return await _request(
         "DELETE",
         path,
         params=params,
         headers=headers,
         use_bot_token=use_bot_token,
+        timeout=timeout,
+        idempotency_key=idempotency_key,
     )
 
 
@@ -77,36 +559,157 @@ async def _request(
     data: Optional[MutableMapping[str, Any] | Iterable[tuple[str, Any]]] = None,
     headers: Optional[Mapping[str, str]] = None,
     use_bot_token: bool = False,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+    idempotency_key: IdempotencyKey = None,
+    deadline: float = API_RETRY_DEADLINE,
 ) -> aiohttp.ClientResponse:
+    """
+    Запрос с повторами: при обрыве соединения, таймауте или ответе из
+    RETRY_STATUSES — до API_RETRY_ATTEMPTS попыток с экспоненциальной паузой
+    и джиттером, все вместе не дольше deadline секунд.
+
+    Выключатель группы эндпоинтов (breaker_for) считает обрывы, таймауты и
+    5xx; когда он открыт, запрос сразу падает с ApiUnavailable.
+
+    Всегда повторяются GET/PUT. POST/DELETE без ключа идемпотентности (так
+    ходят все записи в miniapp_api: модерация, отзывы, сниппеты, удаление
+    пользователя) повторяются только при ClientConnectorError — соединение не
+    установилось, запрос до сервера не дошёл; после таймаута, обрыва или 5xx
+    не повторяются, ведь сервер мог запись уже применить. Запросы с FormData
+    (форма одноразовая) не повторяются никогда. С ключом (заголовок
+    Idempotency-Key, один на все попытки) повторяются как GET — передавать его
+    только эндпоинтам, которые отсеивают по нему дубли; miniapp_api этого не умеет.
+    """
     url = _build_url(path)
-    session_headers = {}
+    request_headers = _transport_headers()
     if headers:
-        session_headers.update(headers)
+        request_headers.update(headers)
     if use_bot_token:
-        session_headers.setdefault("Authorization", BOT_TOKEN)
-    session = aiohttp.ClientSession(timeout=DEFAULT_TIMEOUT)
-    try:
-        response = await session.request(
-            method,
-            url,
-            params=params,
-            json=json,
-            data=data,
-            headers=session_headers,
-        )
-        return ResponseWrapper(session, response)
-    except Exception:
-        await session.close()
-        raise
+        request_headers.setdefault("Authorization", BOT_TOKEN)
+    if idempotency_key is True:
+        idempotency_key = uuid.uuid4().hex
+    if idempotency_key:
+        request_headers[IDEMPOTENCY_HEADER] = idempotency_key
+    # FormData нельзя отправить второй раз — такие запросы не повторяем вовсе
+    resendable = not isinstance(data, aiohttp.FormData)
+    retryable = (method in IDEMPOTENT_METHODS or bool(idempotency_key)) and resendable
+    base_timeout = timeout or DEFAULT_TIMEOUT
+    # Дедлайн апдейта (deadline.py) сокращает и попытки, и таймаут каждой из них
+    budget = update_deadline.time_left()
+    if budget is not None:
+        update_deadline.check(f"API {method} {path}")
+        deadline = min(deadline, budget)
+    clamp_timeout = retryable or budget is not None
+    endpoint = endpoint_label(path)
+    breaker = breaker_for(path)
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        if not breaker.allow():
+            group = endpoint_group(path)
+            REJECTED_TOTAL.inc(group=group)
+            raise ApiUnavailable(f"API {group} временно недоступен (выключатель открыт)")
+        if attempt > 1:
+            RETRIES_TOTAL.inc(method=method, endpoint=endpoint)
+        remaining = deadline - (time.monotonic() - started)
+        IN_FLIGHT.inc(method=method, endpoint=endpoint)
+        attempt_started = time.perf_counter()
+        error: aiohttp.ClientConnectionError | asyncio.TimeoutError | None = None
+        try:
+            response = await _get_session().request(
+                method,
+                url,
+                params=params,
+                json=json,
+                data=data,
+                headers=request_headers,
+                timeout=_clamp_timeout(base_timeout, remaining) if clamp_timeout else base_timeout,
+            )
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+        except BaseException:
+            # Отмена или ошибка до ответа сервера ничего не говорит о его здоровье
+            breaker.release_probe()
+            raise
+        finally:
+            IN_FLIGHT.dec(method=method, endpoint=endpoint)
+            REQUEST_SECONDS.observe(time.perf_counter() - attempt_started, method=method, endpoint=endpoint)
+
+        if error is not None:
+            is_timeout = isinstance(error, asyncio.TimeoutError)
+            if is_timeout and update_deadline.expired():
+                # Таймаут урезан дедлайном апдейта — это не сбой API
+                breaker.release_probe()
+                REQUESTS_TOTAL.inc(method=method, endpoint=endpoint, status="deadline")
+                raise update_deadline.DeadlineExceeded(f"API {method} {path}: дедлайн апдейта истёк") from error
+            breaker.record_failure()
+            REQUESTS_TOTAL.inc(method=method, endpoint=endpoint, status="timeout" if is_timeout else "error")
+            if is_timeout:
+                TIMEOUTS_TOTAL.inc(method=method, endpoint=endpoint)
+            can_retry = retryable or (resendable and isinstance(error, aiohttp.ClientConnectorError))
+            delay = _backoff(attempt)
+            if not can_retry or not _has_budget(attempt, started, deadline, delay):
+                raise error
+            logger.warning(
+                f"API {method} {path}: {type(error).__name__}, повтор {attempt + 1} через {delay:.2f} c"
+            )
+            await asyncio.sleep(delay)
+            continue
+
+        REQUESTS_TOTAL.inc(method=method, endpoint=endpoint, status=str(response.status))
+        if response.status in BREAKER_FAILURE_STATUSES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if retryable and response.status in RETRY_STATUSES:
+            delay = _backoff(attempt, response.headers.get("Retry-After"))
+            if _has_budget(attempt, started, deadline, delay):
+                logger.warning(
+                    f"API {method} {path}: статус {response.status}, "
+                    f"повтор {attempt + 1} через {delay:.2f} c"
+                )
+                response.release()
+                await asyncio.sleep(delay)
+                continue
+        return ResponseWrapper(response)
+
+
+def _backoff(attempt: int, retry_after: str | None = None) -> float:
+    """Пауза перед следующей попыткой: Retry-After сервера или экспонента с полным джиттером."""
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(API_RETRY_BACKOFF_MAX, API_RETRY_BACKOFF * 2 ** (attempt - 1)))
+
+
+def _has_budget(attempt: int, started: float, deadline: float, delay: float) -> bool:
+    # Следующей попытке нужно хоть немного времени после паузы
+    left = deadline - (time.monotonic() - started) - delay
+    return attempt < API_RETRY_ATTEMPTS and left > 0.5
+
+
+def _clamp_timeout(timeout: aiohttp.ClientTimeout, remaining: float) -> aiohttp.ClientTimeout:
+    """Таймаут попытки не выходит за общий срок всех попыток."""
+    remaining = max(remaining, 0.1)
+    if timeout.total is not None and timeout.total <= remaining:
+        return timeout
+    return aiohttp.ClientTimeout(
+        total=remaining,
+        connect=timeout.connect,
+        sock_read=timeout.sock_read,
+        sock_connect=timeout.sock_connect,
+    )
 
 
 class ResponseWrapper:
-    """Контекстный менеджер для автоматического закрытия ClientSession."""
+    """Контекстный менеджер, возвращающий соединение в пул общей сессии."""
 
-    __slots__ = ("_session", "_response")
+    __slots__ = ("_response",)
 
-    def __init__(self, session: aiohttp.ClientSession, response: aiohttp.ClientResponse):
-        self._session = session
+    def __init__(self, response: aiohttp.ClientResponse | CachedResponse):
         self._response = response
 
     def __await__(self):
@@ -117,7 +720,7 @@ class ResponseWrapper:
 
     async def json(self) -> Any:
         async with self:
-            return await self._response.json()
+            return await self._response.json(loads=json_codec.loads)
 
     async def text(self) -> str:
         async with self:
@@ -135,5 +738,5 @@ class ResponseWrapper:
         return self._response
 
     async def __aexit__(self, exc_type, exc, tb) -> None:
-        await self._session.close()
-
+        # Сессию не закрываем: недочитанный ответ освобождается, соединение остаётся в пуле
+        self._response.release()
@@ -0,0 +1,106 @@
+"""
+Типизированные ответы miniapp_api: компактные структуры (slots) вместо
+словарей с цепочками .get(). Неизвестные поля ответа отбрасываются.
+Структуры не замораживаем: frozen-датаклассы заметно медленнее создаются.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional
+
+
+def _int(value: Any, default: int = 0) -> int:
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(slots=True)
+class Build:
+    """Билд из /api/builds.get/{id} и /api/builds.search."""
+
+    build_id: int
+    name: str
+    author: Optional[str] = None
+    class_name: Optional[str] = None      # поле "class" в API
+    tags: tuple[str, ...] = ()
+    description: Optional[str] = None
+    photo_1: Optional[str] = None
+    photo_2: Optional[str] = None
+    is_private: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Build":
+        get = data.get
+        return cls(
+            _int(get("build_id")),
+            get("name") or "",
+            get("author"),
+            get("class"),
+            tuple(get("tags") or ()),
+            get("description"),
+            get("photo_1"),
+            get("photo_2"),
+            bool(get("is_private")),
+        )
+
+
+@dataclass(slots=True)
+class Snippet:
+    """Сниппет из /api/snippets/*."""
+
+    snippet_id: int
+    trigger: str = ""
+    message: str = ""
+    media: Optional[str] = None
+    media_type: Optional[str] = None
+    user_id: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Snippet":
+        return cls(
+            _int(data.get("snippet_id")),
+            data.get("trigger") or "",
+            data.get("message") or "",
+            data.get("media"),
+            data.get("media_type"),
+            data.get("user_id"),
+        )
+
+
+@dataclass(slots=True)
+class UserInfo:
+    """Пользователь из /api/user_info/{id}."""
+
+    user_id: int
+    balance: int = 0
+    username: Optional[str] = None
+    psn_id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "UserInfo":
+        return cls(
+            _int(data.get("user_id")),
+            _int(data.get("balance")),
+            data.get("username"),
+            data.get("psn_id"),
+        )
+
+
+@dataclass(slots=True)
+class SubscriberList:
+    """Подписчики режима из /api/notifications/{type}."""
+
+    notification_type: str
+    subscribers: tuple[int, ...] = ()
+
+    @classmethod
+    def from_dict(cls, notification_type: str, data: Mapping[str, Any]) -> "SubscriberList":
+        return cls(
+            notification_type=notification_type,
+            subscribers=tuple(data.get("subscribers") or ()),
+        )
@@ -0,0 +1,236 @@
+"""
+Локальная реплика для чтения: запросы GET к miniapp_api, которые можно
+ответить из его SQLite-базы на этом же сервере, читаются напрямую
+(aiosqlite, только чтение), без HTTPS. Запись всегда идёт через REST API.
+
+Какие эндпоинты читаются из базы — API_REPLICA_ENDPOINTS в config.py.
+Ответ собирается в том же формате, что у REST API, поэтому обработчики
+не меняются. При любой ошибке базы запрос уходит в REST API как обычно.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+import aiosqlite
+
+from api_cache import CachedResponse
+from config import API_REPLICA_DB_PATH, API_REPLICA_ENDPOINTS, API_REPLICA_POOL_SIZE
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REPLICA_SECONDS = registry.histogram(
+    "gyozenbot_api_replica_seconds", "Задержка чтения из локальной реплики miniapp_api", ("endpoint",)
+)
+REPLICA_FALLBACKS = registry.counter(
+    "gyozenbot_api_replica_fallbacks_total", "Чтения из реплики, ушедшие в REST API из-за ошибки", ("endpoint",)
+)
+
+# Запросы по схеме miniapp_api (db.py). Строки постоянные — sqlite3 держит их
+# подготовленными в кэше выражений соединения (cached_statements).
+# Только поля ответа REST /api/user_info/{id}: остальные колонки users наружу не отдаются
+SQL_USER = "SELECT user_id, username, psn_id, balance FROM users WHERE user_id = ?"
+SQL_SNIPPETS_ALL = "SELECT * FROM snippets ORDER BY snippet_id"
+SQL_SNIPPETS_BY_USER = "SELECT * FROM snippets WHERE user_id = ? ORDER BY snippet_id"
+SQL_SNIPPET = "SELECT * FROM snippets WHERE snippet_id = ?"
+# Тип уведомления — колонка таблицы notifications; имя сверяется со схемой (PRAGMA table_info)
+SQL_SUBSCRIBERS = 'SELECT user_id FROM notifications WHERE "{column}" = 1'
+
+Handler = Callable[["ReadReplica", re.Match, Mapping[str, Any]], Awaitable[CachedResponse]]
+
+
+def _not_found(detail: str) -> CachedResponse:
+    return CachedResponse.from_json(404, {"detail": detail})
+
+
+def _user_payload(row: Mapping[str, Any]) -> dict:
+    """Строка users → тело ответа REST /api/user_info/{id}."""
+    return {
+        "user_id": row["user_id"],
+        "username": row["username"],
+        "psn_id": row["psn_id"],
+        "balance": row["balance"],
+    }
+
+
+async def _user_info(replica: "ReadReplica", match: re.Match, params: Mapping[str, Any]) -> CachedResponse:
+    row = await replica.fetch_one(SQL_USER, (int(match["user_id"]),))
+    return CachedResponse.from_json(200, _user_payload(row)) if row else _not_found("User not found")
+
+
+async def _snippets_all(replica: "ReadReplica", match: re.Match, params: Mapping[str, Any]) -> CachedResponse:
+    return CachedResponse.from_json(200, {"snippets": await replica.fetch_all(SQL_SNIPPETS_ALL)})
+
+
+async def _snippets_my(replica: "ReadReplica", match: re.Match, params: Mapping[str, Any]) -> CachedResponse:
+    rows = await replica.fetch_all(SQL_SNIPPETS_BY_USER, (int(params["user_id"]),))
+    return CachedResponse.from_json(200, {"snippets": rows})
+
+
+async def _snippet(replica: "ReadReplica", match: re.Match, params: Mapping[str, Any]) -> CachedResponse:
+    row = await replica.fetch_one(SQL_SNIPPET, (int(match["snippet_id"]),))
+    return CachedResponse.from_json(200, {"snippet": row}) if row else _not_found("Snippet not found")
+
+
+async def _subscribers(replica: "ReadReplica", match: re.Match, params: Mapping[str, Any]) -> CachedResponse:
+    column = match["notification_type"]
+    if column not in await replica.columns("notifications") or column == "user_id":
+        return _not_found("Unknown notification type")
+    subscribers = await replica.fetch_column(SQL_SUBSCRIBERS.format(column=column))
+    return CachedResponse.from_json(200, {"subscribers": subscribers})
+
+
+# (имя для API_REPLICA_ENDPOINTS, путь, обработчик)
+ROUTES: list[tuple[str, re.Pattern, Handler]] = [
+    ("user_info", re.compile(r"^/api/user_info/(?P<user_id>\d+)$"), _user_info),
+    ("snippets", re.compile(r"^/api/snippets/all$"), _snippets_all),
+    ("snippets", re.compile(r"^/api/snippets/my$"), _snippets_my),
+    ("snippets", re.compile(r"^/api/snippets/(?P<snippet_id>\d+)$"), _snippet),
+    ("notifications", re.compile(r"^/api/notifications/(?P<notification_type>[a-z_]+)$"), _subscribers),
+]
+
+
+class ReadReplica:
+    """
+    Пул соединений только для чтения (mode=ro, query_only) к базе miniapp_api.
+
+    Соединение берётся из очереди на один запрос, поэтому параллельные
+    обработчики читают одновременно, каждый в потоке своего соединения.
+    В режиме WAL чтение не блокирует запись miniapp_api и наоборот.
+    """
+
+    def __init__(self, path: str | None, endpoints: set[str], pool_size: int):
+        self.path = path
+        self.endpoints = set(endpoints)
+        self.pool_size = pool_size
+        self._pool: asyncio.Queue[aiosqlite.Connection] | None = None
+        self._connections: list[aiosqlite.Connection] = []
+        self._open_lock = asyncio.Lock()
+        self._columns: dict[str, set[str]] = {}
+        self.disabled_reason: str | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path and self.endpoints) and self.disabled_reason is None
+
+    def route(self, path: str) -> Optional[tuple[str, re.Match, Handler]]:
+        if not self.enabled:
+            return None
+        for name, pattern, handler in ROUTES:
+            if name in self.endpoints and (match := pattern.match(path)):
+                return name, match, handler
+        return None
+
+    def serves(self, path: str) -> bool:
+        return self.route(path) is not None
+
+    async def get(self, path: str, params: Optional[Mapping[str, Any]] = None) -> Optional[CachedResponse]:
+        """Ответ из базы или None — читать через REST API."""
+        routed = self.route(path)
+        if routed is None:
+            return None
+        name, match, handler = routed
+        started = time.perf_counter()
+        try:
+            await self.open()
+            if self._pool is None:
+                return None
+            response = await handler(self, match, params or {})
+        except (sqlite3.Error, KeyError, ValueError) as e:
+            REPLICA_FALLBACKS.inc(endpoint=name)
+            logger.warning(f"Реплика {path}: {type(e).__name__}: {e}, читаем через API")
+            return None
+        REPLICA_SECONDS.observe(time.perf_counter() - started, endpoint=name)
+        return response
+
+    async def fetch_one(self, sql: str, args: tuple = ()) -> Optional[dict]:
+        connection = await self._pool.get()
+        try:
+            async with connection.execute(sql, args) as cursor:
+                row = await cursor.fetchone()
+        finally:
+            self._pool.put_nowait(connection)
+        return dict(row) if row is not None else None
+
+    async def fetch_all(self, sql: str, args: tuple = ()) -> list[dict]:
+        connection = await self._pool.get()
+        try:
+            async with connection.execute(sql, args) as cursor:
+                rows = await cursor.fetchall()
+        finally:
+            self._pool.put_nowait(connection)
+        return [dict(row) for row in rows]
+
+    async def fetch_column(self, sql: str, args: tuple = ()) -> list:
+        """Первая колонка всех строк — без сборки словарей на каждую строку."""
+        connection = await self._pool.get()
+        try:
+            rows = await connection.execute_fetchall(sql, args)
+        finally:
+            self._pool.put_nowait(connection)
+        return [row[0] for row in rows]
+
+    async def columns(self, table: str) -> set[str]:
+        """Колонки таблицы (кэшируются до перезапуска)."""
+        if table not in self._columns:
+            rows = await self.fetch_all(f'PRAGMA table_info("{table}")')
+            self._columns[table] = {row["name"] for row in rows}
+        return self._columns[table]
+
+    async def open(self) -> None:
+        if self._pool is not None or not self.enabled:
+            return
+        async with self._open_lock:
+            if self._pool is not None or not self.enabled:
+                return
+            if not Path(self.path).exists():
+                self.disabled_reason = f"нет файла {self.path}"
+                logger.warning(f"Реплика miniapp_api отключена: {self.disabled_reason}")
+                return
+            pool: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+            try:
+                for _ in range(self.pool_size):
+                    connection = await aiosqlite.connect(
+                        f"file:{self.path}?mode=ro", uri=True, cached_statements=64
+                    )
+                    self._connections.append(connection)
+                    connection.row_factory = sqlite3.Row
+                    await connection.execute("PRAGMA query_only = ON")
+                    pool.put_nowait(connection)
+                async with self._connections[0].execute("PRAGMA journal_mode") as cursor:
+                    journal_mode = (await cursor.fetchone())[0]
+            except sqlite3.Error as e:
+                await self.close()
+                self.disabled_reason = str(e)
+                logger.warning(f"Реплика miniapp_api отключена: {e}")
+                return
+            if journal_mode.lower() != "wal":
+                # Переключить режим может только miniapp_api (это запись в базу)
+                logger.warning(
+                    f"База {self.path} в режиме {journal_mode}, а не WAL: "
+                    f"чтение бота может задерживать запись miniapp_api"
+                )
+            self._pool = pool
+            logger.info(
+                f"Реплика miniapp_api: {self.path}, соединений {self.pool_size}, "
+                f"эндпоинты: {', '.join(sorted(self.endpoints))}"
+            )
+
+    async def close(self) -> None:
+        self._pool = None
+        connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                await connection.close()
+            except sqlite3.Error:
+                pass
+
+
+replica = ReadReplica(API_REPLICA_DB_PATH, API_REPLICA_ENDPOINTS, API_REPLICA_POOL_SIZE)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная заглушка miniapp_api для бенчмарков api_client.
+
+Отвечает на /api/user_info/{id}, /api/builds.search и любые другие пути
+(JSON {"ok": true}) с настраиваемой задержкой. По желанию работает по HTTPS
+с самоподписанным сертификатом (нужен openssl), чтобы в замерах было видно
+рукопожатие TLS. Считает запросы и новые TCP-соединения. По желанию отдаёт
+ETag для /api/user_info и отвечает 304 на условные запросы, а также
+пакетный /api/user_info.batch.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+from aiohttp import connector as aiohttp_connector, web
+
+logging.getLogger("aiohttp.server").setLevel(logging.CRITICAL)
+
+
+def make_self_signed_cert(directory: Path) -> tuple[Path, Path] | None:
+    """Самоподписанный сертификат для 127.0.0.1; None — если openssl недоступен."""
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    try:
+        subprocess.run(
+            [
+                "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                "-keyout", str(key), "-out", str(cert), "-days", "1",
+                "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+            ],
+            check=True,
+            capture_output=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return cert, key
+
+
+class StubAPI:
+    """Заглушка miniapp_api на 127.0.0.1 со случайным свободным портом."""
+
+    def __init__(
+        self,
+        delay: float = 0.0,
+        tls: bool = False,
+        fail_status: int | None = None,
+        fail_rate: float = 0.0,
+        etag: bool = False,
+        bulk: bool = False,
+        unix_path: str | None = None,
+    ):
+        self.delay = delay
+        # etag=True — /api/user_info отдаёт ETag и отвечает 304 на If-None-Match;
+        # version меняется, чтобы имитировать изменение данных
+        self.etag = etag
+        self.version = 0
+        self.not_modified = 0
+        # down=True — имитация аварии: ответ 503 после down_delay сек. (долгий down_delay — «зависание»)
+        self.down = False
+        self.down_delay = 0.0
+        # bulk=True — есть пакетный /api/user_info.batch?ids=..., иначе на него 404
+        self.bulk = bulk
+        # Ответ /api/notifications/{type}: список подписчиков
+        self.subscribers: list[int] = []
+        self.tls = tls
+        # unix_path — слушать UNIX-сокет вместо TCP-порта
+        self.unix_path = unix_path
+        # Заголовки Host и Authorization, с которыми приходили запросы
+        self.hosts: set[str] = set()
+        self.auth: set[str] = set()
+        # С вероятностью fail_rate запрос получает fail_status (имитация сбоев сервера)
+        self.fail_status = fail_status
+        self.fail_rate = fail_rate
+        self.failures = 0
+        self.idempotency_keys: list[str] = []
+        self.requests = 0
+        self.connections = 0
+        self._peers: set[tuple] = set()
+        self._runner: web.AppRunner | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._tmpdir: tempfile.TemporaryDirectory | None = None
+        self.cert_path: Path | None = None
+        self.port: int | None = None
+
+    @property
+    def base_url(self) -> str:
+        scheme = "https" if self.tls else "http"
+        return f"{scheme}://127.0.0.1:{self.port}"
+
+    def _count(self, request: web.Request) -> web.Response | None:
+        """Учитывает запрос; возвращает ответ-сбой, если запрос должен упасть."""
+        self.requests += 1
+        self.hosts.add(request.headers.get("Host", ""))
+        self.auth.add(request.headers.get("Authorization", ""))
+        # Новое соединение — новый исходящий порт клиента
+        peer = request.transport.get_extra_info("peername") if request.transport else None
+        if peer not in self._peers:
+            self._peers.add(peer)
+            self.connections += 1
+        key = request.headers.get("Idempotency-Key")
+        if key:
+            self.idempotency_keys.append(key)
+        if self.down:
+            self.failures += 1
+            return web.json_response({"error": "stub outage"}, status=503)
+        if self.fail_status and random.random() < self.fail_rate:
+            self.failures += 1
+            return web.json_response({"error": "stub failure"}, status=self.fail_status)
+        return None
+
+    async def _user_info(self, request: web.Request) -> web.Response:
+        failure = self._count(request)
+        await asyncio.sleep(self.down_delay if self.down else self.delay)
+        if failure is not None:
+            return failure
+        user_id = int(request.match_info["user_id"])
+        payload = {"user_id": user_id, "balance": user_id % 1000, "username": f"user{user_id}"}
+        if not self.etag:
+            return web.json_response(payload)
+        # ETag зависит от данных: условный запрос без изменений получает 304 без тела
+        etag = f'"{user_id}-{self.version}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(payload, headers={"ETag": etag})
+
+    async def _user_info_batch(self, request: web.Request) -> web.Response:
+        failure = self._count(request)
+        await asyncio.sleep(self.down_delay if self.down else self.delay)
+        if failure is not None:
+            return failure
+        if not self.bulk:
+            return web.json_response({"detail": "Not Found"}, status=404)
+        ids = [int(x) for x in request.query.get("ids", "").split(",") if x]
+        # Отрицательные id считаем несуществующими пользователями
+        users = [
+            {"user_id": user_id, "balance": user_id % 1000, "username": f"user{user_id}"}
+            for user_id in ids
+            if user_id >= 0
+        ]
+        return web.json_response({"users": users})
+
+    async def _subscribers(self, request: web.Request) -> web.Response:
+        failure = self._count(request)
+        await asyncio.sleep(self.down_delay if self.down else self.delay)
+        if failure is not None:
+            return failure
+        return web.json_response({"subscribers": self.subscribers})
+
+    async def _search(self, request: web.Request) -> web.Response:
+        failure = self._count(request)
+        await asyncio.sleep(self.down_delay if self.down else self.delay)
+        if failure is not None:
+            return failure
+        return web.json_response({"builds": []})
+
+    async def _any(self, request: web.Request) -> web.Response:
+        failure = self._count(request)
+        await asyncio.sleep(self.down_delay if self.down else self.delay)
+        if failure is not None:
+            return failure
+        return web.json_response({"ok": True})
+
+    async def _start(self, ssl_context: ssl.SSLContext | None) -> None:
+        app = web.Application()
+        app.router.add_get("/api/user_info.batch", self._user_info_batch)
+        app.router.add_get("/api/user_info/{user_id}", self._user_info)
+        app.router.add_get("/api/builds.search", self._search)
+        app.router.add_get("/api/notifications/{notification_type:[a-z_]+}", self._subscribers)
+        app.router.add_route("*", "/{tail:.*}", self._any)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        if self.unix_path:
+            await web.UnixSite(self._runner, self.unix_path).start()
+            return
+        site = web.TCPSite(self._runner, "127.0.0.1", 0, ssl_context=ssl_context)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self) -> "StubAPI":
+        ssl_context = None
+        if self.tls:
+            self._tmpdir = tempfile.TemporaryDirectory()
+            pair = make_self_signed_cert(Path(self._tmpdir.name))
+            if pair is None:
+                print("openssl недоступен — заглушка работает по HTTP")
+                self.tls = False
+            else:
+                self.cert_path, key_path = pair
+                ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+                ssl_context.load_cert_chain(self.cert_path, key_path)
+                # Клиенты в процессе бенчмарка доверяют самоподписанному сертификату.
+                # aiohttp создаёт проверяющий SSL-контекст при импорте — дополняем его.
+                os.environ["SSL_CERT_FILE"] = str(self.cert_path)
+                verified = getattr(aiohttp_connector, "_SSL_CONTEXT_VERIFIED", None)
+                if verified is not None:
+                    verified.load_verify_locations(self.cert_path)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(ssl_context), self._loop).result()
+        return self
+
+    def stop(self) -> None:
+        if self._runner:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        if self._tmpdir:
+            self._tmpdir.cleanup()
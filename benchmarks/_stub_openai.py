@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Локальный OpenAI-совместимый сервер-заглушка для бенчмарков.
+
+Отвечает на /chat/completions и /images/generations с настраиваемой задержкой,
+не тратит токены и не требует сети. Работает в отдельном потоке со своим
+event loop, чтобы блокирующий клиент в бенчмарке не мешал заглушке отвечать.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from aiohttp import web
+
+# Отменённые (проигравшие хедж) запросы рвут соединение — это не ошибка заглушки
+logging.getLogger("aiohttp.server").setLevel(logging.CRITICAL)
+
+
+class StubOpenAI:
+    """Заглушка OpenAI API на 127.0.0.1 со случайным свободным портом."""
+
+    def __init__(
+        self,
+        delay: float = 1.0,
+        reply: str = "Призрак не колебался.",
+        delay_per_1k_chars: float = 0.0,
+        fail_status: int | None = None,
+        model_delays: dict[str, float] | None = None,
+    ):
+        # delay_per_1k_chars моделирует prefill: чем длиннее промпт, тем дольше ответ
+        self.delay = delay
+        self.delay_per_1k_chars = delay_per_1k_chars
+        # Если задан — каждый запрос получает этот HTTP-статус (имитация падения)
+        self.fail_status = fail_status
+        # Своя задержка для отдельных моделей (например, лёгкая модель быстрее основной)
+        self.model_delays = model_delays or {}
+        self.models: dict[str, int] = {}
+        self.reply = reply
+        self.requests = 0
+        self._runner: web.AppRunner | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self.port: int | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def _chat(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        payload = await request.json()
+        prompt_chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+        model = payload.get("model", "")
+        self.models[model] = self.models.get(model, 0) + 1
+        delay = self.model_delays.get(model, self.delay)
+        await asyncio.sleep(delay + self.delay_per_1k_chars * prompt_chars / 1000)
+        if self.fail_status:
+            return web.json_response(
+                {"error": {"message": "stub failure", "type": "server_error"}},
+                status=self.fail_status,
+            )
+        if payload.get("stream"):
+            return await self._chat_stream(request, prompt_chars)
+        return web.json_response({
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars // 3 + 1,
+                "completion_tokens": 1,
+                "total_tokens": prompt_chars // 3 + 2,
+            },
+        })
+
+    async def _chat_stream(self, request: web.Request, prompt_chars: int) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        base = {"id": f"chatcmpl-{self.requests}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": "stub"}
+        for word in self.reply.split(" "):
+            chunk = dict(base, choices=[{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}])
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(0.01)
+        usage = {"prompt_tokens": prompt_chars // 3 + 1, "completion_tokens": 1,
+                 "total_tokens": prompt_chars // 3 + 2}
+        await response.write(f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def _images(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await request.json()
+        await asyncio.sleep(self.delay)
+        return web.json_response({
+            "created": int(time.time()),
+            "data": [{"url": f"http://127.0.0.1:{self.port}/image.png"}],
+        })
+
+    async def _image_file(self, request: web.Request) -> web.Response:
+        # Минимальный PNG-заголовок: для бенчмарка важен только размер и сам факт скачивания
+        return web.Response(body=b"\x89PNG\r\n\x1a\n" + b"\0" * 64 * 1024, content_type="image/png")
+
+    async def _start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat)
+        app.router.add_post("/v1/images/generations", self._images)
+        app.router.add_get("/image.png", self._image_file)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self) -> "StubOpenAI":
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self) -> None:
+        if self._runner:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
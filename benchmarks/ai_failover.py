@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка пула AI-провайдеров на двух локальных OpenAI-совместимых заглушках.
+
+Сценарии:
+  1. основной медленный — запрос хеджируется на запасной;
+  2. основной отвечает 500 — мгновенный переход, затем выключатель
+     убирает основной из маршрута;
+  3. то же для потокового ответа (хеджирование по первому куску).
+
+Запуск:
+    python benchmarks/ai_failover.py --slow 3 --hedge 1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import ai_client
+import ai_providers
+from ai_providers import Provider, ProviderPool, make_client
+from _stub_openai import StubOpenAI
+
+
+def _pool(primary: StubOpenAI, secondary: StubOpenAI) -> ProviderPool:
+    return ProviderPool([
+        Provider("primary", make_client("sk-bench", primary.base_url, max_retries=0), "stub"),
+        Provider("secondary", make_client("sk-bench", secondary.base_url, max_retries=0), "stub"),
+    ])
+
+
+async def _complete(pool: ProviderPool) -> tuple[float, str]:
+    started = time.perf_counter()
+    _, provider = await pool.complete(lambda p: [{"role": "user", "content": "привет"}])
+    return time.perf_counter() - started, provider.name
+
+
+async def _stream(pool: ProviderPool) -> tuple[float, str]:
+    started = time.perf_counter()
+    first_at = None
+    name = "-"
+    async for _, provider in pool.stream(lambda p: [{"role": "user", "content": "привет"}]):
+        if first_at is None:
+            first_at = time.perf_counter() - started
+            name = provider.name
+    return first_at, name
+
+
+async def _scenario(title: str, pool: ProviderPool, call, rounds: int):
+    latencies, winners = [], []
+    for _ in range(rounds):
+        latency, name = await call(pool)
+        latencies.append(latency)
+        winners.append(name)
+    print(f"\n{title}")
+    print(f"  медиана: {statistics.median(latencies):.2f} c, максимум: {max(latencies):.2f} c")
+    print("  ответили: " + ", ".join(f"{n}×{winners.count(n)}" for n in sorted(set(winners))))
+    for name, stats in pool.stats().items():
+        complete, stream = stats["complete"], stats["stream"]
+        fmt = lambda v: f"{v:.2f}" if v is not None else "—"
+        print(
+            f"  {name:<10} выключатель={stats['state']:<9} "
+            f"complete p50={fmt(complete['p50'])} p95={fmt(complete['p95'])}  "
+            f"stream p50={fmt(stream['p50'])} p95={fmt(stream['p95'])}"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slow", type=float, default=3.0, help="задержка медленного основного, сек.")
+    parser.add_argument("--fast", type=float, default=0.2, help="задержка запасного, сек.")
+    parser.add_argument("--hedge", type=float, default=1.0, help="AI_HEDGE_AFTER для прогона, сек.")
+    parser.add_argument("--rounds", type=int, default=6)
+    args = parser.parse_args()
+
+    ai_providers.AI_HEDGE_AFTER = args.hedge
+    ai_providers.AI_HEDGE_MIN = min(ai_providers.AI_HEDGE_MIN, args.hedge)
+
+    slow = StubOpenAI(delay=args.slow).start()
+    failing = StubOpenAI(delay=0.05, fail_status=500).start()
+    fast = StubOpenAI(delay=args.fast).start()
+    try:
+        print("=" * 72)
+        print(f"Заглушки: медленная {args.slow} c, быстрая {args.fast} c, хедж через {args.hedge} c")
+        print("=" * 72)
+        await _scenario("1. Основной медленный (complete)", _pool(slow, fast), _complete, args.rounds)
+        await _scenario("2. Основной падает с 500 (complete)", _pool(failing, fast), _complete, args.rounds)
+        await _scenario("3. Основной медленный (stream, время до первого куска)", _pool(slow, fast), _stream, args.rounds)
+    finally:
+        for stub in (slow, failing, fast):
+            stub.stop()
+        await ai_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
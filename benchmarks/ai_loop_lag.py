@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: задержка event loop во время N параллельных запросов к AI.
+
+Сравнивает старый путь (синхронный OpenAI внутри async-функции) с новым
+ai_client.get_response на AsyncOpenAI. Запросы идут в локальную заглушку,
+поэтому сеть и ключи не нужны.
+
+Запуск:
+    python benchmarks/ai_loop_lag.py --concurrency 10 --delay 1.0
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from openai import OpenAI
+
+import ai_client
+from ai_providers import Provider
+from _stub_openai import StubOpenAI
+
+TICK = 0.01  # период «пульса» event loop, сек.
+
+
+async def _measure_lag(stop: asyncio.Event, samples: list[float]):
+    """Каждые TICK секунд замеряет, насколько позже запланированного проснулся loop."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(TICK)
+        samples.append((loop.time() - started - TICK) * 1000)
+
+
+async def _run(label: str, call, concurrency: int) -> dict:
+    samples: list[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_measure_lag(stop, samples))
+    await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(f"вопрос {i}") for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await monitor
+    samples.sort()
+    return {
+        "label": label,
+        "elapsed": elapsed,
+        "p50": statistics.median(samples),
+        "p99": samples[int(len(samples) * 0.99) - 1],
+        "max": samples[-1],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=10, help="число параллельных запросов")
+    parser.add_argument("--delay", type=float, default=1.0, help="задержка ответа заглушки, сек.")
+    args = parser.parse_args()
+
+    stub = StubOpenAI(delay=args.delay).start()
+    try:
+        sync_client = OpenAI(api_key="sk-bench", base_url=stub.base_url)
+
+        async def old_get_response(prompt: str) -> str:
+            resp = sync_client.chat.completions.create(
+                model="stub",
+                messages=[{"role": "user", "content": prompt}],
+            )
+            return resp.choices[0].message.content
+
+        ai_client.provider_pool.providers = [
+            Provider("stub", ai_client.make_client("sk-bench", stub.base_url), "stub")
+        ]
+
+        results = [
+            await _run("sync OpenAI (было)", old_get_response, args.concurrency),
+            await _run("AsyncOpenAI (стало)", ai_client.get_response, args.concurrency),
+        ]
+    finally:
+        stub.stop()
+        await ai_client.close()
+
+    print("=" * 72)
+    print(f"Параллельных запросов: {args.concurrency}, задержка заглушки: {args.delay} c")
+    print("=" * 72)
+    print(f"{'режим':<22}{'всего, c':>10}{'лаг p50, мс':>14}{'лаг p99, мс':>14}{'лаг max, мс':>12}")
+    for r in results:
+        print(f"{r['label']:<22}{r['elapsed']:>10.2f}{r['p50']:>14.2f}{r['p99']:>14.2f}{r['max']:>12.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк маршрутизации по сложности вопроса.
+
+Показывает, куда classify_prompt отправляет типичные вопросы и почему,
+и сравнивает задержку «всё на основную модель» против маршрутизации
+на локальной заглушке, где лёгкая модель отвечает быстрее (--heavy / --light).
+Помогает подбирать пороги AI_LIGHT_MAX_CHARS и AI_LIGHT_MAX_LORE_SCORE.
+
+Запуск:
+    python benchmarks/ai_routing.py
+    python benchmarks/ai_routing.py --heavy 4 --light 0.8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import ai_client
+from ai_providers import Provider
+from _stub_openai import StubOpenAI
+
+SAMPLE_PROMPTS = [
+    "Гёдзен, привет!",
+    "доброе утро",
+    "спасибо, друг",
+    "ты тут?",
+    "как дела?",
+    "Гёдзен, кто такой Иё?",
+    "Гёдзен, какой класс лучше для новичка?",
+    "Гёдзен, расскажи про карту Кровь на Снегу",
+    "Гёдзен, как победить Сухбаатара и его мертвецов?",
+    "Гёдзен, что ты думаешь о погоде сегодня?",
+    "Гёдзен, расскажи легенду про лучника Утицунэ",
+    "Гёдзен, посоветуй, чем заняться вечером",
+    "ахаха, ну ты даёшь",
+    "а самурай сильнее ронина?",
+]
+
+
+async def _run(prompts: list[str], routing: bool) -> list[float]:
+    ai_client.AI_MODEL_ROUTING = routing
+    samples = []
+    for prompt in prompts:
+        started = time.perf_counter()
+        await ai_client.get_response(prompt, use_cache=False)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heavy", type=float, default=3.0, help="задержка основной модели, сек.")
+    parser.add_argument("--light", type=float, default=0.6, help="задержка лёгкой модели, сек.")
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("Решения классификатора")
+    print("=" * 72)
+    started = time.perf_counter()
+    decisions = [(prompt, *ai_client.classify_prompt(prompt)) for prompt in SAMPLE_PROMPTS]
+    classify_ms = (time.perf_counter() - started) * 1000 / len(SAMPLE_PROMPTS)
+    for prompt, tier, reason in decisions:
+        print(f"  {tier:<6} {prompt[:46]:<48} {reason}")
+    light = sum(1 for _, tier, _ in decisions if tier == "light")
+    print(f"\nНа лёгкую модель: {light} из {len(decisions)}; классификация ≈ {classify_ms:.2f} мс на вопрос")
+
+    stub = StubOpenAI(delay=args.heavy, model_delays={"light": args.light}).start()
+    ai_client.provider_pool.providers = [
+        Provider("stub", ai_client.make_client("sk-bench", stub.base_url), "heavy", light_model="light")
+    ]
+    try:
+        baseline = await _run(SAMPLE_PROMPTS, routing=False)
+        routed = await _run(SAMPLE_PROMPTS, routing=True)
+    finally:
+        stub.stop()
+        await ai_client.close()
+
+    print("\n" + "=" * 72)
+    print(f"Задержка на заглушке (основная {args.heavy} c, лёгкая {args.light} c)")
+    print("=" * 72)
+    for title, samples in (("всё на основную", baseline), ("маршрутизация", routed)):
+        print(
+            f"  {title:<16} медиана {statistics.median(samples):.2f} c, "
+            f"среднее {statistics.mean(samples):.2f} c, сумма {sum(samples):.1f} c"
+        )
+    print(f"  запросов по моделям: {stub.models}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
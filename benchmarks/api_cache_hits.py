@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк кэша GET-ответов api_client (api_cache.py).
+
+Моделирует поток команд /profile и /balance: одни и те же пользователи
+смотрят свой профиль по нескольку раз подряд (распределение Ципфа).
+Сравнивается работа без кэша и с кэшем; во втором прогоне TTL короткий,
+и часть запросов становится условными (If-None-Match → 304 без тела).
+
+Запуск:
+    python benchmarks/api_cache_hits.py
+    python benchmarks/api_cache_hits.py --requests 2000 --users 200 --delay 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import api_cache
+import api_client
+from _stub_api import StubAPI
+
+
+def _workload(requests: int, users: int, seed: int = 1) -> list[int]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(users)]
+    return rng.choices(range(1, users + 1), weights=weights, k=requests)
+
+
+async def _run(user_ids: list[int], concurrency: int, use_cache: bool) -> list[float]:
+    samples: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(user_id: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            async with await api_client.api_get(f"/api/user_info/{user_id}", use_cache=use_cache) as response:
+                await response.json()
+            samples.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one(user_id) for user_id in user_ids))
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.01, help="время обработки запроса API, сек.")
+    args = parser.parse_args()
+
+    stub = StubAPI(delay=args.delay, etag=True).start()
+    api_client.API_BASE_URL = stub.base_url
+    user_ids = _workload(args.requests, args.users)
+    try:
+        print("=" * 72)
+        print(
+            f"{args.requests} запросов /api/user_info, {args.users} пользователей, "
+            f"обработка {args.delay * 1000:.0f} мс"
+        )
+        print("=" * 72)
+        runs = (
+            ("без кэша", False, None),
+            ("кэш, TTL 30 c", True, None),
+            ("кэш, TTL 0.05 c + ETag", True, 0.05),
+        )
+        for title, use_cache, ttl in runs:
+            api_cache.api_cache.clear()
+            if ttl is not None:
+                api_cache.CACHE_POLICIES[0] = (api_cache.CACHE_POLICIES[0][0], ttl)
+            requests_before, not_modified_before = stub.requests, stub.not_modified
+            started = time.perf_counter()
+            samples = await _run(user_ids, args.concurrency, use_cache)
+            elapsed = time.perf_counter() - started
+            print(
+                f"  {title:<24} p50 {statistics.median(samples):6.2f} мс   "
+                f"всего {elapsed:5.2f} c   запросов к API: {stub.requests - requests_before:4d} "
+                f"(из них 304: {stub.not_modified - not_modified_before})"
+            )
+    finally:
+        await api_client.close()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк склейки одинаковых одновременных GET в api_client (singleflight).
+
+Моделирует всплеск: несколько участников одновременно смотрят профиль
+одного игрока, рассылка уведомлений разом запрашивает одни и те же
+списки подписчиков. Сравниваются отдельные запросы (как было) и api_get,
+где одинаковые запросы в полёте делят один вызов API.
+Кэш ответов отключён (use_cache=False), чтобы мерить именно склейку.
+
+Запуск:
+    python benchmarks/api_coalescing.py
+    python benchmarks/api_coalescing.py --bursts 20 --burst-size 50 --distinct 3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import api_client
+from _stub_api import StubAPI
+
+
+async def _separate(path: str) -> None:
+    async with await api_client._request("GET", path) as response:
+        await response.json()
+
+
+async def _coalesced(path: str) -> None:
+    async with await api_client.api_get(path, use_cache=False) as response:
+        await response.json()
+
+
+async def _run(call, bursts: int, burst_size: int, distinct: int) -> list[float]:
+    samples: list[float] = []
+
+    async def one(path: str) -> None:
+        started = time.perf_counter()
+        await call(path)
+        samples.append((time.perf_counter() - started) * 1000)
+
+    for burst in range(bursts):
+        paths = [f"/api/user_info/{burst * distinct + i % distinct}" for i in range(burst_size)]
+        await asyncio.gather(*(one(path) for path in paths))
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--burst-size", type=int, default=30, help="одновременных запросов во всплеске")
+    parser.add_argument("--distinct", type=int, default=2, help="разных путей во всплеске")
+    parser.add_argument("--delay", type=float, default=0.05, help="время обработки запроса API, сек.")
+    args = parser.parse_args()
+
+    stub = StubAPI(delay=args.delay).start()
+    api_client.API_BASE_URL = stub.base_url
+    try:
+        print("=" * 72)
+        print(
+            f"{args.bursts} всплесков по {args.burst_size} запросов ({args.distinct} разных путей), "
+            f"обработка {args.delay * 1000:.0f} мс"
+        )
+        print("=" * 72)
+        for title, call in (("отдельные запросы", _separate), ("склейка (api_get)", _coalesced)):
+            requests_before = stub.requests
+            samples = await _run(call, args.bursts, args.burst_size, args.distinct)
+            print(
+                f"  {title:<20} p50 {statistics.median(samples):6.1f} мс   "
+                f"макс. {max(samples):6.1f} мс   запросов к API: {stub.requests - requests_before}"
+            )
+        print(f"\n  get_flight: в API {api_client.get_flight.leaders}, получили чужой ответ {api_client.get_flight.shared}")
+    finally:
+        await api_client.close()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
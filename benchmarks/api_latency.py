@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк api_client: новая ClientSession на каждый запрос (как было)
+против общей сессии с пулом keep-alive соединений.
+
+Запросы идут в локальную заглушку miniapp_api (по умолчанию HTTPS с
+самоподписанным сертификатом, чтобы учитывалось рукопожатие TLS).
+На реальном API к каждому новому соединению добавляется ещё 2–3 RTT
+(TCP + TLS), так что выигрыш там больше, чем на loopback.
+
+Запуск:
+    python benchmarks/api_latency.py
+    python benchmarks/api_latency.py --requests 500 --concurrency 10 --no-tls
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import aiohttp
+
+import api_client
+from _stub_api import StubAPI
+
+
+async def _old_style_get(path: str) -> int:
+    """Прежнее поведение api_client: сессия создаётся и закрывается на каждый запрос."""
+    session = aiohttp.ClientSession(timeout=api_client.DEFAULT_TIMEOUT)
+    try:
+        response = await session.request("GET", api_client._build_url(path))
+        try:
+            await response.json()
+            return response.status
+        finally:
+            response.release()
+    finally:
+        await session.close()
+
+
+async def _pooled_get(path: str) -> int:
+    # Сравниваем транспорт, поэтому кэш ответов не используем
+    async with await api_client.api_get(path, use_cache=False) as response:
+        await response.json()
+        return response.status
+
+
+async def _measure(call, requests: int, concurrency: int) -> list[float]:
+    samples: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call(f"/api/user_info/{i}")
+            samples.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return samples
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.002, help="время обработки запроса заглушкой, сек.")
+    parser.add_argument("--no-tls", action="store_true", help="HTTP вместо HTTPS")
+    args = parser.parse_args()
+
+    stub = StubAPI(delay=args.delay, tls=not args.no_tls).start()
+    api_client.API_BASE_URL = stub.base_url
+    try:
+        print("=" * 72)
+        print(
+            f"{stub.base_url}: {args.requests} запросов, параллельно {args.concurrency}, "
+            f"обработка {args.delay * 1000:.0f} мс"
+        )
+        print("=" * 72)
+        for title, call in (("сессия на запрос", _old_style_get), ("общая сессия", _pooled_get)):
+            connections_before = stub.connections
+            # Прогрев: первый запрос общей сессии открывает соединения пула
+            await call("/api/user_info/0")
+            samples = await _measure(call, args.requests, args.concurrency)
+            print(
+                f"  {title:<18} p50 {statistics.median(samples):6.2f} мс   "
+                f"p99 {_percentile(samples, 0.99):6.2f} мс   "
+                f"новых соединений: {stub.connections - connections_before}"
+            )
+    finally:
+        await api_client.close()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк поведения api_client при аварии miniapp_api: выключатели по группам
+эндпоинтов и отдача устаревших ответов из кэша.
+
+Заглушка «зависает» (отвечает 503 через --hang сек., дольше таймаута клиента).
+Обработчики параллельно запрашивают сниппеты (есть в кэше, но просрочены)
+и отправляют POST (кэша нет). Сравниваются прогоны без выключателя и с ним:
+сколько длится команда и сколько запросов дошло до лежащего API.
+
+Запуск:
+    python benchmarks/api_outage.py
+    python benchmarks/api_outage.py --commands 60 --hang 3
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import aiohttp
+
+import api_cache
+import api_client
+from circuit_breaker import CircuitBreaker
+from _stub_api import StubAPI
+
+SNIPPETS = "/api/snippets/all"
+
+# Предупреждения о повторах и выключателях в каждой команде заглушили бы таблицу
+logging.getLogger("api_client").setLevel(logging.ERROR)
+logging.getLogger("circuit_breaker").setLevel(logging.ERROR)
+
+
+async def _command(i: int) -> tuple[float, str]:
+    """Одна команда пользователя: список сниппетов или запись (через одну)."""
+    started = time.perf_counter()
+    try:
+        if i % 2 == 0:
+            async with await api_client.api_get(SNIPPETS) as response:
+                await response.json()
+                outcome = "устаревшие данные" if response.stale else f"статус {response.status}"
+        else:
+            async with await api_client.api_post(f"/api/send_profile/{i}") as response:
+                outcome = f"статус {response.status}"
+    except api_client.ApiUnavailable:
+        outcome = "быстрый отказ"
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        outcome = type(e).__name__
+    return time.perf_counter() - started, outcome
+
+
+async def _run(stub: StubAPI, commands: int, concurrency: int, breaker: bool) -> None:
+    api_client._breakers.clear()
+    if not breaker:
+        # Выключатель, который никогда не срабатывает
+        for group in ("snippets", "send_profile"):
+            api_client._breakers[group] = CircuitBreaker(group, min_calls=10**9)
+    api_cache.api_cache.clear()
+    stub.down = False
+    async with await api_client.api_get(SNIPPETS) as response:
+        await response.json()
+    await asyncio.sleep(0.05)  # TTL прогрева истёк — нужен запрос к API
+    stub.down = True
+    requests_before = stub.requests
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results: list[tuple[float, str]] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            results.append(await _command(i))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(commands)))
+    elapsed = time.perf_counter() - started
+    seconds = [r[0] for r in results]
+    outcomes: dict[str, int] = {}
+    for _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    title = "с выключателем" if breaker else "без выключателя"
+    print(
+        f"  {title:<16} всего {elapsed:5.1f} c   p50 {statistics.median(seconds):5.2f} c   "
+        f"макс. {max(seconds):5.2f} c   запросов к API: {stub.requests - requests_before}"
+    )
+    print(f"  {'':<16} {outcomes}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hang", type=float, default=2.0, help="сек. до ответа лежащего API")
+    parser.add_argument("--timeout", type=float, default=1.0, help="таймаут клиента на попытку, сек.")
+    args = parser.parse_args()
+
+    stub = StubAPI().start()
+    stub.down_delay = args.hang
+    api_client.API_BASE_URL = stub.base_url
+    api_client.DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=args.timeout)
+    # Короткий TTL, чтобы прогретый ответ успел просрочиться
+    api_cache.CACHE_POLICIES.insert(0, (api_cache.re.compile(r"^/api/snippets/all$"), 0.01))
+    try:
+        print("=" * 88)
+        print(
+            f"Авария API: {args.commands} команд (параллельно {args.concurrency}), ответ через "
+            f"{args.hang:g} c, таймаут клиента {args.timeout:g} c"
+        )
+        print("=" * 88)
+        for breaker in (False, True):
+            await _run(stub, args.commands, args.concurrency, breaker)
+    finally:
+        await api_client.close()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк транспорта api_client к miniapp_api на этом же сервере:
+HTTPS по адресу (как API_BASE_URL) против HTTP на loopback и UNIX-сокета
+(API_TRANSPORT).
+
+Для каждого варианта — p50/p99 задержки и процессорное время клиента на
+запрос (поток event loop бота; заглушка работает в своём потоке и не
+учитывается). На реальном API к HTTPS добавляются DNS и обратный прокси,
+так что выигрыш там больше. В конце проверяется, что заглушка видела
+публичный Host и токен бота при любом транспорте.
+
+Запуск:
+    python benchmarks/api_transport.py
+    python benchmarks/api_transport.py --requests 2000 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import api_client
+from _stub_api import StubAPI
+
+PUBLIC_URL = "https://api.tsushimaru.com"
+
+
+async def _measure(path_for, requests: int, concurrency: int, use_bot_token: bool) -> tuple[list[float], float]:
+    samples: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            # Мимо кэша и склейки одинаковых GET: каждый запрос доходит до транспорта
+            async with await api_client._request("GET", path_for(i), use_bot_token=use_bot_token) as response:
+                await response.json()
+            samples.append((time.perf_counter() - started) * 1000)
+
+    cpu_started = time.thread_time()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return samples, (time.thread_time() - cpu_started) * 1_000_000 / requests
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.0, help="время обработки запроса заглушкой, сек.")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    socket_path = str(Path(tmpdir.name) / "miniapp_api.sock")
+    public = StubAPI(delay=args.delay, tls=True).start()
+    loopback = StubAPI(delay=args.delay).start()
+    unix = StubAPI(delay=args.delay, unix_path=socket_path).start()
+    public.subscribers = loopback.subscribers = unix.subscribers = list(range(0, 1000, 3))
+
+    # (название, API_BASE_URL, API_TRANSPORT, заглушка)
+    transports = (
+        ("HTTPS", public.base_url, None, public),
+        ("loopback", PUBLIC_URL, loopback.base_url, loopback),
+        ("unix", PUBLIC_URL, f"unix:{socket_path}", unix),
+    )
+    workloads = (
+        ("user_info", lambda i: f"/api/user_info/{i}", False),
+        ("подписчики", lambda i: "/api/notifications/legends", True),
+    )
+    try:
+        print("=" * 78)
+        print(
+            f"{args.requests} запросов, параллельно {args.concurrency}, "
+            f"обработка {args.delay * 1000:.0f} мс; CPU — клиент, мкс на запрос"
+        )
+        print("=" * 78)
+        for title, path_for, use_bot_token in workloads:
+            for name, base_url, transport, stub in transports:
+                await api_client.close()
+                api_client.API_BASE_URL = base_url
+                api_client.API_TRANSPORT = transport
+                # Прогрев: соединения пула открываются до замера
+                await _measure(path_for, args.concurrency, args.concurrency, use_bot_token)
+                samples, cpu = await _measure(path_for, args.requests, args.concurrency, use_bot_token)
+                print(
+                    f"  {title:<11} {name:<9} p50 {statistics.median(samples):6.3f} мс   "
+                    f"p99 {_percentile(samples, 0.99):6.3f} мс   CPU {cpu:6.0f} мкс"
+                )
+        print()
+        token = os.environ["BOT_TOKEN"]
+        for name, _, _, stub in transports[1:]:
+            print(f"  {name:<9} Host: {', '.join(sorted(stub.hosts))}   токен бота: {token in stub.auth}")
+    finally:
+        await api_client.close()
+        for stub in (public, loopback, unix):
+            stub.stop()
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
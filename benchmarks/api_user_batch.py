@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк пакетной загрузки пользователей (api_client.UserInfoLoader).
+
+Моделирует всплески в группе: за несколько миллисекунд приходят !п и
+!баланс про разных игроков. Сравниваются запросы по одному (api_get),
+загрузчик с пакетным эндпоинтом и загрузчик на сервере без него
+(откат на запросы по одному). Кэш ответов сбрасывается перед каждым
+прогоном и между всплесками.
+
+Запуск:
+    python benchmarks/api_user_batch.py
+    python benchmarks/api_user_batch.py --bursts 20 --burst-size 40 --delay 0.03
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import api_client
+from api_cache import api_cache
+from _stub_api import StubAPI
+
+
+async def _single(user_id: int) -> int:
+    async with await api_client.api_get(f"/api/user_info/{user_id}") as response:
+        await response.json()
+        return response.status
+
+
+async def _loader(user_id: int) -> int:
+    async with await api_client.user_info_loader.load(user_id) as response:
+        await response.json()
+        return response.status
+
+
+async def _run(call, bursts: int, burst_size: int) -> list[float]:
+    samples: list[float] = []
+
+    async def one(user_id: int) -> None:
+        started = time.perf_counter()
+        status = await call(user_id)
+        assert status == 200, status
+        samples.append((time.perf_counter() - started) * 1000)
+
+    for burst in range(bursts):
+        api_cache.clear()
+        await asyncio.gather(*(one(burst * burst_size + i) for i in range(burst_size)))
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--burst-size", type=int, default=20, help="разных пользователей во всплеске")
+    parser.add_argument("--delay", type=float, default=0.02, help="время обработки запроса API, сек.")
+    args = parser.parse_args()
+
+    stub = StubAPI(delay=args.delay, bulk=True).start()
+    api_client.API_BASE_URL = stub.base_url
+    try:
+        print("=" * 72)
+        print(
+            f"{args.bursts} всплесков по {args.burst_size} пользователей, "
+            f"обработка {args.delay * 1000:.0f} мс"
+        )
+        print("=" * 72)
+        runs = (
+            ("по одному (api_get)", _single, True),
+            ("загрузчик, пакетами", _loader, True),
+            ("загрузчик, без пакетов", _loader, False),
+        )
+        for title, call, bulk in runs:
+            stub.bulk = bulk
+            requests_before = stub.requests
+            samples = await _run(call, args.bursts, args.burst_size)
+            print(
+                f"  {title:<24} p50 {statistics.median(samples):6.1f} мс   "
+                f"макс. {max(samples):6.1f} мс   запросов к API: {stub.requests - requests_before}"
+            )
+        print(f"\n  user_info_loader: {api_client.user_info_loader.stats()}")
+    finally:
+        await api_client.close()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк рассылки уведомлений LEGENDS: прежний цикл (переслать, кнопки,
+пауза 0.05 c — по одному получателю) против broadcast.BroadcastEngine.
+
+Telegram имитируется заглушкой бота: каждый вызов занимает --rtt секунд,
+а больше --limit вызовов за скользящую секунду получают TelegramRetryAfter.
+Часть получателей подписана на узкий тип (приоритет 0) — для них отдельно
+показано время до последней доставки.
+
+Запуск:
+    python benchmarks/broadcast_fanout.py
+    python benchmarks/broadcast_fanout.py --subscribers 1000 --rtt 0.1 --rate 28
+"""
+
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+import broadcast
+
+
+class FakeBot:
+    """Заглушка Telegram: задержка на вызов и глобальный лимит вызовов в секунду."""
+
+    def __init__(self, rtt: float, limit: int, retry_after: int = 1):
+        self.rtt = rtt
+        self.limit = limit
+        self.retry_after = retry_after
+        self.calls: collections.deque[float] = collections.deque()
+        self.retry_afters = 0
+        self.buttons_at: dict[int, float] = {}
+
+    async def _call(self) -> None:
+        await asyncio.sleep(self.rtt)
+        now = time.monotonic()
+        while self.calls and now - self.calls[0] > 1.0:
+            self.calls.popleft()
+        if len(self.calls) >= self.limit:
+            self.retry_afters += 1
+            raise TelegramRetryAfter(SendMessage(chat_id=0, text=""), "Flood control exceeded", self.retry_after)
+        self.calls.append(now)
+
+    async def forward_message(self, chat_id: int, from_chat_id: int, message_id: int):
+        await self._call()
+
+    async def send_message(self, chat_id: int, text: str, reply_markup=None):
+        await self._call()
+        self.buttons_at[chat_id] = time.monotonic()
+
+
+def _steps(bot: FakeBot, user_id: int):
+    return [
+        lambda: bot.forward_message(chat_id=user_id, from_chat_id=-1, message_id=1),
+        lambda: bot.send_message(chat_id=user_id, text="🔔"),
+    ]
+
+
+async def _sequential(bot: FakeBot, recipients: list[tuple[int, int]]) -> None:
+    """Прежний handle_notification_commands: по одному, пауза 0.05 c, ошибка — получатель пропущен."""
+    for user_id, _ in recipients:
+        try:
+            for step in _steps(bot, user_id):
+                await step()
+        except TelegramRetryAfter:
+            pass
+        await asyncio.sleep(0.05)
+
+
+async def _engine(bot: FakeBot, recipients: list[tuple[int, int]], args) -> None:
+    engine = broadcast.BroadcastEngine(args.rate, args.burst, args.workers, max_attempts=5)
+    job = await engine.submit("bench", recipients, lambda user_id: _steps(bot, user_id))
+    await job.wait()
+    await engine.stop()
+
+
+def _report(title: str, bot: FakeBot, started: float, recipients: list[tuple[int, int]]) -> None:
+    delivered = {user_id: at - started for user_id, at in bot.buttons_at.items()}
+    urgent = [delivered[u] for u, priority in recipients if priority == 0 and u in delivered]
+    last = max(delivered.values()) if delivered else 0.0
+    print(
+        f"  {title:<18} доставлено {len(delivered):4d}/{len(recipients)}   последнему {last:6.1f} c   "
+        f"узкому типу {max(urgent) if urgent else 0.0:6.1f} c   RetryAfter {bot.retry_afters}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=300)
+    parser.add_argument("--urgent", type=int, default=40, help="подписчиков узкого типа (приоритет 0)")
+    parser.add_argument("--rtt", type=float, default=0.06, help="время одного вызова Telegram, сек.")
+    parser.add_argument("--limit", type=int, default=30, help="вызовов в секунду до RetryAfter")
+    parser.add_argument("--rate", type=float, default=broadcast.BROADCAST_RATE)
+    parser.add_argument("--burst", type=int, default=broadcast.BROADCAST_BURST)
+    parser.add_argument("--workers", type=int, default=broadcast.BROADCAST_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    # Узкий тип — последние в списке, как если бы API отдал их в конце
+    recipients = [(i, 0 if i >= args.subscribers - args.urgent else 1) for i in range(args.subscribers)]
+    print("=" * 92)
+    print(
+        f"{args.subscribers} подписчиков ({args.urgent} узкого типа), вызов Telegram {args.rtt * 1000:.0f} мс, "
+        f"лимит {args.limit}/с; движок: {args.rate:.0f}/с, {args.workers} воркеров"
+    )
+    print("=" * 92)
+    for title, run in (
+        ("по одному", lambda bot: _sequential(bot, recipients)),
+        ("broadcast", lambda bot: _engine(bot, recipients, args)),
+    ):
+        bot = FakeBot(args.rtt, args.limit)
+        started = time.monotonic()
+        await run(bot)
+        _report(title, bot, started, recipients)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк перезапуска посреди рассылки: рассылка только в памяти против
+рассылки через журнал (outbox.py, SQLite WAL).
+
+Telegram имитируется заглушкой бота (задержка на вызов, без лимита). Бот
+«падает», когда доставлена заданная доля получателей: воркеры отменяются
+посреди шагов. Затем запускается новый движок. Для каждого режима показано:
+сколько получателей в итоге получили уведомление, сколько шагов повторилось
+(дубли) и сколько времени занял прогон. Без журнала показаны оба исхода:
+апдейт с постом уже подтверждён (остаток рассылки теряется) или Telegram
+отдаёт его заново (рассылка начинается сначала). Отдельно проверяется, что пост,
+пришедший повторно, пропускается, что журнал после завершения пустеет, и
+сколько стоит запись в журнал без падения.
+
+Запуск:
+    python benchmarks/broadcast_restart.py
+    python benchmarks/broadcast_restart.py --subscribers 1000 --crash-at 0.3
+"""
+
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import broadcast
+from outbox import Outbox
+
+KEY = "legends:-100:1"
+
+
+class FakeBot:
+    """Заглушка Telegram: считает вызовы по (получатель, метод)."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.calls: collections.Counter[tuple[int, str]] = collections.Counter()
+
+    async def forward_message(self, chat_id: int, from_chat_id: int, message_id: int):
+        await asyncio.sleep(self.rtt)
+        self.calls[chat_id, "forward"] += 1
+
+    async def send_message(self, chat_id: int, text: str):
+        await asyncio.sleep(self.rtt)
+        self.calls[chat_id, "buttons"] += 1
+
+
+def _steps(bot: FakeBot, user_id: int, payload: dict):
+    return [
+        lambda: bot.forward_message(chat_id=user_id, from_chat_id=payload["chat_id"], message_id=payload["message_id"]),
+        lambda: bot.send_message(chat_id=user_id, text="🔔"),
+    ]
+
+
+def _engine(args, journal: Outbox | None) -> broadcast.BroadcastEngine:
+    engine = broadcast.BroadcastEngine(args.rate, args.rate, args.workers, max_attempts=5, outbox=journal)
+    engine.register("legends", _steps)
+    return engine
+
+
+async def _crash_when(bot: FakeBot, count: int) -> None:
+    while sum(1 for (_, method) in bot.calls if method == "buttons") < count:
+        await asyncio.sleep(0.005)
+
+
+async def _run(args, recipients, path: str | None, resend: bool):
+    bot = FakeBot(args.rtt)
+    payload = {"chat_id": -100, "message_id": 1}
+    started = time.monotonic()
+
+    engine = _engine(args, Outbox(path, 3600, 3600) if path else None)
+    await engine.submit_durable(bot, "legends", KEY, "bench", recipients, payload)
+    await _crash_when(bot, int(len(recipients) * args.crash_at))
+    await engine.stop()
+
+    # Новый процесс: движок с нуля, а если журнал есть — недоставленное из него
+    journal = Outbox(path, 3600, 3600) if path else None
+    engine = _engine(args, journal)
+    await engine.start(bot)
+    skipped = None
+    if resend:
+        # Telegram отдал пост заново (бот упал до подтверждения апдейта)
+        skipped = await engine.submit_durable(bot, "legends", KEY, "bench", recipients, payload) is None
+    await engine._queue.join()
+    elapsed = time.monotonic() - started
+    rows = None
+    if journal is not None:
+        stats = await journal.stats()
+        rows = sum(v for k, v in stats.items() if k not in ("open", "broadcasts"))
+    await engine.stop()
+    return bot, elapsed, rows, skipped
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--crash-at", type=float, default=0.4, help="доля доставленных к моменту падения")
+    parser.add_argument("--rtt", type=float, default=0.02, help="время одного вызова Telegram, сек.")
+    parser.add_argument("--rate", type=float, default=200.0, help="вызовов в секунду (без лимита Telegram)")
+    parser.add_argument("--workers", type=int, default=broadcast.BROADCAST_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    recipients = [(i, 0) for i in range(args.subscribers)]
+    print("=" * 96)
+    print(
+        f"{args.subscribers} получателей, падение после {args.crash_at:.0%} доставок, "
+        f"вызов Telegram {args.rtt * 1000:.0f} мс, {args.workers} воркеров"
+    )
+    print("=" * 96)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Цена журнала: без падения, Telegram мгновенный — упираемся только в запись
+        for title, path in (("память", None), ("журнал", os.path.join(tmp, "overhead.db"))):
+            fast = argparse.Namespace(rate=1e9, workers=args.workers)
+            engine = _engine(fast, Outbox(path, 3600, 3600) if path else None)
+            bot = FakeBot(0.0)
+            started = time.perf_counter()
+            job = await engine.submit_durable(bot, "legends", KEY, "bench", recipients, {"chat_id": -100, "message_id": 1})
+            await job.wait()
+            elapsed = time.perf_counter() - started
+            await engine.stop()
+            print(
+                f"  без падения, {title:<13} {len(recipients) / elapsed:8.0f} получателей/с   "
+                f"{elapsed / len(recipients) * 1000:.3f} мс на получателя"
+            )
+        print()
+        for title, path, resend in (
+            ("память, пост подтверждён", None, False),
+            ("память, пост пришёл снова", None, True),
+            ("журнал, пост пришёл снова", os.path.join(tmp, "outbox.db"), True),
+        ):
+            bot, elapsed, rows, skipped = await _run(args, recipients, path, resend)
+            got = sum(1 for user_id, _ in recipients if bot.calls[user_id, "buttons"])
+            duplicates = sum(count - 1 for count in bot.calls.values() if count > 1)
+            twice = sum(1 for user_id, _ in recipients if bot.calls[user_id, "forward"] > 1)
+            print(
+                f"  {title:<26} получили {got:4d}/{len(recipients)}   повторных шагов {duplicates:4d}   "
+                f"пост дважды {twice:4d}   {elapsed:5.1f} c"
+            )
+            if rows is not None:
+                print(f"  {'':<26} повтор поста пропущен: {skipped}, строк получателей в журнале после: {rows}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарк разбора JSON: стандартный json против json_codec (orjson)
+и словари против типизированных структур api_models.
+
+Тела ответов собраны по формату miniapp_api и Telegram Bot API:
+поиск билдов, все сниппеты, список подписчиков, user_info, getUpdates.
+Для каждого замеряется время разбора (лучшее из повторов) и память:
+пик аллокаций при разборе и сколько занимает результат (tracemalloc).
+
+Запуск:
+    python benchmarks/json_decode.py
+    python benchmarks/json_decode.py --repeat 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import json_codec
+from api_models import Build, Snippet, SubscriberList, UserInfo
+
+
+def _build(i: int) -> dict:
+    return {
+        "build_id": i,
+        "name": f"Призрак Цусимы #{i}",
+        "author": f"samurai_{i}",
+        "class": ("Самурай", "Охотник", "Убийца", "Ронин")[i % 4],
+        "tags": ["кошмар", "соло", "лук", "огонь"][: 1 + i % 4],
+        "description": "Сборка на урон огнём и уклонение. " * 4,
+        "photo_1": f"/uploads/builds/{i}_1.jpg",
+        "photo_2": f"/uploads/builds/{i}_2.jpg",
+        "is_private": False,
+        "created_at": "2025-10-01T12:00:00",
+    }
+
+
+def _snippet(i: int) -> dict:
+    return {
+        "snippet_id": i,
+        "trigger": f"гайд{i}",
+        "message": "Как пройти Кошмар без урона: держите дистанцию, используйте дымовые бомбы. " * 2,
+        "media": f"AgACAgIAAxkBAAI{i:08d}" if i % 3 == 0 else None,
+        "media_type": "photo" if i % 3 == 0 else None,
+        "user_id": 100000 + i,
+    }
+
+
+def _update(i: int) -> dict:
+    return {
+        "update_id": 900000 + i,
+        "message": {
+            "message_id": 5000 + i,
+            "from": {"id": 100000 + i, "is_bot": False, "first_name": "Дзин", "username": f"jin{i}",
+                     "language_code": "ru"},
+            "chat": {"id": -1002365374672, "title": "Legends", "is_forum": True, "type": "supergroup"},
+            "date": 1760000000 + i,
+            "message_thread_id": 847,
+            "is_topic_message": True,
+            "text": "Гёдзен, как победить Они в Кошмаре?",
+        },
+    }
+
+
+PAYLOADS = {
+    "builds.search (10)": ({"builds": [_build(i) for i in range(10)]},
+                           lambda d: [Build.from_dict(b) for b in d["builds"]]),
+    "snippets/all (200)": ({"snippets": [_snippet(i) for i in range(200)]},
+                           lambda d: [Snippet.from_dict(s) for s in d["snippets"]]),
+    "подписчики (2000)": ({"subscribers": list(range(100000, 102000))},
+                          lambda d: SubscriberList.from_dict("ghost", d)),
+    "user_info": ({"user_id": 1053983438, "balance": 1250, "username": "jin", "psn_id": "Jin_Sakai"},
+                  UserInfo.from_dict),
+    "getUpdates (100)": ({"ok": True, "result": [_update(i) for i in range(100)]}, None),
+}
+
+
+def _best(func, repeat: int) -> float:
+    timer = timeit.Timer(func)
+    loops = max(1, repeat // 5)
+    return min(timer.repeat(repeat=5, number=loops)) / loops * 1e6
+
+
+def _memory(func) -> tuple[int, int]:
+    """(пик аллокаций при разборе, память результата), байт."""
+    tracemalloc.start()
+    result = func()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    print("=" * 96)
+    print(f"json_codec: {json_codec.BACKEND}")
+    print("=" * 96)
+    print(f"  {'тело':<20} {'размер':>8}  {'вариант':<26} {'мкс':>9}  {'пик, КБ':>8}  {'результат, КБ':>13}")
+    for title, (payload, to_struct) in PAYLOADS.items():
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        variants = [
+            ("json.loads", lambda: json.loads(body)),
+            (f"json_codec ({json_codec.BACKEND})", lambda: json_codec.loads(body)),
+        ]
+        if to_struct is not None:
+            variants.append(("json_codec + структуры", lambda: to_struct(json_codec.loads(body))))
+        for name, func in variants:
+            micros = _best(func, args.repeat)
+            peak, retained = _memory(func)
+            print(
+                f"  {title:<20} {len(body) / 1024:6.1f}КБ  {name:<26} {micros:9.1f}  "
+                f"{peak / 1024:8.1f}  {retained / 1024:13.1f}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
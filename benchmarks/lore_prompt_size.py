@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: размер промпта и задержка ответа — полный gyozen_style против
+ядра персоны + разделов лора, выбранных lore_retriever.
+
+По умолчанию запросы идут в локальную заглушку, где время ответа растёт
+с длиной промпта (--per-1k секунд на 1000 символов — модель prefill).
+С флагом --live запросы уходят настоящему провайдеру из .env (тратит токены!),
+а в таблице — prompt_tokens из ответа провайдера.
+
+Запуск:
+    python benchmarks/lore_prompt_size.py
+    python benchmarks/lore_prompt_size.py --live --rounds 1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import ai_client
+from ai_providers import Provider
+from _stub_openai import StubOpenAI
+from dialogue_styles import gyozen_style
+
+SAMPLE_PROMPTS = [
+    "Гёдзен, привет!",
+    "Гёдзен, кто такой Иё?",
+    "Гёдзен, какой класс лучше для новичка?",
+    "Гёдзен, расскажи про карту Кровь на Снегу",
+    "Гёдзен, как победить Сухбаатара и его мертвецов?",
+    "Гёдзен, что ты думаешь о погоде сегодня?",
+    "Гёдзен, расскажи легенду про лучника Утицунэ",
+    "Гёдзен, посоветуй, чем заняться вечером",
+]
+
+
+async def _latency(prompt: str, rounds: int) -> tuple[float, int]:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await ai_client.get_response(prompt, use_cache=False)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), ai_client.prompt_token_stats.last
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="настоящий провайдер вместо заглушки")
+    parser.add_argument("--rounds", type=int, default=3, help="повторов на каждый вопрос")
+    parser.add_argument("--per-1k", type=float, default=0.05, help="заглушка: сек. на 1000 символов промпта")
+    args = parser.parse_args()
+
+    stub = None
+    if not args.live:
+        stub = StubOpenAI(delay=0.2, delay_per_1k_chars=args.per_1k).start()
+        ai_client.provider_pool.providers = [
+            Provider("stub", ai_client.make_client("sk-bench", stub.base_url), "stub")
+        ]
+
+    rows = []
+    try:
+        for prompt in SAMPLE_PROMPTS:
+            retrieved = ai_client.build_system_prompt(prompt)
+            ai_client.AI_LORE_RETRIEVAL = False
+            full_latency, full_tokens = await _latency(prompt, args.rounds)
+            ai_client.AI_LORE_RETRIEVAL = True
+            lore_latency, lore_tokens = await _latency(prompt, args.rounds)
+            rows.append((
+                prompt,
+                ai_client.estimate_tokens(gyozen_style),
+                ai_client.estimate_tokens(retrieved),
+                full_tokens,
+                lore_tokens,
+                full_latency,
+                lore_latency,
+            ))
+    finally:
+        if stub:
+            stub.stop()
+        await ai_client.close()
+
+    source = "провайдер" if args.live else "заглушка"
+    print("=" * 100)
+    print(f"Оценка токенов system-промпта и prompt_tokens по usage ({source}), медиана задержки из {args.rounds}")
+    print("=" * 100)
+    print(f"{'вопрос':<48}{'оценка full':>12}{'оценка RAG':>11}{'usage full':>11}{'usage RAG':>10}{'full, c':>9}{'RAG, c':>8}")
+    for prompt, est_full, est_lore, full_tokens, lore_tokens, full_latency, lore_latency in rows:
+        print(
+            f"{prompt[:46]:<48}{est_full:>12}{est_lore:>11}{full_tokens:>11}{lore_tokens:>10}"
+            f"{full_latency:>9.2f}{lore_latency:>8.2f}"
+        )
+    total_full = sum(r[3] for r in rows)
+    total_lore = sum(r[4] for r in rows)
+    print("-" * 100)
+    print(f"prompt_tokens всего: {total_full} → {total_lore} ({1 - total_lore / total_full:.0%} экономии)")
+    print(
+        f"Медиана задержки: {statistics.median(r[5] for r in rows):.2f} c → "
+        f"{statistics.median(r[6] for r in rows):.2f} c"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк сбора подписчиков для поста в LEGENDS: прежний путь (GET
+/api/notifications/{type} по очереди на каждую команду поста) против
+индекса подписок в памяти (subscription_index).
+
+API — локальная заглушка по HTTPS с задержкой обработки (--delay). Для
+прежнего пути показаны оба случая: кэш ответов пуст (после переключения
+подписки он сбрасывается) и тёплый. В конце проверяется, что переключение
+подписки видно в индексе сразу, без запросов к API.
+
+Запуск:
+    python benchmarks/notification_lookup.py
+    python benchmarks/notification_lookup.py --posts 500 --commands 3 --delay 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import api_client
+from _stub_api import StubAPI
+from api_cache import api_cache
+from api_models import SubscriberList
+from subscription_index import SubscriptionIndex
+
+TYPES = ["check", "speedrun", "raid", "ghost", "hellmode", "story", "rivals", "trials"]
+
+
+async def _via_api(commands: list[str]) -> set[int]:
+    """Как было в handle_notification_commands: GET на каждую команду по очереди."""
+    subscribers: set[int] = set()
+    for notification_type in commands:
+        async with await api_client.api_get(f"/api/notifications/{notification_type}", use_bot_token=True) as response:
+            subscribers.update(SubscriberList.from_dict(notification_type, await response.json()).subscribers)
+    return subscribers
+
+
+async def _via_index(index: SubscriptionIndex, commands: list[str]) -> set[int]:
+    by_type = {t: await index.subscribers(t) for t in commands}
+    return set().union(*by_type.values())
+
+
+async def _measure(lookup, posts: int, commands: int, before_each=None) -> list[float]:
+    samples = []
+    for i in range(posts):
+        if before_each:
+            before_each()
+        picked = [TYPES[(i + k) % len(TYPES)] for k in range(commands)]
+        started = time.perf_counter()
+        await lookup(picked)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--commands", type=int, default=3, help="команд уведомлений в одном посте")
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=0.03, help="время обработки запроса заглушкой, сек.")
+    args = parser.parse_args()
+
+    stub = StubAPI(delay=args.delay, tls=True).start()
+    stub.subscribers = list(range(args.subscribers))
+    api_client.API_BASE_URL = stub.base_url
+    index = SubscriptionIndex(refresh_interval=3600)
+    index.track(TYPES)
+    try:
+        print("=" * 78)
+        print(
+            f"{args.posts} постов по {args.commands} команды, {args.subscribers} подписчиков на режим, "
+            f"API {args.delay * 1000:.0f} мс + HTTPS"
+        )
+        print("=" * 78)
+        cases = (
+            ("API, кэш пуст", _via_api, api_cache.clear),
+            ("API, кэш тёплый", _via_api, None),
+            ("индекс", lambda commands: _via_index(index, commands), None),
+        )
+        for title, lookup, before_each in cases:
+            if title == "индекс":
+                started = time.perf_counter()
+                await asyncio.gather(*(index.refresh(t) for t in TYPES))
+                print(f"  загрузка индекса при запуске: {(time.perf_counter() - started) * 1000:.1f} мс")
+            requests_before = stub.requests
+            samples = await _measure(lookup, args.posts, args.commands, before_each)
+            print(
+                f"  {title:<16} p50 {statistics.median(samples):8.3f} мс   max {max(samples):8.3f} мс   "
+                f"запросов к API {stub.requests - requests_before}"
+            )
+
+        requests_before = stub.requests
+        user_id = args.subscribers + 1
+        index.apply_toggle(user_id, "raid", True)
+        subscribed = user_id in await index.subscribers("raid")
+        index.apply_toggle(user_id, "raid", False)
+        unsubscribed = user_id not in await index.subscribers("raid")
+        print(
+            f"\n  переключение видно сразу: подписка {subscribed}, отписка {unsubscribed}, "
+            f"запросов к API {stub.requests - requests_before}"
+        )
+    finally:
+        await api_client.close()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
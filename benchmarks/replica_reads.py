@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк чтения: REST API miniapp_api (заглушка по HTTPS, общая сессия)
+против локальной реплики (пул aiosqlite только для чтения к базе в WAL).
+
+База создаётся во временном каталоге по схеме, которую ждёт api_replica
+(users, notifications, snippets). Во время замера отдельный поток пишет
+в базу (как miniapp_api) — в WAL чтение бота его не ждёт.
+
+Запуск:
+    python benchmarks/replica_reads.py
+    python benchmarks/replica_reads.py --requests 2000 --concurrency 20 --no-writer
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import api_client
+from _stub_api import StubAPI
+from api_replica import ReadReplica
+
+USERS = 1000
+
+
+def _create_db(path: Path) -> None:
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode = WAL")
+    db.executescript(
+        """
+        CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, psn_id TEXT, balance INTEGER);
+        CREATE TABLE notifications (user_id INTEGER PRIMARY KEY, legends INTEGER, raids INTEGER);
+        CREATE TABLE snippets (snippet_id INTEGER PRIMARY KEY, user_id INTEGER, trigger TEXT, message TEXT);
+        """
+    )
+    db.executemany(
+        "INSERT INTO users VALUES (?, ?, ?, ?)",
+        [(i, f"user{i}", f"psn{i}", i % 1000) for i in range(USERS)],
+    )
+    db.executemany(
+        "INSERT INTO notifications VALUES (?, ?, ?)",
+        [(i, i % 3 == 0, i % 5 == 0) for i in range(USERS)],
+    )
+    db.executemany(
+        "INSERT INTO snippets VALUES (?, ?, ?, ?)",
+        [(i, i % 50, f"trigger{i}", "text " * 20) for i in range(200)],
+    )
+    db.commit()
+    db.close()
+
+
+def _writer(path: Path, stop: threading.Event, counter: list[int]) -> None:
+    """Пишет в базу, как miniapp_api: короткие транзакции обновления баланса."""
+    db = sqlite3.connect(path)
+    while not stop.is_set():
+        db.execute("UPDATE users SET balance = balance + 1 WHERE user_id = ?", (counter[0] % USERS,))
+        db.commit()
+        counter[0] += 1
+        time.sleep(0.001)
+    db.close()
+
+
+async def _measure(path_for, requests: int, concurrency: int) -> list[float]:
+    samples: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            async with await api_client.api_get(path_for(i), use_cache=False) as response:
+                await response.json()
+            samples.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return samples
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--pool", type=int, default=4, help="соединений реплики")
+    parser.add_argument("--delay", type=float, default=0.002, help="время обработки запроса заглушкой, сек.")
+    parser.add_argument("--no-tls", action="store_true", help="HTTP вместо HTTPS")
+    parser.add_argument("--no-writer", action="store_true", help="без параллельной записи в базу")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="replica-bench-"))
+    db_path = workdir / "app.db"
+    _create_db(db_path)
+
+    stub = StubAPI(delay=args.delay, tls=not args.no_tls).start()
+    stub.subscribers = [i for i in range(USERS) if i % 3 == 0]
+    api_client.API_BASE_URL = stub.base_url
+    stop = threading.Event()
+    writes = [0]
+    writer = threading.Thread(target=_writer, args=(db_path, stop, writes), daemon=True)
+    if not args.no_writer:
+        writer.start()
+
+    workloads = (
+        ("user_info", "user_info", lambda i: f"/api/user_info/{i % USERS}"),
+        ("подписчики", "notifications", lambda i: "/api/notifications/legends"),
+        ("сниппет", "snippets", lambda i: f"/api/snippets/{i % 200}"),
+    )
+    try:
+        print("=" * 76)
+        print(
+            f"{args.requests} запросов, параллельно {args.concurrency}; REST: {stub.base_url}, "
+            f"обработка {args.delay * 1000:.0f} мс; реплика: {args.pool} соединений"
+        )
+        print("=" * 76)
+        for title, endpoint, path_for in workloads:
+            for backend in ("REST", "реплика"):
+                api_client.replica = ReadReplica(
+                    str(db_path), {endpoint} if backend == "реплика" else set(), args.pool
+                )
+                # Прогрев: соединения пула (HTTPS или SQLite) открываются до замера
+                await _measure(path_for, args.concurrency, args.concurrency)
+                samples = await _measure(path_for, args.requests, args.concurrency)
+                await api_client.replica.close()
+                print(
+                    f"  {title:<11} {backend:<8} p50 {statistics.median(samples):7.3f} мс   "
+                    f"p99 {_percentile(samples, 0.99):7.3f} мс"
+                )
+        if not args.no_writer:
+            print(f"\n  записей в базу за время замера: {writes[0]}")
+    finally:
+        stop.set()
+        await api_client.close()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк дедлайнов апдейтов: разбор затора после простоя бота.
+
+Через Dispatcher прогоняется пачка сообщений разного возраста (как после
+перезапуска бота — часть из них старше SLO), обработчик ходит в медленную
+заглушку miniapp_api. Без DeadlineMiddleware каждый апдейт ждёт API
+полностью; с ним старые пропускаются, а не уложившиеся в SLO обрываются.
+Часть апдейтов — из чатов, где команда не обслуживается: их отсекает фильтр
+обработчика, и ответа «повтори команду» они не получают.
+
+Запуск:
+    python benchmarks/update_backlog.py
+    python benchmarks/update_backlog.py --updates 200 --stale-share 0.5 --foreign-share 0.3 --slo 5
+"""
+
+import argparse
+import asyncio
+import datetime
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import Chat, Message, Update, User
+
+import api_client
+import deadline
+from api_cache import api_cache
+from _stub_api import StubAPI
+
+SERVED_CHAT = 1
+FOREIGN_CHAT = 2
+
+
+def _update(update_id: int, age: float, chat_id: int) -> Update:
+    sent = datetime.datetime.fromtimestamp(time.time() - age, tz=datetime.timezone.utc)
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=sent,
+            chat=Chat(id=chat_id, type="private"),
+            from_user=User(id=update_id, is_bot=False, first_name="bench"),
+            text="!п",
+        ),
+    )
+
+
+class _OfflineSession(AiohttpSession):
+    """Ответы бота («повтори команду» при пропуске) не уходят в Telegram, а считаются."""
+
+    def __init__(self):
+        super().__init__()
+        self.sent: dict[int, int] = {SERVED_CHAT: 0, FOREIGN_CHAT: 0}
+
+    async def make_request(self, bot, method, timeout=None):
+        self.sent[method.chat_id] += 1
+
+
+async def _run(stub: StubAPI, updates: list[Update], with_deadline: bool, slo: float, concurrency: int) -> dict:
+    router = Router()
+    done = {"answered": 0, "failed": 0}
+
+    # Как у !п: контекст — фильтр, апдейты из чужих чатов до дедлайна не доходят
+    @router.message(F.chat.id == SERVED_CHAT, flags={"slo": slo})
+    async def profile(message: Message):
+        # Как !п: профиль из API, мимо кэша — каждый апдейт доходит до заглушки
+        try:
+            async with await api_client.api_get(f"/api/user_info/{message.from_user.id}", use_cache=False):
+                done["answered"] += 1
+        except deadline.DeadlineExceeded:
+            raise
+        except Exception:
+            done["failed"] += 1
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    if with_deadline:
+        dp.message.middleware(deadline.DeadlineMiddleware())
+    session = _OfflineSession()
+    bot = Bot("0:bench", session=session)
+    skipped_before = deadline.EXPIRED_TOTAL.value(handler="profile", stage="skipped")
+    cut_before = deadline.EXPIRED_TOTAL.value(handler="profile", stage="cut")
+    requests_before = stub.requests
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def feed(update: Update) -> None:
+        async with semaphore:
+            await dp.feed_update(bot, update)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(feed(update) for update in updates))
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return {
+        **done,
+        "skipped": deadline.EXPIRED_TOTAL.value(handler="profile", stage="skipped") - skipped_before,
+        "cut": deadline.EXPIRED_TOTAL.value(handler="profile", stage="cut") - cut_before,
+        "api": stub.requests - requests_before,
+        "notified": session.sent[SERVED_CHAT],
+        "notified_foreign": session.sent[FOREIGN_CHAT],
+        "seconds": elapsed,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--stale-share", type=float, default=0.6, help="доля апдейтов старше SLO")
+    parser.add_argument("--foreign-share", type=float, default=0.2, help="доля апдейтов из чужих чатов")
+    parser.add_argument("--slo", type=float, default=3.0, help="SLO обработчика, сек.")
+    parser.add_argument("--concurrency", type=int, default=10, help="апдейтов в обработке одновременно")
+    parser.add_argument("--delay", type=float, default=1.0, help="ответ заглушки, сек. (API тормозит)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    stub = StubAPI(delay=args.delay).start()
+    api_client.API_BASE_URL = stub.base_url
+    stale = int(args.updates * args.stale_share)
+    # Каждый step-й апдейт — из чужого чата
+    step = max(1, round(1 / args.foreign_share)) if args.foreign_share > 0 else args.updates + 1
+    foreign = sum(1 for i in range(args.updates) if i % step == 0)
+    try:
+        print("=" * 78)
+        print(
+            f"{args.updates} апдейтов ({stale} старше SLO {args.slo:.0f} c, {foreign} из чужих чатов), "
+            f"параллельно {args.concurrency}, "
+            f"API отвечает за {args.delay:.1f} c"
+        )
+        print("=" * 78)
+        for title, with_deadline in (("без дедлайна", False), ("с дедлайном", True)):
+            # Старые апдейты идут первыми, как в очереди getUpdates; возраст считается в момент прогона
+            # Иначе прерванные запросы получат устаревший ответ из кэша прошлого прогона
+            api_cache.clear()
+            updates = [
+                _update(i, args.slo * 2 if i < stale else 0.0, FOREIGN_CHAT if i % step == 0 else SERVED_CHAT)
+                for i in range(args.updates)
+            ]
+            result = await _run(stub, updates, with_deadline, args.slo, args.concurrency)
+            print(
+                f"  {title:<13} {result['seconds']:6.1f} c   ответили {result['answered']:4d}   "
+                f"пропущено {result['skipped']:4.0f}   прервано {result['cut']:4.0f}   "
+                f"запросов к API {result['api']}   «повтори команду» {result['notified']} "
+                f"(в чужие чаты {result['notified_foreign']})"
+            )
+    finally:
+        await api_client.close()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
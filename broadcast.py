@@ -0,0 +1,382 @@
+"""
+Рассылка сообщений в личку многим пользователям (уведомления LEGENDS).
+
+Доставки ставятся в очередь с приоритетом и разбираются пулом воркеров;
+все вызовы Telegram проходят через общий токен-бакет (BROADCAST_RATE в
+секунду, всплеск до BROADCAST_BURST) — так рассылка идёт на пределе лимитов
+Telegram, а не по одному сообщению с паузой. TelegramRetryAfter
+останавливает весь бакет на указанное время, после чего шаг повторяется.
+
+Доставка — последовательность шагов (например, переслать пост и отправить
+кнопки); при повторе она продолжается с упавшего шага, без дублей.
+
+Рассылки через submit_durable пишутся в журнал на диске (outbox.py) с
+отметкой каждого шага; после перезапуска недоставленное продолжается
+(start), повторный пост с тем же ключом пропускается. Шаги такой рассылки
+строятся заново из payload — функцией, зарегистрированной через register.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError,
+)
+
+from config import BROADCAST_BURST, BROADCAST_MAX_ATTEMPTS, BROADCAST_RATE, BROADCAST_WORKERS
+from metrics import registry
+from outbox import OUTBOX_RESUMED, Outbox, outbox
+
+logger = logging.getLogger(__name__)
+
+# Рассылка на сотни получателей идёт минутами — корзины шире, чем у запросов
+BROADCAST_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+DELIVERY_SECONDS = registry.histogram(
+    "gyozenbot_broadcast_delivery_seconds",
+    "Время от поста до доставки уведомления получателю",
+    buckets=BROADCAST_BUCKETS,
+)
+COMPLETION_SECONDS = registry.histogram(
+    "gyozenbot_broadcast_completion_seconds",
+    "Время от поста до последней доставки рассылки",
+    buckets=BROADCAST_BUCKETS,
+)
+MESSAGES_TOTAL = registry.counter(
+    "gyozenbot_broadcast_messages_total",
+    "Вызовы Telegram в рассылках: sent, retry_after, error",
+    ("result",),
+)
+DELIVERIES_TOTAL = registry.counter(
+    "gyozenbot_broadcast_deliveries_total", "Доставки получателям: delivered, failed", ("result",)
+)
+QUEUED = registry.gauge("gyozenbot_broadcast_queued", "Доставки в очереди рассылки")
+
+Step = Callable[[], Awaitable[Any]]
+# Шаги доставки для рассылки из журнала: (bot, user_id, payload) -> шаги
+StepsFactory = Callable[[Bot, int, dict], list[Step]]
+
+# Пауза перед повтором после сетевой ошибки или 5xx Telegram, сек.
+NETWORK_RETRY_DELAY = 1.0
+
+
+class TokenBucket:
+    """Токен-бакет: rate токенов в секунду, не больше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        # Ожидающие получают токены по очереди, без гонки за каждый новый
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Telegram попросил подождать (RetryAfter): ни одного вызова до истечения паузы."""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = now
+
+
+class Broadcast:
+    """Одна рассылка: счётчики доставок и событие завершения."""
+
+    def __init__(self, label: str, posted_at: float, total: int, outbox_id: int | None = None):
+        self.label = label
+        self.posted_at = posted_at
+        self.total = total
+        # id в журнале рассылок; None — рассылка только в памяти
+        self.outbox_id = outbox_id
+        self.delivered = 0
+        self.failed = 0
+        self.finished = asyncio.Event()
+        if total == 0:
+            self.finished.set()
+
+    def _record(self, ok: bool) -> bool:
+        """Учитывает итог доставки; True — это была последняя (finished ставит воркер)."""
+        now = time.time()
+        if ok:
+            self.delivered += 1
+            DELIVERY_SECONDS.observe(max(0.0, now - self.posted_at))
+        else:
+            self.failed += 1
+        DELIVERIES_TOTAL.inc(result="delivered" if ok else "failed")
+        if self.delivered + self.failed == self.total:
+            elapsed = max(0.0, now - self.posted_at)
+            COMPLETION_SECONDS.observe(elapsed)
+            logger.info(
+                f"Рассылка {self.label}: доставлено {self.delivered} из {self.total} "
+                f"за {elapsed:.1f} c от поста"
+            )
+            return True
+        return False
+
+    async def wait(self) -> None:
+        await self.finished.wait()
+
+
+@dataclass(slots=True)
+class _Delivery:
+    broadcast: Broadcast
+    user_id: int
+    steps: list[Step]
+    step: int = 0
+    attempts: int = 0
+
+
+class BroadcastEngine:
+    """Очередь доставок с приоритетом, пул воркеров и общий токен-бакет."""
+
+    def __init__(
+        self, rate: float, burst: int, workers: int, max_attempts: int, outbox: Outbox | None = None
+    ):
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.outbox = outbox
+        self._kinds: dict[str, StepsFactory] = {}
+        self._bot: Bot | None = None
+        self._resumed = False
+        # Элементы — (приоритет, порядковый номер, доставка): номер уникален, до доставки сравнение не доходит
+        self._queue: asyncio.PriorityQueue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._seq = itertools.count()
+
+    def register(self, kind: str, steps_for: StepsFactory) -> None:
+        """Вид рассылки для журнала: по нему шаги строятся заново после перезапуска."""
+        self._kinds[kind] = steps_for
+
+    async def start(self, bot: Bot | None = None) -> None:
+        """
+        Запускает воркеры (вызывается при запуске бота; иначе — при первой рассылке)
+        и один раз возобновляет недоставленное из журнала — для этого нужен bot.
+        """
+        if bot is not None and self._bot is None:
+            self._bot = bot
+        if not self._tasks:
+            self._queue = asyncio.PriorityQueue()
+            # Чистый контекст: воркеры не наследуют дедлайн апдейта, в котором их запустили
+            context = contextvars.Context()
+            self._tasks = [
+                asyncio.create_task(self._worker(), name=f"broadcast-{i}", context=context)
+                for i in range(self.workers)
+            ]
+        if self.outbox is not None and self._bot is not None and not self._resumed:
+            self._resumed = True
+            await self._resume()
+
+    async def stop(self) -> None:
+        """
+        Останавливает воркеры (вызывается при остановке бота). Недоставленное из
+        журнала продолжится после запуска, рассылки только в памяти теряются.
+        """
+        tasks, self._tasks = self._tasks, []
+        if self._queue is not None and self._queue.qsize():
+            logger.warning(f"Рассылка остановлена, не доставлено: {self._queue.qsize()}")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue = None
+        self._resumed = False
+        QUEUED.set(0)
+        if self.outbox is not None:
+            await self.outbox.close()
+
+    async def submit(
+        self,
+        label: str,
+        recipients: Iterable[tuple[int, int]],
+        steps_for: Callable[[int], list[Step]],
+        *,
+        posted_at: float | None = None,
+    ) -> Broadcast:
+        """
+        Ставит рассылку в очередь и сразу возвращает Broadcast (дождаться — await broadcast.wait()).
+
+        recipients — пары (user_id, приоритет), меньший приоритет уходит раньше;
+        steps_for(user_id) — шаги доставки одному получателю;
+        posted_at — время поста (time.time()), от него считаются задержки доставки.
+        """
+        await self.start()
+        recipients = list(recipients)
+        broadcast = Broadcast(label, time.time() if posted_at is None else posted_at, len(recipients))
+        for user_id, priority in recipients:
+            self._enqueue(priority, _Delivery(broadcast, user_id, steps_for(user_id)))
+        QUEUED.inc(len(recipients))
+        return broadcast
+
+    async def submit_durable(
+        self,
+        bot: Bot,
+        kind: str,
+        key: str,
+        label: str,
+        recipients: Iterable[tuple[int, int]],
+        payload: dict,
+        *,
+        posted_at: float | None = None,
+    ) -> Broadcast | None:
+        """
+        Как submit, но рассылка сначала пишется в журнал: переживает перезапуск.
+
+        kind — вид из register (шаги строятся из payload, payload — JSON);
+        key — ключ рассылки: если он уже в журнале (повторный пост), возвращается None.
+        Журнал недоступен — рассылка идёт только в памяти.
+        """
+        await self.start(bot)
+        steps_for = self._kinds[kind]
+        recipients = list(recipients)
+        posted_at = time.time() if posted_at is None else posted_at
+        outbox_id = None
+        if self.outbox is not None and self.outbox.enabled:
+            try:
+                await self.outbox.open()
+                if self.outbox.is_open:
+                    outbox_id = await self.outbox.add(key, kind, label, payload, posted_at, recipients)
+                    if outbox_id is None:
+                        logger.info(f"Рассылка {key} уже в журнале — повтор пропущен")
+                        return None
+            except sqlite3.Error as e:
+                logger.warning(f"Журнал рассылок: не удалось записать {key}, рассылка только в памяти: {e}")
+        broadcast = Broadcast(label, posted_at, len(recipients), outbox_id)
+        for user_id, priority in recipients:
+            self._enqueue(priority, _Delivery(broadcast, user_id, steps_for(bot, user_id, payload)))
+        QUEUED.inc(len(recipients))
+        return broadcast
+
+    def _enqueue(self, priority: int, delivery: _Delivery) -> None:
+        self._queue.put_nowait((priority, next(self._seq), delivery))
+
+    async def _resume(self) -> None:
+        """Ставит в очередь недоставленное из журнала (после перезапуска — с сохранённого шага)."""
+        try:
+            await self.outbox.open()
+            if not self.outbox.is_open:
+                return
+            pending = await self.outbox.pending()
+        except sqlite3.Error as e:
+            logger.warning(f"Журнал рассылок: не удалось прочитать недоставленное: {e}")
+            return
+        resumed = 0
+        for saved in pending:
+            steps_for = self._kinds.get(saved.kind)
+            if steps_for is None:
+                logger.warning(f"Журнал рассылок: неизвестный вид {saved.kind}, рассылка {saved.label} пропущена")
+                continue
+            broadcast = Broadcast(saved.label, saved.posted_at, len(saved.deliveries), saved.id)
+            for user_id, priority, step, attempts in saved.deliveries:
+                steps = steps_for(self._bot, user_id, saved.payload)
+                self._enqueue(priority, _Delivery(broadcast, user_id, steps, step, attempts))
+            resumed += len(saved.deliveries)
+        if resumed:
+            QUEUED.inc(resumed)
+            OUTBOX_RESUMED.inc(resumed)
+            logger.info(f"Журнал рассылок: возобновлено рассылок {len(pending)}, доставок {resumed}")
+
+    async def _journal(self, delivery: _Delivery, write: Callable[[Outbox], Awaitable[None]]) -> None:
+        """Отметка в журнале; ошибка записи не останавливает доставку (после падения шаг может повториться)."""
+        if delivery.broadcast.outbox_id is None:
+            return
+        try:
+            await write(self.outbox)
+        except sqlite3.Error as e:
+            logger.warning(f"Журнал рассылок: не удалось отметить доставку {delivery.user_id}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "workers": len(self._tasks),
+            "rate": self.bucket.rate,
+        }
+
+    async def _worker(self) -> None:
+        queue = self._queue
+        while True:
+            _, _, delivery = await queue.get()
+            # task_done — после отметки итога в журнале: queue.join() означает «всё учтено»
+            try:
+                try:
+                    ok = await self._deliver(delivery)
+                except Exception:
+                    logger.exception(f"Рассылка {delivery.broadcast.label}: сбой доставки {delivery.user_id}")
+                    ok = False
+                finally:
+                    QUEUED.dec()
+                broadcast = delivery.broadcast
+                await self._journal(delivery, lambda o: o.complete(broadcast.outbox_id, delivery.user_id, ok))
+                if broadcast._record(ok):
+                    await self._journal(delivery, lambda o: o.finish(broadcast.outbox_id))
+                    broadcast.finished.set()
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, delivery: _Delivery) -> bool:
+        while delivery.step < len(delivery.steps):
+            await self.bucket.acquire()
+            try:
+                await delivery.steps[delivery.step]()
+            except TelegramRetryAfter as e:
+                MESSAGES_TOTAL.inc(result="retry_after")
+                self.bucket.pause(e.retry_after)
+                logger.warning(f"Рассылка {delivery.broadcast.label}: лимит Telegram, пауза {e.retry_after} c")
+                if not self._can_retry(delivery):
+                    return False
+                continue
+            except (TelegramNetworkError, TelegramServerError) as e:
+                MESSAGES_TOTAL.inc(result="error")
+                if not self._can_retry(delivery):
+                    logger.warning(f"Не удалось доставить уведомление {delivery.user_id}: {e}")
+                    return False
+                await asyncio.sleep(NETWORK_RETRY_DELAY)
+                continue
+            except TelegramAPIError as e:
+                # Бот заблокирован, чат не найден и т. п. — повтор не поможет
+                MESSAGES_TOTAL.inc(result="error")
+                logger.info(f"Не удалось доставить уведомление {delivery.user_id}: {e}")
+                return False
+            MESSAGES_TOTAL.inc(result="sent")
+            delivery.step += 1
+            if delivery.step < len(delivery.steps):
+                # Последний шаг отмечает complete в воркере
+                await self._journal(
+                    delivery,
+                    lambda o: o.checkpoint(
+                        delivery.broadcast.outbox_id, delivery.user_id, delivery.step, delivery.attempts
+                    ),
+                )
+        return True
+
+    def _can_retry(self, delivery: _Delivery) -> bool:
+        delivery.attempts += 1
+        return delivery.attempts < self.max_attempts
+
+
+broadcaster = BroadcastEngine(
+    BROADCAST_RATE, BROADCAST_BURST, BROADCAST_WORKERS, BROADCAST_MAX_ATTEMPTS, outbox=outbox
+)
@@ -0,0 +1,96 @@
+"""Автоматический выключатель (circuit breaker) для внешних сервисов."""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Следит за долей ошибок в последних window вызовах.
+
+    - closed: вызовы идут как обычно;
+    - open: доля ошибок достигла failure_ratio (при минимум min_calls вызовах) —
+      вызовы сразу отклоняются в течение recovery_time секунд;
+    - half_open: пропускается не больше half_open_max пробных вызовов; успех
+      закрывает выключатель, ошибка снова открывает его.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_ratio: float = 0.5,
+        recovery_time: float = 30.0,
+        half_open_max: int = 1,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.recovery_time = recovery_time
+        self.half_open_max = half_open_max
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_time:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def allow(self) -> bool:
+        """Можно ли сейчас делать вызов. В half_open занимает слот пробного вызова."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._probes < self.half_open_max:
+            self._probes += 1
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._state == self.HALF_OPEN:
+            logger.info(f"Выключатель {self.name}: сервис ожил, закрываем")
+            self._state = self.CLOSED
+            self._outcomes.clear()
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self._state == self.HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if (
+            self._state == self.CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and failures / len(self._outcomes) >= self.failure_ratio
+        ):
+            self._open()
+
+    def release_probe(self) -> None:
+        """Возвращает слот пробного вызова, если вызов не дошёл до сервиса (например, отменён)."""
+        if self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _open(self) -> None:
+        logger.warning(
+            f"Выключатель {self.name}: слишком много ошибок, "
+            f"отключаем на {self.recovery_time:.0f} c"
+        )
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
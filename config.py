@@ -25,6 +25,11 @@ def _fail(msg: str):
 BOT_TOKEN = os.getenv("BOT_TOKEN")            # из .env
 if not BOT_TOKEN:
     _fail("❌ BOT_TOKEN не найден в .env!")
+# Дедлайн апдейта (deadline.py): от отправки сообщения (у callback и inline — от получения)
+# до конца обработки. Опоздавшие апдейты пропускаются, запросы к API и AI укорачиваются.
+# Только у обработчиков с флагом: flags={"slo": UPDATE_SLO} (или своё число секунд);
+# без флага дедлайна нет — модерация, сниппеты, заявки и уведомления доводятся до конца
+UPDATE_SLO = 30.0
 
 # --- AI --------------
 AI_PROVIDER = os.getenv("AI_PROVIDER", "")  # "openai" | "deepseek"
@@ -33,6 +38,50 @@ FINE_TUNED_MODEL = None           # например, "ft:gpt-4o-..."
 TEMPERATURE = 0.8
 MAX_TOKENS = 1000
 
+AI_REQUEST_TIMEOUT = 120          # сек. на один запрос к AI (deepseek-reasoner думает долго)
+AI_MAX_CONNECTIONS = 20           # размер общего пула HTTP-соединений к AI-провайдерам
+AI_KEEPALIVE_CONNECTIONS = 10     # сколько соединений держим открытыми между запросами
+
+# Пул провайдеров: основной — AI_PROVIDER, второй подключается, если для него есть ключ.
+# Адреса можно переопределить в .env (например, на локальные заглушки для тестов).
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+AI_HEDGE_AFTER = 10.0             # сек. без ответа основного — дублируем запрос на запасной
+AI_HEDGE_MIN = 2.0                # нижняя граница адаптивной задержки хеджирования (по p95)
+AI_LATENCY_WINDOW = 100           # замеров задержки на провайдера для перцентилей
+AI_BREAKER_WINDOW = 10            # выключатель: окно последних вызовов
+AI_BREAKER_MIN_CALLS = 3          # выключатель: минимум вызовов в окне для решения
+AI_BREAKER_RECOVERY = 60.0        # выключатель: сек. до пробного запроса
+
+# Маршрутизация по сложности вопроса: короткие реплики и болтовня — на быструю
+# дешёвую модель с малым лимитом токенов, лор и развёрнутые вопросы — на основную
+AI_MODEL_ROUTING = True
+OPENAI_LIGHT_MODEL = "gpt-4o-mini"
+DEEPSEEK_LIGHT_MODEL = "deepseek-chat"
+AI_LIGHT_MAX_TOKENS = 300         # лимит ответа для лёгкой модели
+AI_LIGHT_MAX_CHARS = 80           # вопрос длиннее — всегда на основную модель
+AI_LIGHT_MAX_LORE_SCORE = 1.5     # BM25-счёт лора выше — вопрос про лор, на основную модель
+
+# Планировщик AI-запросов: сколько вызовов к провайдеру идёт одновременно
+AI_MAX_CONCURRENT_REQUESTS = 4
+AI_MAX_CONCURRENT_IMAGES = 2
+
+# Кэш ответов на повторяющиеся вопросы
+AI_CACHE_TTL = 6 * 3600           # сек. жизни ответа в кэше
+AI_CACHE_MAX_ENTRIES = 500        # LRU-граница по количеству записей
+AI_CACHE_PATH = "json/ai_cache.json"  # файл для «тёплого» старта; None — только в памяти
+
+# Лор в system-промпте: только разделы, найденные по вопросу (BM25), или весь стиль
+AI_LORE_RETRIEVAL = True
+AI_LORE_TOP_K = 4                 # сколько разделов лора добавлять к ядру персоны
+
+# Память диалогов (цепочки ответов в теме Гёдзена)
+AI_HISTORY_TOKEN_BUDGET = 1200    # токенов на контекст диалога в одном запросе
+AI_MEMORY_MAX_TURNS = 12          # реплик в кольцевом буфере одной цепочки
+AI_MEMORY_SUMMARIZE_AFTER = 8     # с какого числа реплик сворачивать старые в резюме
+AI_MEMORY_MAX_CHAINS_PER_CHAT = 50  # цепочек на чат (LRU)
+AI_MEMORY_SUMMARY_MAX_CHARS = 1500
+
 # --- Telegram / Группы и темы (храним тут, не в .env - это не секреты) ---------------
 OWNER_ID = 1053983438             # ID владельца
 GROUP_ID = -1002365374672         # ID основной группы
@@ -40,9 +89,23 @@ GYOZEN_TOPIC_ID = 847             # ID темы для гёдзена (ИИ)
 TROPHY_GROUP_CHAT_ID = -1002348168326  # ID группы для трофеев
 CONGRATULATION_GROUP_ID = -1002365374672
 
+# --- Планировщик задач (job_scheduler.py) -------------------
+JOB_STATE_PATH = "json/scheduler_state.json"  # последние запуски задач; None — только в памяти
+
+# Запас утренних приветствий: пачка генерируется ночью, в 9:00 отправка без ожидания AI
+GREETING_POOL_PATH = "json/greeting_pool.json"
+GREETING_POOL_BATCH = 7           # приветствий за один запрос (неделя)
+GREETING_POOL_MIN = 3             # меньше — ночью генерируем новую пачку
+GREETING_REFILL_TIME = "30 4 * * *"  # cron (по Берлину): тихие часы для генерации
+
 # --- Картинки (через OpenAI DALL·E) --------------------------
 IMAGE_MODEL = "dall-e-3"
 IMAGE_SIZE  = "1024x1024"
+IMAGE_DOWNLOAD_TIMEOUT = 60               # сек. на скачивание готовой картинки
+# Telegram file_id готовых картинок: повторный запрос отдаётся без генерации
+IMAGE_CACHE_TTL = 30 * 24 * 3600
+IMAGE_CACHE_MAX_ENTRIES = 300
+IMAGE_CACHE_PATH = "json/image_cache.json"  # None — только в памяти
 
 # --- Ключи API (из .env — только секреты) --------------------
 OPENAI_API_KEY   = os.getenv("OPENAI_API_KEY", "")
@@ -56,6 +119,57 @@ TELEGRAM_PHONE = os.getenv("TELEGRAM_PHONE", "")
 # --- Мини-приложение ----------------------------------------
 MINI_APP_URL = "https://tsushimaru.com/"
 API_BASE_URL = "https://api.tsushimaru.com"
+# Общая сессия api_client: соединения к API переиспользуются (без TCP+TLS на каждый запрос)
+API_MAX_CONNECTIONS = 20          # всего соединений в пуле
+API_KEEPALIVE_TIMEOUT = 60        # сек. простоя, после которых соединение закрывается
+API_DNS_CACHE_TTL = 300           # сек. кэша DNS
+# Транспорт к miniapp_api на этом же сервере — мимо DNS, TLS и обратного прокси:
+# "unix:/run/miniapp_api.sock" — UNIX-сокет, "http://127.0.0.1:8000" — loopback; пусто — API_BASE_URL.
+# Host и авторизация остаются как у API_BASE_URL
+API_TRANSPORT = os.getenv("API_TRANSPORT") or None
+# Кэш GET-ответов API (TTL по эндпоинтам — в api_cache.CACHE_POLICIES)
+API_CACHE_MAX_ENTRIES = 1000
+API_CACHE_MAX_BYTES = 8 * 1024 * 1024
+API_CACHE_MAX_STALE = 24 * 3600   # сек. после TTL, пока ответ можно отдать при недоступности API
+# Пакетная загрузка пользователей: запросы user_info за окно склеиваются в один
+API_USER_BATCH_PATH = "/api/user_info.batch"  # GET ?ids=1,2,3; нет на сервере — запросы по одному
+API_USER_BATCH_WINDOW = 0.005     # сек. ожидания соседних запросов
+API_USER_BATCH_MAX = 100          # пользователей в одном пакетном запросе
+# Локальная реплика: GET читаются прямо из SQLite-базы miniapp_api (только чтение, запись — через API).
+# Эндпоинты: "user_info", "notifications", "snippets"; пустое множество — реплика выключена
+API_REPLICA_DB_PATH = os.getenv("API_REPLICA_DB_PATH", "/root/miniapp_api/app.db")
+API_REPLICA_ENDPOINTS = {
+    name.strip() for name in os.getenv("API_REPLICA_ENDPOINTS", "").split(",") if name.strip()
+}
+API_REPLICA_POOL_SIZE = 4         # соединений только для чтения
+# Метрики (задержки и ошибки API и др.) в формате Prometheus: http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_HOST = "127.0.0.1"        # только локально — наружу не открываем
+METRICS_PORT = 9108               # None — сервер метрик не запускается
+# Повторы при сетевых сбоях: GET — всегда, POST/DELETE — только с Idempotency-Key (если сервер
+# отсеивает по нему дубли) или если соединение не установилось
+API_RETRY_ATTEMPTS = 3            # попыток всего, включая первую
+API_RETRY_BACKOFF = 0.3           # сек., база экспоненциальной паузы (с полным джиттером)
+API_RETRY_BACKOFF_MAX = 2.0       # сек., потолок одной паузы
+API_RETRY_DEADLINE = 12.0         # сек. на все попытки вместе — укладываемся в окно ответа на callback
+# Выключатели по группам эндпоинтов (/api/snippets, /api/builds...): при сбоях API запросы
+# сразу отклоняются вместо ожидания таймаута; GET из кэша отдаётся устаревшим
+API_BREAKER_WINDOW = 20           # последних запросов группы в окне
+API_BREAKER_MIN_CALLS = 5         # минимум запросов в окне для решения
+API_BREAKER_FAILURE_RATIO = 0.5   # доля ошибок (таймауты, обрывы, 5xx), при которой выключаем
+API_BREAKER_RECOVERY = 15.0       # сек. до пробного запроса
+
+# --- Рассылка уведомлений (broadcast.py) ---------------------
+# Общий лимит Telegram — около 30 сообщений в секунду на бота; держимся чуть ниже
+BROADCAST_RATE = 25.0             # вызовов Telegram в секунду (пересылка и кнопки — два вызова)
+BROADCAST_BURST = 5               # вызовов подряд без ожидания (лимит Telegram — скользящая секунда)
+BROADCAST_WORKERS = 8             # параллельных доставок
+BROADCAST_MAX_ATTEMPTS = 5        # попыток одного шага (RetryAfter, сетевые ошибки, 5xx)
+# Журнал рассылок (outbox.py): SQLite WAL, статус каждого получателя; после перезапуска рассылка продолжается
+OUTBOX_DB_PATH = "json/outbox.db"  # None — рассылки только в памяти, при остановке недоставленное теряется
+OUTBOX_RESUME_MAX_AGE = 3 * 3600  # сек.; уведомление о посте старше этого после перезапуска уже не нужно
+OUTBOX_RETENTION = 24 * 3600      # сек. хранения ключа завершённой рассылки (защита от повторного поста)
+# Индекс подписок (subscription_index.py): подписчики режимов в памяти, пост в LEGENDS — без запросов к API
+NOTIFICATION_INDEX_REFRESH = 120.0  # сек., за которые по кругу перечитываются все режимы
 
 # --- Константы для тем -------------------------------------
 # ID первого сообщения темы "legends" - если ответ на это сообщение, 
@@ -0,0 +1,166 @@
+"""
+Дедлайн обработки апдейта: сколько времени осталось у текущего обработчика.
+
+DeadlineMiddleware считает дедлайн от отправки сообщения (message.date; у
+callback и inline-запросов — от получения) плюс SLO обработчика и кладёт его
+в contextvar. api_client и ai_providers урезают по нему таймауты и не
+начинают запросы, на которые времени уже нет; опоздавший апдейт целиком
+пропускается, а пользователю отвечают, что команду нужно повторить (если
+обработчик, прерванный на середине, не сделал этого сам — см.
+DeadlineExceeded.notified). Так при
+заторе (бот лежал, долгий polling) старые апдейты не съедают по 15 секунд каждый.
+
+Дедлайн — только у обработчиков, которые его включили флагом aiogram (обычно
+те, что читают API или зовут AI и чей ответ через полминуты уже не нужен):
+    @router.message(..., flags={"slo": UPDATE_SLO})
+Без флага (модерация, ввод сниппетов, ответы на заявки, уведомления LEGENDS)
+апдейт обрабатывается, сколько бы он ни ждал.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+UPDATE_LAG_SECONDS = registry.histogram(
+    "gyozenbot_update_lag_seconds", "Возраст апдейта к началу обработки (от message.date)"
+)
+EXPIRED_TOTAL = registry.counter(
+    "gyozenbot_update_deadline_expired_total",
+    "Апдейты, не уложившиеся в дедлайн: skipped — пропущены, cut — прерваны",
+    ("handler", "stage"),
+)
+
+# Момент по time.monotonic() (и часам event loop), после которого работа уже не нужна
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("update_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Время на обработку апдейта вышло. Подкласс TimeoutError — ловится там же, где таймауты."""
+
+    # Обработчик уже сам сказал пользователю (поправил сообщение ожидания) — middleware не отвечает
+    notified = False
+
+
+def time_left() -> Optional[float]:
+    """Секунд до дедлайна (может быть отрицательным) или None, если дедлайна нет."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def expired() -> bool:
+    left = time_left()
+    return left is not None and left <= 0
+
+
+def check(what: str) -> None:
+    """Не начинать работу, на которую времени уже нет."""
+    if expired():
+        raise DeadlineExceeded(f"{what}: дедлайн апдейта истёк")
+
+
+@contextlib.contextmanager
+def scope(seconds: Optional[float]) -> Iterator[None]:
+    """Дедлайн через seconds секунд (не позже уже заданного); None — без изменений."""
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.asynccontextmanager
+async def limit(what: str) -> AsyncIterator[None]:
+    """Прерывает блок по дедлайну (asyncio.timeout_at) с DeadlineExceeded."""
+    at = _deadline.get()
+    if at is None:
+        yield
+        return
+    check(what)
+    try:
+        async with asyncio.timeout_at(at):
+            yield
+    except TimeoutError as e:
+        if expired() and not isinstance(e, DeadlineExceeded):
+            raise DeadlineExceeded(f"{what}: дедлайн апдейта истёк") from e
+        raise
+
+
+EXPIRED_TEXT = "⌛ Не успел ответить вовремя — повтори, пожалуйста, команду."
+
+
+async def _notify_expired(event: TelegramObject) -> None:
+    """Говорим пользователю, что апдейт не обработан (inline-запрос просто остаётся без ответа)."""
+    try:
+        if isinstance(event, Message):
+            await event.reply(EXPIRED_TEXT)
+        elif isinstance(event, CallbackQuery):
+            await event.answer(EXPIRED_TEXT, show_alert=True)
+    except TelegramAPIError as e:
+        logger.debug(f"Не удалось сообщить о пропуске апдейта: {e}")
+
+
+def _handler_name(data: dict[str, Any]) -> str:
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    return getattr(callback, "__name__", "unknown")
+
+
+class DeadlineMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware (dp.message / dp.callback_query / dp.inline_query): дедлайн
+    на обработчик с флагом "slo". default_slo — для обработчиков без флага (None — без дедлайна).
+    """
+
+    def __init__(self, default_slo: Optional[float] = None):
+        self.default_slo = default_slo
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        slo = get_flag(data, "slo", default=self.default_slo)
+        if slo is None:
+            return await handler(event, data)
+
+        # message.date — время отправки (с точностью до секунды); у остальных событий даты нет
+        age = max(0.0, time.time() - event.date.timestamp()) if isinstance(event, Message) else 0.0
+        UPDATE_LAG_SECONDS.observe(age)
+        name = _handler_name(data)
+        if age >= slo:
+            EXPIRED_TOTAL.inc(handler=name, stage="skipped")
+            logger.warning(f"Апдейт для {name} пропущен: ему {age:.0f} c при SLO {slo:.0f} c")
+            await _notify_expired(event)
+            return None
+
+        with scope(slo - age):
+            try:
+                return await handler(event, data)
+            except DeadlineExceeded as e:
+                EXPIRED_TOTAL.inc(handler=name, stage="cut")
+                logger.warning(f"Обработчик {name} прерван: {e}")
+                notified = e.notified
+        # Ответ на апдейт — уже вне дедлайна
+        if not notified:
+            await _notify_expired(event)
+        return None
@@ -0,0 +1,92 @@
+"""Запас утренних приветствий Гёдзена: генерируется пачкой заранее, отправляется мгновенно."""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from pathlib import Path
+
+from config import GREETING_POOL_BATCH, GREETING_POOL_MIN, GREETING_POOL_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class GreetingPool:
+    """
+    Очередь готовых приветствий на диске.
+
+    Приветствие удаляется из запаса только после успешной отправки (consume),
+    так что сбой Telegram не теряет его. Файл пишется атомарно.
+    """
+
+    def __init__(self, path: Path | None, min_size: int, batch_size: int):
+        self.path = path
+        self.min_size = min_size
+        self.batch_size = batch_size
+        self._items: list[dict] = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def needs_refill(self) -> bool:
+        return len(self._items) < self.min_size
+
+    def peek(self) -> str | None:
+        """Следующее приветствие без удаления из запаса."""
+        return self._items[0]["text"] if self._items else None
+
+    def consume(self) -> None:
+        """Удаляет отправленное приветствие из запаса."""
+        if self._items:
+            self._items.pop(0)
+            self.save()
+
+    def extend(self, texts: list[str]) -> int:
+        """Добавляет новые приветствия (без повторов). Возвращает число добавленных."""
+        known = {item["text"] for item in self._items}
+        now = time.time()
+        added = 0
+        for text in texts:
+            text = text.strip()
+            if text and text not in known:
+                self._items.append({"text": text, "created": now})
+                known.add(text)
+                added += 1
+        if added:
+            self.save()
+        return added
+
+    def load(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать запас приветствий {self.path}: {e}")
+            return
+        self._items = [item for item in raw.get("items", []) if item.get("text")]
+        logger.info(f"В запасе {len(self._items)} приветствий")
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(
+                json.dumps({"items": self._items}, ensure_ascii=False, indent=2),
+                encoding="utf-8",
+            )
+            tmp_path.replace(self.path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить запас приветствий {self.path}: {e}")
+
+
+greeting_pool = GreetingPool(
+    Path(__file__).resolve().parent / GREETING_POOL_PATH if GREETING_POOL_PATH else None,
+    min_size=GREETING_POOL_MIN,
+    batch_size=GREETING_POOL_BATCH,
+)
+greeting_pool.load()
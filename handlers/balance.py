@@ -3,8 +3,9 @@ import logging
 from aiogram import Router, F
 from aiogram.types import Message
 
-from config import GROUP_ID, TROPHY_GROUP_CHAT_ID
-from api_client import api_get
+from config import GROUP_ID, TROPHY_GROUP_CHAT_ID, UPDATE_SLO
+from api_client import user_info_loader
+from api_models import UserInfo
 from handlers.utils import get_target_user_id
 
 # Разрешенные группы для команды !баланс
@@ -47,7 +48,8 @@ def _is_allowed_context(message: Message) -> bool:
     return False
 
 
-@router.message(F.text == "!баланс")
+# Контекст проверяется фильтром: апдейты из чужих чатов не доходят до дедлайна (deadline.py)
+@router.message(F.text == "!баланс", _is_allowed_context, flags={"slo": UPDATE_SLO})
 async def balance_command(message: Message):
     """
     Обработчик команды !баланс для просмотра баланса пользователя.
@@ -55,20 +57,13 @@ async def balance_command(message: Message):
     """
     logger.info(f"Обнаружена команда !баланс от пользователя {message.from_user.id}")
     
-    # Проверяем контекст
-    if not _is_allowed_context(message):
-        logger.warning(f"Команда !баланс от пользователя {message.from_user.id} в неразрешённом контексте (чат: {message.chat.id}, тема: {message.message_thread_id})")
-        return
-    
-    logger.info(f"Контекст разрешён для команды !баланс от пользователя {message.from_user.id}")
-    
     try:
         # Определяем целевого пользователя
         target_user_id = get_target_user_id(message)
         logger.info(f"Целевой пользователь для команды !баланс: {target_user_id}")
         
         # Получаем информацию о пользователе через API
-        response_wrapper = await api_get(f"/api/user_info/{target_user_id}")
+        response_wrapper = await user_info_loader.load(target_user_id)
         async with response_wrapper as response:
             if response.status == 404:
                 logger.info("Пользователь %s не найден", target_user_id)
@@ -85,8 +80,8 @@ async def balance_command(message: Message):
                 return
 
             # Получаем данные пользователя
-            user_data = await response.json()
-            balance = user_data.get("balance", 0)
+            user_info = UserInfo.from_dict(await response.json())
+            balance = user_info.balance
             
             # Получаем username пользователя для упоминания
             user_mention = str(target_user_id)  # fallback на user_id
@@ -1,38 +1,171 @@
 import re
 import time
+import asyncio
 import random
 import logging
 from aiogram import Router, F
-from aiogram.types import Message
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import BufferedInputFile, Message
 
+import deadline
 from waiting_phrases import WAITING_PHRASES
-from ai_client import get_response
-from image_generator import generate_image
-from config import GROUP_ID, GYOZEN_TOPIC_ID, OWNER_ID
+from ai_client import FALLBACK_REPLY, prompt_token_stats, route_stats, stream_response
+from ai_providers import provider_pool
+from ai_cache import normalize_prompt, response_cache
+from api_cache import api_cache
+from api_client import breaker_states, get_flight
+from ai_scheduler import image_scheduler, text_scheduler
+from ai_memory import conversation_memory
+from image_generator import (
+    STAGE_DOWNLOADING, STAGE_DRAWING, image_file_cache, remember_file_id, render_image,
+)
+from config import AI_REQUEST_TIMEOUT, GROUP_ID, GYOZEN_TOPIC_ID, OWNER_ID
 
 router = Router()
 logger = logging.getLogger(__name__)
 
 RECENT_SECONDS = 60
+# Дедлайн ответа (deadline.py): свежее сообщение плюс один полный запрос к AI
+GYOZEN_SLO = RECENT_SECONDS + AI_REQUEST_TIMEOUT
+
+# Потоковые правки сообщения ожидания: не чаще раза в EDIT_INTERVAL секунд,
+# либо раньше, если накопилось EDIT_CHUNK_CHARS новых символов (но не чаще
+# раза в EDIT_MIN_GAP), чтобы не упираться в лимиты Telegram на редактирование.
+EDIT_INTERVAL = 1.0
+EDIT_CHUNK_CHARS = 200
+EDIT_MIN_GAP = 0.5
+TELEGRAM_TEXT_LIMIT = 4096
 
-def _is_recent(ts: float) -> bool:
-    return time.time() - ts <= RECENT_SECONDS
+def _is_recent(m: Message) -> bool:
+    if time.time() - m.date.timestamp() <= RECENT_SECONDS:
+        return True
+    logger.debug("Сообщение не свежее, пропускаем")
+    return False
 
 def _is_allowed_context(m: Message) -> bool:
     # ЛС — только владельцу (на всякий случай)
     if m.chat.type == "private":
-        return m.from_user and m.from_user.id == OWNER_ID
+        return bool(m.from_user and m.from_user.id == OWNER_ID)
     # Группа/супергруппа — только заданная группа и тема
     if m.chat.type in ("group", "supergroup"):
         if m.chat.id != GROUP_ID:
+            logger.debug(f"Контекст не разрешен - чат: {m.chat.id}, ожидается GROUP_ID: {GROUP_ID}")
             return False
         return bool(m.is_topic_message and m.message_thread_id == GYOZEN_TOPIC_ID)
     return False
 
+class _StreamEditor:
+    """Постепенно заменяет текст сообщения ожидания на приходящий ответ."""
+
+    def __init__(self, message: Message):
+        self._message = message
+        self._text = ""
+        self._shown = ""
+        self._last_edit = 0.0
+        self._not_before = 0.0
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    async def feed(self, chunk: str) -> None:
+        self._text += chunk
+        now = time.monotonic()
+        if now < self._not_before:
+            return
+        elapsed = now - self._last_edit
+        pending = len(self._text) - len(self._shown)
+        # Первый кусок показываем сразу — это и есть время до первого текста
+        if (
+            not self._shown
+            or elapsed >= EDIT_INTERVAL
+            or (pending >= EDIT_CHUNK_CHARS and elapsed >= EDIT_MIN_GAP)
+        ):
+            await self._edit(self._text[:TELEGRAM_TEXT_LIMIT])
+
+    async def finish(self) -> bool:
+        """Показывает итоговый текст. Возвращает False, если правка не удалась."""
+        final = self._text.strip()[:TELEGRAM_TEXT_LIMIT]
+        for _ in range(2):
+            if final == self._shown:
+                return True
+            delay = self._not_before - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if await self._edit(final):
+                return True
+        return False
+
+    async def _edit(self, text: str) -> bool:
+        if not text.strip():
+            return True
+        try:
+            await self._message.edit_text(text)
+        except TelegramRetryAfter as e:
+            logger.debug(f"Лимит правок, ждём {e.retry_after} c")
+            self._not_before = time.monotonic() + e.retry_after
+            return False
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.debug(f"Не удалось отредактировать ответ: {e}")
+                return False
+        self._shown = text
+        self._last_edit = time.monotonic()
+        return True
+
+
+def _queue_notifier(wait_msg: Message, base_text: str, editor: _StreamEditor | None = None):
+    """Обратный вызов планировщика: показывает место в очереди в сообщении ожидания."""
+    async def _on_position(position: int) -> None:
+        # Если ответ уже пошёл, место в очереди больше не показываем
+        if editor is not None and editor.text:
+            return
+        try:
+            await wait_msg.edit_text(f"{base_text}\n\n⏳ Очередь к духам: ты {position}-й")
+        except TelegramAPIError as e:
+            logger.debug(f"Не удалось показать место в очереди: {e}")
+    return _on_position
+
+
+async def _expire_waiting(wait_msg: Message, shown: str, error: deadline.DeadlineExceeded) -> None:
+    """Дедлайн оборвал ответ: вместо второго сообщения правим сообщение ожидания (начало ответа оставляем)."""
+    shown = shown.strip()
+    text = deadline.EXPIRED_TEXT
+    if shown:
+        text = f"{shown[:TELEGRAM_TEXT_LIMIT - len(text) - 2]}\n\n{text}"
+    try:
+        await wait_msg.edit_text(text)
+    except TelegramAPIError as e:
+        logger.debug(f"Не удалось пометить ответ как прерванный: {e}")
+        return
+    error.notified = True
+
+
+_IMAGE_STAGE_TEXT = {
+    STAGE_DRAWING: "Рисую... 🖌",
+    STAGE_DOWNLOADING: "Почти готово, забираю картинку... 📥",
+}
+
+
+def _image_stage_notifier(wait_msg: Message):
+    """Показывает этап задачи генерации в сообщении ожидания."""
+    async def _on_stage(stage: str) -> None:
+        try:
+            await wait_msg.edit_text(_IMAGE_STAGE_TEXT[stage])
+        except TelegramAPIError as e:
+            logger.debug(f"Не удалось показать этап генерации: {e}")
+    return _on_stage
+
+
 # Специфичный фильтр: проверяем наличие паттерна "гёдзен" в тексте
-# Это гарантирует, что обработчик срабатывает только для сообщений с этим паттерном
+# Это гарантирует, что обработчик срабатывает только для сообщений с этим паттерном.
+# Свежесть и контекст — тоже фильтры: несвежие и чужие сообщения отбрасываются
+# молча ещё до дедлайна (deadline.py), а не получают «повтори команду»
 @router.message(
-    F.text.regexp(r"г[ёе]д[зс][еэ]н", flags=re.IGNORECASE)
+    F.text.regexp(r"г[ёе]д[зс][еэ]н", flags=re.IGNORECASE),
+    _is_recent,
+    _is_allowed_context,
+    flags={"slo": GYOZEN_SLO},
 )
 async def gyozen_entrypoint(message: Message):
     text = (message.text or "").strip()
@@ -41,13 +174,6 @@ async def gyozen_entrypoint(message: Message):
     if not text:
         logger.debug("Пустое сообщение, пропускаем")
         return
-    if not _is_recent(message.date.timestamp()):
-        logger.debug("Сообщение не свежее, пропускаем")
-        return
-    if not _is_allowed_context(message):
-        logger.debug(f"Контекст не разрешен - чат: {message.chat.id}, тип: {message.chat.type}, тема: {message.message_thread_id}")
-        logger.debug(f"Ожидается GROUP_ID: {GROUP_ID}, GYOZEN_TOPIC_ID: {GYOZEN_TOPIC_ID}")
-        return
     
     logger.debug("Обрабатываем сообщение гёдзена")
 
@@ -58,19 +184,173 @@ async def gyozen_entrypoint(message: Message):
         if not prompt_tail:
             await message.reply("Опиши, что ты хочешь увидеть.")
             return
-        wait_msg = await message.reply("Генерирую изображение... 🎨")
-        url = await generate_image(prompt_tail)
-        if url:
-            await wait_msg.delete()
-            await message.reply_photo(url, caption="Готово. 🎭")
-        else:
+        wait_text = "Генерирую изображение... 🎨"
+        wait_msg = await message.reply(wait_text)
+        try:
+            file_id, data = await render_image(
+                message.from_user.id,
+                prompt_tail,
+                on_position=_queue_notifier(wait_msg, wait_text),
+                on_stage=_image_stage_notifier(wait_msg),
+            )
+        except deadline.DeadlineExceeded as e:
+            await _expire_waiting(wait_msg, "", e)
+            raise
+        if file_id is None and data is None:
             await wait_msg.edit_text("Не вышло создать изображение. Попробуй иначе сформулировать.")
+            return
+        photo = file_id or BufferedInputFile(data, filename="gyozen.png")
+        try:
+            sent = await message.reply_photo(photo, caption="Готово. 🎭")
+        except TelegramAPIError as e:
+            logger.error(f"Не удалось отправить картинку: {e}")
+            await wait_msg.edit_text("Картинка готова, но Telegram её не принял. Попробуй ещё раз.")
+            return
+        await wait_msg.delete()
+        if file_id is None and sent.photo:
+            # Самый крупный размер — последний
+            remember_file_id(prompt_tail, sent.photo[-1].file_id)
         return
 
-    # Обычный ИИ-ответ
-    waiting = await message.reply(random.choice(WAITING_PHRASES))
-    reply = await get_response(text)
+    # Контекст диалога: ответ (reply) на сообщение Гёдзена продолжает его цепочку
+    chat_id = message.chat.id
+    reply_to_id = message.reply_to_message.message_id if message.reply_to_message else None
+    root_id = conversation_memory.resolve_chain(chat_id, reply_to_id)
+    history = conversation_memory.build_history(chat_id, root_id)
+
+    # Обычный ИИ-ответ: ответ появляется в сообщении ожидания по мере генерации
+    phrase = random.choice(WAITING_PHRASES)
+    waiting = await message.reply(phrase)
+    editor = _StreamEditor(waiting)
+
+    async def _produce() -> str:
+        async for chunk in stream_response(text, history=history):
+            await editor.feed(chunk)
+        return editor.text
+
+    # Одинаковые вопросы без контекста склеиваются: к провайдеру уходит один запрос
     try:
-        await waiting.edit_text(reply)
-    except Exception:
-        await message.reply(reply)
+        reply = await text_scheduler.run(
+            message.from_user.id,
+            _produce,
+            key=None if history else normalize_prompt(text) or None,
+            on_position=_queue_notifier(waiting, phrase, editor),
+        )
+    except deadline.DeadlineExceeded as e:
+        # Middleware посчитает обрыв, а сообщение ожидания не должно висеть вечно
+        await _expire_waiting(waiting, editor.text, e)
+        raise
+    if not editor.text:
+        # Ответ получен склейкой с чужим запросом — показываем его целиком
+        await editor.feed(reply)
+
+    reply = reply.strip()
+    bot_message_ids = [waiting.message_id]
+    if not await editor.finish():
+        sent = await message.reply(reply[:TELEGRAM_TEXT_LIMIT])
+        bot_message_ids.append(sent.message_id)
+    # Хвост, не влезший в одно сообщение, досылаем отдельно
+    for start in range(TELEGRAM_TEXT_LIMIT, len(reply), TELEGRAM_TEXT_LIMIT):
+        sent = await message.reply(reply[start:start + TELEGRAM_TEXT_LIMIT])
+        bot_message_ids.append(sent.message_id)
+
+    if reply and reply != FALLBACK_REPLY:
+        conversation_memory.record(chat_id, root_id, text, reply, bot_message_ids)
+
+
+def _format_cache_stats() -> str:
+    stats = response_cache.stats()
+    images = image_file_cache.stats()
+    return (
+        f"Ответы (сбрасываются «!кэш сброс»): {stats['entries']}\n"
+        f"Попаданий: {stats['hits']}, промахов: {stats['misses']} "
+        f"({stats['hit_rate']:.0%})\n\n"
+        f"Картинки (file_id, не сбрасываются): {images['entries']}, "
+        f"повторов без генерации: {images['hits']}"
+    )
+
+
+def _format_api_stats() -> str:
+    api = api_cache.stats()
+    return (
+        f"Кэш ответов API: {api['entries']} ({api['bytes'] // 1024} КБ), "
+        f"из кэша {api['hits']}, подтверждено 304: {api['revalidated']}, "
+        f"запросов {api['misses']} ({api['hit_rate']:.0%})\n"
+        f"Склеено одинаковых GET: {get_flight.shared} (в API ушло {get_flight.leaders})\n"
+        f"Отдано устаревшими при сбоях API: {api['stale']}\n\n"
+        f"{_format_breakers(breaker_states())}"
+    )
+
+
+def _format_breakers(states: dict[str, str]) -> str:
+    broken = [f"{group} ({state})" for group, state in states.items() if state != "closed"]
+    return f"⚠️ Выключатели API: {', '.join(broken)}" if broken else "Выключатели API: все замкнуты"
+
+
+@router.message(F.text.in_({"!кэш", "!кэш сброс"}), F.from_user.id == OWNER_ID)
+async def cache_command(message: Message):
+    """Статистика кэша ответов Гёдзена; «!кэш сброс» — очистка (только владелец)."""
+    if message.text == "!кэш сброс":
+        removed = response_cache.flush()
+        logger.info(f"Кэш ответов очищен владельцем: {removed} записей")
+        await message.reply(
+            f"🧹 Кэш ответов Гёдзена очищен, удалено записей: {removed}\n\n{_format_cache_stats()}"
+        )
+        return
+    await message.reply(f"📦 Кэш ответов Гёдзена\n\n{_format_cache_stats()}")
+
+
+@router.message(F.text == "!апи", F.from_user.id == OWNER_ID)
+async def api_stats_command(message: Message):
+    """Кэш ответов miniapp_api, склейка GET и выключатели (только владелец). Ничего не сбрасывает."""
+    await message.reply(f"🌐 miniapp_api\n\n{_format_api_stats()}")
+
+
+@router.message(F.text == "!ии", F.from_user.id == OWNER_ID)
+async def ai_stats_command(message: Message):
+    """Входные токены, маршруты моделей, память диалогов, очереди и провайдеры (только владелец)."""
+    memory = conversation_memory.stats()
+    await message.reply(
+        "🧠 Гёдзен: токены и память\n\n"
+        f"Запросов к AI: {prompt_token_stats.requests}\n"
+        f"prompt_tokens: среднее {prompt_token_stats.average:.0f}, "
+        f"макс. {prompt_token_stats.max}, последний {prompt_token_stats.last}\n"
+        f"{_format_routes(route_stats.stats())}\n\n"
+        f"Чатов в памяти: {memory['chats']}, цепочек: {memory['chains']}, "
+        f"реплик: {memory['turns']}\n\n"
+        f"Очередь текста: {_format_queue(text_scheduler.stats())}\n"
+        f"Очередь картинок: {_format_queue(image_scheduler.stats())}\n\n"
+        f"{_format_providers(provider_pool.stats())}"
+    )
+
+
+def _format_queue(stats: dict) -> str:
+    return (
+        f"в работе {stats['active']}, ждут {stats['queued']}, "
+        f"склеено {stats['coalesced']}"
+    )
+
+
+def _seconds(value: float | None) -> str:
+    return f"{value:.1f} c" if value is not None else "—"
+
+
+def _format_routes(stats: dict) -> str:
+    return "Модели: " + "; ".join(
+        f"{tier} — {route['requests']} запр., p50 {_seconds(route['p50'])}, "
+        f"p95 {_seconds(route['p95'])}"
+        for tier, route in stats.items()
+    )
+
+
+def _format_providers(stats: dict) -> str:
+    lines = ["Провайдеры:"]
+    for name, provider in stats.items():
+        state = provider.pop("state")
+        timings = ", ".join(
+            f"{key} p50 {_seconds(latency['p50'])} / p95 {_seconds(latency['p95'])}"
+            for key, latency in provider.items()
+            if latency["samples"]
+        )
+        lines.append(f"• {name} [{state}]: {timings or 'ещё нет замеров'}")
+    return "\n".join(lines)
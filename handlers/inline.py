@@ -13,7 +13,10 @@ from aiogram.types import (
     InputTextMessageContent
 )
 
-from config import API_BASE_URL, MINI_APP_URL
+import deadline
+from api_client import api_get
+from api_models import Build
+from config import MINI_APP_URL, UPDATE_SLO
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -34,20 +37,26 @@ def _get_class_icons() -> dict:
         'Ронин': f'{_raw_base}/assets/icons/classes/ronin.png'
     }
 
-async def search_builds(query: str, limit: int = 10) -> list:
-    """Поиск билдов через API"""
+# Inline-запрос идёт на каждое нажатие клавиши — ждём недолго: 5 секунд на все попытки вместе
+SEARCH_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
+async def search_builds(query: str, limit: int = 10) -> list[Build]:
+    """Поиск билдов через API (общая сессия api_client)"""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"{API_BASE_URL}/api/builds.search"
-            params = {"query": query, "limit": limit}
-            
-            async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get('builds', [])
-                else:
-                    logger.error(f"API вернул статус {response.status}")
-                    return []
+        params = {"query": query, "limit": limit}
+        response_wrapper = await api_get(
+            "/api/builds.search", params=params, timeout=SEARCH_TIMEOUT, retry_deadline=SEARCH_TIMEOUT.total
+        )
+        async with response_wrapper as response:
+            if response.status == 200:
+                data = await response.json()
+                return [Build.from_dict(build) for build in data.get('builds', [])]
+            else:
+                logger.error(f"API вернул статус {response.status}")
+                return []
+    except deadline.DeadlineExceeded:
+        # Не «билды не найдены»: на опоздавший запрос не отвечаем вовсе
+        raise
     except Exception as e:
         logger.error(f"Ошибка поиска билдов: {e}")
         return []
@@ -60,7 +69,7 @@ def truncate_text(text: str, max_length: int = 50) -> str:
         return text
     return text[:max_length - 3] + "..."
 
-@router.inline_query()
+@router.inline_query(flags={"slo": UPDATE_SLO})
 async def inline_query_handler(inline_query: InlineQuery):
     """Обработчик inline запросов для поиска билдов"""
     query = inline_query.query.strip()
@@ -95,28 +104,28 @@ async def inline_query_handler(inline_query: InlineQuery):
     
     for build in builds:
         # Получаем иконку класса
-        build_class = build.get('class', 'Самурай')
+        build_class = build.class_name or 'Самурай'
         class_icon_url = class_icons.get(build_class, class_icons['Самурай'])
         
         # Формируем title: "ID: Название"
-        title = f"{build['build_id']}: {build['name']}"
+        title = f"{build.build_id}: {build.name}"
         
         # Формируем description
         description_lines = []
         
         # Первая строка: Автор
-        author = build.get('author', 'Неизвестно')
+        author = build.author or 'Неизвестно'
         if author:
             description_lines.append(f"Автор: {author}")
         
         # Вторая строка: Теги через запятую
-        tags = build.get('tags', [])
+        tags = build.tags
         if tags:
             tags_text = ', '.join(tags)
             description_lines.append(tags_text)
         else:
             # Если тегов нет, можем показать ID
-            description_lines.append(f"ID: {build['build_id']}")
+            description_lines.append(f"ID: {build.build_id}")
         
         # Объединяем строки через перенос строки
         # Telegram может отобразить до 2 строк в description
@@ -129,12 +138,12 @@ async def inline_query_handler(inline_query: InlineQuery):
         thumbnail_url = class_icon_url
         
         result = InlineQueryResultArticle(
-            id=str(build['build_id']),
+            id=str(build.build_id),
             title=title,
             description=description,
             thumbnail_url=thumbnail_url,  # Используем фото билда вместо SVG
             input_message_content=InputTextMessageContent(
-                message_text=f"/билд {build['build_id']}"
+                message_text=f"/билд {build.build_id}"
             )
         )
         
@@ -21,8 +21,11 @@ from config import (
     GROUP_ID,
     CONGRATULATION_GROUP_ID,
     TROPHY_GROUP_CHAT_ID,
+    UPDATE_SLO,
 )
-from api_client import api_get, api_post
+import deadline
+from api_client import STALE_NOTE, api_get, api_post, invalidate_user_info, served_stale
+from api_models import Build
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -66,7 +69,7 @@ async def start_command(message: Message):
     
     await message.answer(welcome_text, reply_markup=builder.as_markup())
 
-@router.message(Command("build", "билд"))
+@router.message(Command("build", "билд"), flags={"slo": UPDATE_SLO})
 async def build_command(message: Message):
     """Обработчик команды /build <ID> или /билд <ID>"""
     args = message.text.split()
@@ -102,7 +105,7 @@ async def fetch_build_data(build_id: int) -> tuple:
     """Получает данные билда по ID из API
     
     Returns:
-        tuple: (build_data: dict|None, error_message: str|None)
+        tuple: (build_data: Build|None, error_message: str|None)
     """
     logger.info(f"Запрашиваем билд {build_id} из API")
     try:
@@ -121,10 +124,16 @@ async def fetch_build_data(build_id: int) -> tuple:
             if response.status == 200:
                 data = await response.json()
                 logger.info("Получены данные билда: %s", data)
-                return data.get("build"), None
+                build = data.get("build")
+                if not build:
+                    return None, "Билд не найден"
+                return Build.from_dict(build), None
 
             logger.error("Неожиданный статус API: %s", response.status)
             return None, f"Ошибка сервера (код {response.status})"
+    except deadline.DeadlineExceeded:
+        # Не «превышено время»: апдейт прерывает DeadlineMiddleware
+        raise
     except asyncio.TimeoutError:
         logger.error(f"Таймаут при запросе билда {build_id}")
         return None, "Превышено время ожидания ответа от сервера"
@@ -135,27 +144,29 @@ async def fetch_build_data(build_id: int) -> tuple:
         logger.error(f"Неожиданная ошибка при запросе билда {build_id}: {e}")
         return None, "Произошла непредвиденная ошибка"
 
-async def send_build_media_group(message: Message, build_data: dict):
+async def send_build_media_group(message: Message, build_data: Build):
     """Отправляет билд как медиагруппу с 2 фото и информацией"""
     
     # Формируем текст с информацией о билде
-    tags_text = ', '.join(build_data.get('tags', [])) if build_data.get('tags') else '—'
-    description_text = build_data.get('description', 'Описание отсутствует')
+    tags_text = ', '.join(build_data.tags) if build_data.tags else '—'
+    description_text = build_data.description or 'Описание отсутствует'
     
-    caption = f"""🛠️ <b>{build_data['name']}</b>
+    caption = f"""🛠️ <b>{build_data.name}</b>
 
-👤 <b>Автор:</b> {build_data.get('author', 'Неизвестно')}
-⚔️ <b>Класс:</b> {build_data.get('class', 'Не указан')}
+👤 <b>Автор:</b> {build_data.author or 'Неизвестно'}
+⚔️ <b>Класс:</b> {build_data.class_name or 'Не указан'}
 🏷️ <b>Теги:</b> {tags_text}
 
 📝 <b>Описание:</b>
 {description_text}"""
+    if served_stale():
+        caption += f"\n\n<i>{STALE_NOTE}</i>"
     
     media_group = []
     
     # Первая картинка с описанием
-    if build_data.get('photo_1'):
-        photo1_url = f"{API_BASE_URL}{build_data['photo_1']}"
+    if build_data.photo_1:
+        photo1_url = f"{API_BASE_URL}{build_data.photo_1}"
         media_group.append(InputMediaPhoto(
             media=photo1_url,
             caption=caption,
@@ -163,8 +174,8 @@ async def send_build_media_group(message: Message, build_data: dict):
         ))
     
     # Вторая картинка (без текста)
-    if build_data.get('photo_2'):
-        photo2_url = f"{API_BASE_URL}{build_data['photo_2']}"
+    if build_data.photo_2:
+        photo2_url = f"{API_BASE_URL}{build_data.photo_2}"
         media_group.append(InputMediaPhoto(media=photo2_url))
     
     # Отправка медиагруппы или ошибки
@@ -224,6 +235,9 @@ async def approve_mastery_callback(callback: CallbackQuery):
                     await callback.answer("❌ Ошибка обработки заявки", show_alert=True)
                     return
 
+                # Заявка записана — профиль и баланс участника в кэше устарели
+                invalidate_user_info(target_user_id)
+
                 result = await response.json()
 
                 if not result.get("success"):
@@ -466,6 +480,9 @@ async def handle_mastery_rejection(message: Message, pending_key: int):
                 await message.reply("❌ Ошибка обработки заявки")
                 return
 
+            # Заявка записана — профиль и баланс участника в кэше устарели
+            invalidate_user_info(target_user_id)
+
             result = await response.json()
 
             if not result.get("success"):
@@ -555,6 +572,9 @@ async def handle_trophy_rejection(message: Message, pending_key: int):
                 await message.reply("❌ Ошибка обработки заявки")
                 return
 
+            # Заявка записана — профиль и баланс участника в кэше устарели
+            invalidate_user_info(target_user_id)
+
             result = await response.json()
 
             if not result.get("success"):
@@ -642,6 +662,9 @@ async def handle_hellmode_quest_rejection(message: Message, pending_key: int):
                 await message.reply("❌ Ошибка обработки заявки")
                 return
 
+            # Заявка записана — профиль и баланс участника в кэше устарели
+            invalidate_user_info(target_user_id)
+
             result = await response.json()
 
             if not result.get("success"):
@@ -736,6 +759,9 @@ async def approve_trophy_callback(callback: CallbackQuery):
                     await callback.answer("❌ Ошибка обработки заявки", show_alert=True)
                     return
 
+                # Заявка записана — профиль и баланс участника в кэше устарели
+                invalidate_user_info(target_user_id)
+
                 result = await response.json()
 
                 if not result.get("success"):
@@ -905,6 +931,9 @@ async def approve_hellmode_quest_callback(callback: CallbackQuery):
                     await callback.answer("❌ Ошибка обработки заявки", show_alert=True)
                     return
 
+                # Заявка записана — профиль и баланс участника в кэше устарели
+                invalidate_user_info(target_user_id)
+
                 result = await response.json()
 
                 if not result.get("success"):
@@ -1071,6 +1100,9 @@ async def approve_top50_callback(callback: CallbackQuery):
                     await callback.answer("❌ Ошибка обработки заявки", show_alert=True)
                     return
 
+                # Заявка записана — профиль и баланс участника в кэше устарели
+                invalidate_user_info(target_user_id)
+
                 result = await response.json()
 
                 if not result.get("success"):
@@ -1234,6 +1266,9 @@ async def handle_top50_rejection(message: Message, pending_key: int):
                 await message.reply("❌ Ошибка обработки заявки")
                 return
 
+            # Заявка записана — профиль и баланс участника в кэше устарели
+            invalidate_user_info(target_user_id)
+
             result = await response.json()
 
             if not result.get("success"):
@@ -1,12 +1,13 @@
 # /gyozenbot/handlers/notifications.py
 import logging
 import re
-import asyncio
+from functools import lru_cache, partial
 from aiogram import Router, F
 from aiogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
 
 from config import GROUP_ID, LEGENDS_TOPIC_FIRST_MESSAGE
-from api_client import api_get
+from broadcast import Step, broadcaster
+from subscription_index import subscription_index
 
 router = Router()
 
@@ -26,6 +27,9 @@ COMMAND_MAPPING = {
 }
 
 
+subscription_index.track(COMMAND_MAPPING.values())
+
+
 def _is_legends_topic(message: Message) -> bool:
     """
     Проверяет, что сообщение находится в теме LEGENDS.
@@ -81,52 +85,56 @@ def _format_message_url(chat_id: int, message_id: int) -> str:
     return f"https://t.me/c/{chat_id_str}/{message_id}"
 
 
-async def _send_notification_to_user(
-    bot,
-    user_id: int,
-    original_message: Message,
-    notification_type: str
-) -> bool:
+@lru_cache(maxsize=16)
+def _notification_keyboard(chat_id: int, message_id: int) -> InlineKeyboardMarkup:
+    """Кнопки под уведомлением: перейти к посту и настройки уведомлений (одни на всю рассылку)."""
+    message_url = _format_message_url(chat_id, message_id)
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="Перейти", url=message_url),
+            InlineKeyboardButton(text="Уведомления", callback_data="notifications_settings")
+        ]
+    ])
+
+
+def _notification_steps(bot, user_id: int, payload: dict) -> list[Step]:
     """
-    Отправляет уведомление пользователю в личку.
-    Пересылает сообщение и отправляет отдельное сообщение с кнопками.
-    Возвращает True при успешной отправке, False при ошибке.
+    Шаги доставки уведомления в личку: пересылаем сообщение, затем
+    отдельное сообщение с кнопками. Ошибки и повторы — в broadcast.
+    payload — {"chat_id", "message_id"} поста; хранится в журнале рассылок,
+    по нему шаги строятся заново после перезапуска.
     """
-    try:
-        # Пересылаем сообщение
-        await bot.forward_message(
+    return [
+        partial(
+            bot.forward_message,
             chat_id=user_id,
-            from_chat_id=original_message.chat.id,
-            message_id=original_message.message_id
-        )
-        
-        # Создаем кнопки
-        message_url = _format_message_url(
-            original_message.chat.id,
-            original_message.message_id
-        )
-        
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(text="Перейти", url=message_url),
-                InlineKeyboardButton(text="Уведомления", callback_data="notifications_settings")
-            ]
-        ])
-        
-        # Отправляем сообщение с кнопками
-        await bot.send_message(
+            from_chat_id=payload["chat_id"],
+            message_id=payload["message_id"]
+        ),
+        partial(
+            bot.send_message,
             chat_id=user_id,
             text="🔔 Новое уведомление о поиске игроков",
-            reply_markup=keyboard
-        )
-        
-        return True
-        
-    except Exception as e:
-        logger.warning(
-            f"Не удалось отправить уведомление пользователю {user_id}: {e}"
-        )
-        return False
+            reply_markup=_notification_keyboard(payload["chat_id"], payload["message_id"])
+        ),
+    ]
+
+
+broadcaster.register("legends", _notification_steps)
+
+
+def _prioritize(subscribers_by_type: dict[str, frozenset[int]]) -> dict[int, int]:
+    """
+    Приоритет доставки для каждого подписчика (меньше — раньше). Самый узкий
+    тип из поста (меньше всего подписчиков) идёт первым: его подписчики ищут
+    именно это. Подписчик нескольких типов получает лучший из приоритетов.
+    """
+    ranked = sorted(subscribers_by_type, key=lambda kind: len(subscribers_by_type[kind]))
+    priorities: dict[int, int] = {}
+    for rank, notification_type in enumerate(ranked):
+        for user_id in subscribers_by_type[notification_type]:
+            priorities.setdefault(user_id, rank)
+    return priorities
 
 
 @router.message(
@@ -160,71 +168,34 @@ async def handle_notification_commands(message: Message):
         f"от пользователя {message.from_user.id}"
     )
     
-    # Собираем всех уникальных подписчиков для всех найденных команд
-    all_subscribers = set()
+    # Подписчики по типам из индекса в памяти (subscription_index); по ним считается приоритет доставки
+    subscribers_by_type: dict[str, frozenset[int]] = {}
     
     for notification_type in commands:
-        try:
-            # Получаем список подписчиков через API
-            response_wrapper = await api_get(
-                f"/api/notifications/{notification_type}",
-                use_bot_token=True
-            )
-            
-            async with response_wrapper as response:
-                if response.status != 200:
-                    logger.error(
-                        f"Ошибка API при получении подписчиков для {notification_type}: "
-                        f"status {response.status}"
-                    )
-                    continue
-                
-                data = await response.json()
-                subscribers = data.get("subscribers", [])
-                
-                if not subscribers:
-                    logger.info(f"Нет подписчиков для типа уведомления {notification_type}")
-                    continue
-                
-                # Добавляем подписчиков в общий набор (set автоматически уберет дубликаты)
-                all_subscribers.update(subscribers)
-                
-                logger.info(
-                    f"Найдено {len(subscribers)} подписчиков для типа {notification_type}"
-                )
-        
-        except Exception as e:
-            logger.error(
-                f"Ошибка при обработке команды {notification_type}: {e}",
-                exc_info=True
-            )
+        subscribers = await subscription_index.subscribers(notification_type)
+        if not subscribers:
+            logger.info(f"Нет подписчиков для типа уведомления {notification_type}")
+            continue
+        subscribers_by_type[notification_type] = subscribers
+        logger.info(f"Найдено {len(subscribers)} подписчиков для типа {notification_type}")
     
-    # Отправляем уведомления каждому уникальному подписчику только один раз
-    if all_subscribers:
+    # Каждому уникальному подписчику — одно уведомление. Рассылка идёт в фоне
+    # (broadcast): пул воркеров под общим лимитом Telegram, итог — в лог по завершении.
+    # Рассылка пишется в журнал (outbox): после перезапуска продолжится, а повторно
+    # пришедший тот же пост (ключ — чат и сообщение) второй рассылки не создаст
+    priorities = _prioritize(subscribers_by_type)
+    if priorities:
         logger.info(
-            f"Всего уникальных подписчиков для всех команд: {len(all_subscribers)}"
+            f"Всего уникальных подписчиков для всех команд: {len(priorities)}"
         )
-        
-        success_count = 0
-        # Отправляем уведомления с задержкой, чтобы не превысить лимиты Telegram API
-        # Telegram позволяет отправлять до 20 сообщений в секунду в личку
-        # Используем задержку 0.05 секунды (20 сообщений/сек)
-        for user_id in all_subscribers:
-            if await _send_notification_to_user(
-                message.bot,
-                user_id,
-                message,
-                ", ".join(commands)  # Передаем список команд для логирования
-            ):
-                success_count += 1
-            
-            # Небольшая задержка между отправками, чтобы не превысить rate limit
-            await asyncio.sleep(0.05)
-        
-        logger.info(
-            f"Отправлено {success_count} из {len(all_subscribers)} уведомлений "
-            f"для команд: {commands}"
+        await broadcaster.submit_durable(
+            message.bot,
+            "legends",
+            f"legends:{message.chat.id}:{message.message_id}",
+            f"{', '.join(commands)} (сообщение {message.message_id})",
+            priorities.items(),
+            {"chat_id": message.chat.id, "message_id": message.message_id},
+            posted_at=message.date.timestamp(),
         )
     else:
         logger.info("Нет подписчиков для отправки уведомлений")
-
@@ -8,7 +8,8 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKe
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from config import API_BASE_URL
-from api_client import api_get, api_post
+from api_client import api_get, api_post, invalidate
+from subscription_index import subscription_index
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -82,8 +83,12 @@ async def toggle_notification(user_id: int, notification_type: str) -> int:
         )
         async with response_wrapper as response:
             if response.status == 200:
+                # Меняется и настройка пользователя, и список подписчиков режима
+                invalidate("/api/notifications/")
                 data = await response.json()
-                return data.get("value", 0)
+                value = data.get("value", 0)
+                subscription_index.apply_toggle(user_id, notification_type, value == 1)
+                return value
             else:
                 logger.error(f"Ошибка переключения уведомления: {response.status}")
                 return -1
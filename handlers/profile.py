@@ -3,8 +3,8 @@ import logging
 from aiogram import Router, F
 from aiogram.types import Message
 
-from config import GROUP_ID, TROPHY_GROUP_CHAT_ID
-from api_client import api_get, api_post
+from config import GROUP_ID, TROPHY_GROUP_CHAT_ID, UPDATE_SLO
+from api_client import api_post, user_info_loader
 from handlers.utils import get_target_user_id
 
 # Разрешенные группы для команды !п
@@ -46,7 +46,8 @@ def _is_allowed_context(message: Message) -> bool:
     return False
 
 
-@router.message(F.text == "!п")
+# Контекст проверяется фильтром: апдейты из чужих чатов не доходят до дедлайна (deadline.py)
+@router.message(F.text == "!п", _is_allowed_context, flags={"slo": UPDATE_SLO})
 async def profile_command(message: Message):
     """
     Обработчик команды !п для просмотра профиля пользователя.
@@ -54,20 +55,13 @@ async def profile_command(message: Message):
     """
     logger.info(f"Обнаружена команда !п от пользователя {message.from_user.id}")
     
-    # Проверяем контекст
-    if not _is_allowed_context(message):
-        logger.warning(f"Команда !п от пользователя {message.from_user.id} в неразрешённом контексте (чат: {message.chat.id}, тема: {message.message_thread_id})")
-        return
-    
-    logger.info(f"Контекст разрешён для команды !п от пользователя {message.from_user.id}")
-    
     try:
         # Определяем целевого пользователя
         target_user_id = get_target_user_id(message)
         logger.info(f"Целевой пользователь для команды !п: {target_user_id}")
         
         # Проверяем наличие пользователя через API
-        response_wrapper = await api_get(f"/api/user_info/{target_user_id}")
+        response_wrapper = await user_info_loader.load(target_user_id)
         async with response_wrapper as response:
             if response.status == 404:
                 logger.info("Профиль пользователя %s не найден", target_user_id)
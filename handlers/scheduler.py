@@ -1,12 +1,13 @@
 # /gyozenbot/handlers/scheduler.py
-import asyncio
 import logging
-from datetime import datetime, date
 from zoneinfo import ZoneInfo
 
 from aiogram import Bot
-from ai_client import get_response
-from config import GROUP_ID
+from ai_client import FALLBACK_REPLY, get_response, get_variants
+from ai_scheduler import SYSTEM_USER_ID, text_scheduler
+from config import GROUP_ID, GREETING_REFILL_TIME
+from greeting_pool import greeting_pool
+from job_scheduler import Job, job_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -15,54 +16,73 @@ BERLIN_TZ = ZoneInfo("Europe/Berlin")
 # Время отправки (9:00)
 SEND_HOUR = 9
 SEND_MINUTE = 0
+# Если бот лежал в 9:00, приветствие отправляется после запуска, но не позже 3 часов
+GREETING_CATCH_UP = 3 * 3600
+# Приветствие может ждать ответа AI и переключения провайдеров
+GREETING_TIMEOUT = 300
+# Пропущенное ночное пополнение запаса догоняем в течение суток
+REFILL_CATCH_UP = 20 * 3600
+REFILL_TIMEOUT = 600
 
-# Дата последней отправки (для защиты от повторной отправки)
-_last_sent_date: date | None = None
+GREETING_PROMPT = "Напиши краткое утреннее приветствие в своем стиле. Пожелай всем хорошего дня, используя метафоры и эпические образы, как в древних легендах."
+
+async def refill_greeting_pool(force: bool = False):
+    """Генерирует пачку приветствий одним запросом, если запас ниже порога"""
+    if not force and not greeting_pool.needs_refill:
+        logger.info(f"Запас приветствий: {len(greeting_pool)}, пополнять не нужно")
+        return
+    variants = await text_scheduler.run(
+        SYSTEM_USER_ID,
+        lambda: get_variants(GREETING_PROMPT, greeting_pool.batch_size),
+    )
+    if not variants:
+        raise RuntimeError("AI не вернул приветствия для запаса")
+    added = greeting_pool.extend(variants)
+    logger.info(f"Запас приветствий пополнен на {added}, всего {len(greeting_pool)}")
 
 async def send_morning_greeting(bot: Bot):
-    """Отправляет утреннее приветствие от Гёдзена в группу"""
-    try:
-        prompt = "Напиши краткое утреннее приветствие в своем стиле. Пожелай всем хорошего дня, используя метафоры и эпические образы, как в древних легендах."
-        
-        greeting = await get_response(prompt)
-        
-        if greeting:
-            await bot.send_message(
-                chat_id=GROUP_ID,
-                text=greeting
-            )
-            
-    except Exception as e:
-        pass
+    """Отправляет утреннее приветствие от Гёдзена в группу: из запаса, иначе генерирует сразу"""
+    greeting = greeting_pool.peek()
+    if greeting is None:
+        logger.warning("Запас приветствий пуст, генерируем приветствие сейчас")
+        # Приветствие каждый день должно быть новым — мимо кэша
+        greeting = await get_response(GREETING_PROMPT, use_cache=False)
+        if not greeting or greeting == FALLBACK_REPLY:
+            # Ошибка попадёт в состояние задачи и в лог планировщика
+            raise RuntimeError("AI не вернул приветствие")
+        await bot.send_message(chat_id=GROUP_ID, text=greeting)
+        return
 
-async def scheduler_loop(bot: Bot):
-    """Основной цикл планировщика - проверяет время каждую минуту"""
-    global _last_sent_date
-    
-    while True:
-        try:
-            # Получаем текущее время в немецком времени
-            now_berlin = datetime.now(BERLIN_TZ)
-            current_date = now_berlin.date()
-            current_hour = now_berlin.hour
-            current_minute = now_berlin.minute
-            
-            # Проверяем, наступило ли время отправки и не отправляли ли уже сегодня
-            if (current_hour == SEND_HOUR and 
-                current_minute == SEND_MINUTE and 
-                _last_sent_date != current_date):
-                
-                await send_morning_greeting(bot)
-                _last_sent_date = current_date
-                
-        except Exception as e:
-            pass
-        
-        # Ждем 1 минуту перед следующей проверкой
-        await asyncio.sleep(60)
+    await bot.send_message(
+        chat_id=GROUP_ID,
+        text=greeting
+    )
+    greeting_pool.consume()
+    if greeting_pool.needs_refill:
+        logger.info(f"В запасе осталось {len(greeting_pool)} приветствий, пополним в тихие часы")
 
 async def start_scheduler(bot: Bot):
-    """Запускает планировщик как фоновую задачу"""
-    task = asyncio.create_task(scheduler_loop(bot))
-    return task
+    """Регистрирует задачи бота и запускает планировщик как фоновую задачу"""
+    job_scheduler.add(Job(
+        name="morning_greeting",
+        schedule=f"{SEND_MINUTE} {SEND_HOUR} * * *",
+        func=lambda: send_morning_greeting(bot),
+        tz=BERLIN_TZ,
+        timeout=GREETING_TIMEOUT,
+        jitter=30,
+        catch_up_grace=GREETING_CATCH_UP,
+    ))
+    job_scheduler.add(Job(
+        name="greeting_pool_refill",
+        schedule=GREETING_REFILL_TIME,
+        func=refill_greeting_pool,
+        tz=BERLIN_TZ,
+        timeout=REFILL_TIMEOUT,
+        jitter=300,
+        catch_up_grace=REFILL_CATCH_UP,
+    ))
+    return job_scheduler.start()
 
+async def stop_scheduler():
+    """Останавливает планировщик и сохраняет состояние задач"""
+    await job_scheduler.stop()
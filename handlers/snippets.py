@@ -10,7 +10,8 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKe
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from config import API_BASE_URL, GROUP_ID, TROPHY_GROUP_CHAT_ID
-from api_client import api_get, api_post, api_delete, _request
+from api_client import STALE_NOTE, api_get, api_post, api_delete, _request, invalidate, served_stale
+from api_models import Snippet
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -47,7 +48,7 @@ async def _check_user_is_admin_in_any_group(bot: Bot, user_id: int) -> bool:
     return False
 
 
-async def get_all_snippets_api() -> list:
+async def get_all_snippets_api() -> list[Snippet]:
     """Получает все сниппеты через API"""
     try:
         response_wrapper = await api_get(
@@ -58,7 +59,7 @@ async def get_all_snippets_api() -> list:
         async with response_wrapper as response:
             if response.status == 200:
                 data = await response.json()
-                return data.get("snippets", [])
+                return [Snippet.from_dict(item) for item in data.get("snippets", [])]
             else:
                 logger.error(f"Ошибка получения всех сниппетов: {response.status}")
                 return []
@@ -67,7 +68,7 @@ async def get_all_snippets_api() -> list:
         return []
 
 
-async def get_user_snippets_api(user_id: int) -> list:
+async def get_user_snippets_api(user_id: int) -> list[Snippet]:
     """Получает сниппеты пользователя через API"""
     try:
         response_wrapper = await api_get(
@@ -78,7 +79,7 @@ async def get_user_snippets_api(user_id: int) -> list:
         async with response_wrapper as response:
             if response.status == 200:
                 data = await response.json()
-                return data.get("snippets", [])
+                return [Snippet.from_dict(item) for item in data.get("snippets", [])]
             else:
                 logger.error(f"Ошибка получения сниппетов пользователя: {response.status}")
                 return []
@@ -87,20 +88,21 @@ async def get_user_snippets_api(user_id: int) -> list:
         return []
 
 
-async def get_snippet_by_id_api(snippet_id: int) -> dict:
+async def get_snippet_by_id_api(snippet_id: int) -> Snippet | None:
     """Получает сниппет по ID через API"""
     try:
         response_wrapper = await api_get(f"/api/snippets/{snippet_id}")
         async with response_wrapper as response:
             if response.status == 200:
                 data = await response.json()
-                return data.get("snippet", {})
+                snippet = data.get("snippet")
+                return Snippet.from_dict(snippet) if snippet else None
             else:
                 logger.error(f"Ошибка получения сниппета: {response.status}")
-                return {}
+                return None
     except Exception as e:
         logger.error(f"Исключение при получении сниппета: {e}", exc_info=True)
-        return {}
+        return None
 
 
 async def create_snippet_api(user_id: int, trigger: str, message: str, media: str = None, media_type: str = None) -> bool:
@@ -123,6 +125,7 @@ async def create_snippet_api(user_id: int, trigger: str, message: str, media: st
         )
         async with response_wrapper as response:
             if response.status == 200:
+                invalidate("/api/snippets/")
                 return True
             else:
                 logger.error(f"Ошибка создания сниппета: {response.status}")
@@ -156,6 +159,7 @@ async def update_snippet_api(snippet_id: int, user_id: int, trigger: str = None,
         )
         async with response_wrapper as response:
             if response.status == 200:
+                invalidate("/api/snippets/")
                 return True
             else:
                 logger.error(f"Ошибка обновления сниппета: {response.status}")
@@ -175,6 +179,7 @@ async def delete_snippet_api(snippet_id: int, user_id: int) -> bool:
         )
         async with response_wrapper as response:
             if response.status == 200:
+                invalidate("/api/snippets/")
                 return True
             else:
                 logger.error(f"Ошибка удаления сниппета: {response.status}")
@@ -195,7 +200,7 @@ def build_main_menu_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def build_snippets_keyboard(snippets: list, prefix: str = "snippet_") -> InlineKeyboardMarkup:
+def build_snippets_keyboard(snippets: list[Snippet], prefix: str = "snippet_") -> InlineKeyboardMarkup:
     """Строит клавиатуру со сниппетами (по 2 в ряд)"""
     builder = InlineKeyboardBuilder()
     
@@ -205,10 +210,10 @@ def build_snippets_keyboard(snippets: list, prefix: str = "snippet_") -> InlineK
         for j in range(2):
             if i + j < len(snippets):
                 snippet = snippets[i + j]
-                trigger = snippet.get('trigger', '')
+                trigger = snippet.trigger
                 row.append(InlineKeyboardButton(
                     text=trigger,
-                    callback_data=f"{prefix}{snippet.get('snippet_id')}"
+                    callback_data=f"{prefix}{snippet.snippet_id}"
                 ))
         if row:
             builder.row(*row)
@@ -219,7 +224,7 @@ def build_snippets_keyboard(snippets: list, prefix: str = "snippet_") -> InlineK
     return builder.as_markup()
 
 
-def build_my_snippets_keyboard(snippets: list) -> InlineKeyboardMarkup:
+def build_my_snippets_keyboard(snippets: list[Snippet]) -> InlineKeyboardMarkup:
     """Строит клавиатуру для "Мои сниппеты" с кнопкой создания"""
     builder = InlineKeyboardBuilder()
     
@@ -229,10 +234,10 @@ def build_my_snippets_keyboard(snippets: list) -> InlineKeyboardMarkup:
         for j in range(2):
             if i + j < len(snippets):
                 snippet = snippets[i + j]
-                trigger = snippet.get('trigger', '')
+                trigger = snippet.trigger
                 row.append(InlineKeyboardButton(
                     text=trigger,
-                    callback_data=f"snippet_my_{snippet.get('snippet_id')}"
+                    callback_data=f"snippet_my_{snippet.snippet_id}"
                 ))
         if row:
             builder.row(*row)
@@ -332,6 +337,8 @@ async def snippets_all_callback(callback: CallbackQuery, state: FSMContext):
     else:
         text = "Все сниппеты Tsushima.Ru"
         keyboard = build_snippets_keyboard(snippets)
+    if served_stale():
+        text += f"\n\n{STALE_NOTE}"
     
     await callback.message.edit_text(text, reply_markup=keyboard)
     await state.set_state(SnippetStates.all_snippets)
@@ -348,6 +355,8 @@ async def snippets_my_callback(callback: CallbackQuery, state: FSMContext):
         text = "Мои сниппеты:\n\nУ вас нет созданных сниппетов"
     else:
         text = "Мои сниппеты:"
+    if served_stale():
+        text += f"\n\n{STALE_NOTE}"
     
     keyboard = build_my_snippets_keyboard(snippets)
     await callback.message.edit_text(text, reply_markup=keyboard)
@@ -365,10 +374,10 @@ async def snippet_trigger_callback(callback: CallbackQuery, state: FSMContext, b
         await callback.answer("Сниппет не найден", show_alert=True)
         return
     
-    trigger = snippet.get('trigger', '')
-    message_text = snippet.get('message', '')
-    media = snippet.get('media')
-    media_type = snippet.get('media_type')
+    trigger = snippet.trigger
+    message_text = snippet.message
+    media = snippet.media
+    media_type = snippet.media_type
     
     # Формируем текст
     text = f"*{trigger}*\n\n*{message_text}*"
@@ -435,7 +444,7 @@ async def snippet_my_trigger_callback(callback: CallbackQuery, state: FSMContext
         await callback.answer("Сниппет не найден", show_alert=True)
         return
     
-    trigger = snippet.get('trigger', '')
+    trigger = snippet.trigger
     text = f"Управление сниппетом: *{trigger}*"
     keyboard = build_snippet_management_keyboard(snippet_id)
     
@@ -454,10 +463,10 @@ async def snippet_view_callback(callback: CallbackQuery, state: FSMContext, bot:
         await callback.answer("Сниппет не найден", show_alert=True)
         return
     
-    trigger = snippet.get('trigger', '')
-    message_text = snippet.get('message', '')
-    media = snippet.get('media')
-    media_type = snippet.get('media_type')
+    trigger = snippet.trigger
+    message_text = snippet.message
+    media = snippet.media
+    media_type = snippet.media_type
     
     # Формируем текст
     text = f"*{trigger}*\n\n*{message_text}*"
@@ -493,7 +502,7 @@ async def snippet_view_callback(callback: CallbackQuery, state: FSMContext, bot:
     
     # Отправляем панель управления заново после сообщения со сниппетом
     # Возвращаемся в меню управления сниппетом
-    trigger = snippet.get('trigger', '')
+    trigger = snippet.trigger
     panel_text = f"Управление сниппетом: *{trigger}*"
     keyboard = build_snippet_management_keyboard(snippet_id)
     
@@ -521,14 +530,14 @@ async def snippet_edit_callback(callback: CallbackQuery, state: FSMContext):
     
     await state.update_data(
         editing_snippet_id=snippet_id,
-        editing_trigger=snippet.get('trigger'),
-        editing_message=snippet.get('message'),
-        editing_media=snippet.get('media'),
-        editing_media_type=snippet.get('media_type'),
+        editing_trigger=snippet.trigger,
+        editing_message=snippet.message,
+        editing_media=snippet.media,
+        editing_media_type=snippet.media_type,
         message_id=callback.message.message_id
     )
     
-    text = f"Введите новый триггер для сниппета (текущий: {snippet.get('trigger')})"
+    text = f"Введите новый триггер для сниппета (текущий: {snippet.trigger})"
     keyboard = build_skip_keyboard()
     
     await callback.message.edit_text(text, reply_markup=keyboard)
@@ -570,7 +579,7 @@ async def snippet_delete_callback(callback: CallbackQuery, state: FSMContext):
             await callback.answer("Сниппет не найден", show_alert=True)
             return
         
-        trigger = snippet.get('trigger', '')
+        trigger = snippet.trigger
         text = f"Вы уверены, что хотите удалить сниппет *{trigger}*?"
         keyboard = build_delete_confirm_keyboard(snippet_id)
         
@@ -589,7 +598,7 @@ async def snippet_manage_callback(callback: CallbackQuery, state: FSMContext):
         await callback.answer("Сниппет не найден", show_alert=True)
         return
     
-    trigger = snippet.get('trigger', '')
+    trigger = snippet.trigger
     text = f"Управление сниппетом: *{trigger}*"
     keyboard = build_snippet_management_keyboard(snippet_id)
     
@@ -641,7 +650,7 @@ async def snippet_skip_callback(callback: CallbackQuery, state: FSMContext):
             await callback.answer("Сниппет не найден", show_alert=True)
             return
         
-        text = f"Введите новый текст/описание для сниппета (текущий: {snippet.get('message', '')[:50]}...), если необходимо прикрепите одно изображение или видео"
+        text = f"Введите новый текст/описание для сниппета (текущий: {snippet.message[:50]}...), если необходимо прикрепите одно изображение или видео"
         keyboard = build_skip_keyboard()
         
         await callback.message.edit_text(text, reply_markup=keyboard)
@@ -658,7 +667,7 @@ async def snippet_skip_callback(callback: CallbackQuery, state: FSMContext):
         
         # Берем триггер - если был изменен, используем новый, иначе оставляем старый
         new_trigger = data.get('editing_trigger')
-        old_trigger = snippet.get('trigger')
+        old_trigger = snippet.trigger
         
         # Определяем, был ли изменен триггер
         trigger_changed = new_trigger and new_trigger != old_trigger
@@ -869,7 +878,7 @@ async def process_edit_trigger_input(message: Message, state: FSMContext):
         asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, error_msg.message_id))
         # Отправляем панель заново после сообщения об ошибке
         snippet = await get_snippet_by_id_api(snippet_id)
-        text = f"Введите новый триггер для сниппета (текущий: {snippet.get('trigger') if snippet else ''})"
+        text = f"Введите новый триггер для сниппета (текущий: {snippet.trigger if snippet else ''})"
         keyboard = build_skip_keyboard()
         panel_message = await message.answer(text, reply_markup=keyboard)
         await state.update_data(message_id=panel_message.message_id)
@@ -883,7 +892,7 @@ async def process_edit_trigger_input(message: Message, state: FSMContext):
         asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, error_msg.message_id))
         # Отправляем панель заново после сообщения об ошибке
         snippet = await get_snippet_by_id_api(snippet_id)
-        text = f"Введите новый триггер для сниппета (текущий: {snippet.get('trigger') if snippet else ''})"
+        text = f"Введите новый триггер для сниппета (текущий: {snippet.trigger if snippet else ''})"
         keyboard = build_skip_keyboard()
         panel_message = await message.answer(text, reply_markup=keyboard)
         await state.update_data(message_id=panel_message.message_id)
@@ -893,7 +902,7 @@ async def process_edit_trigger_input(message: Message, state: FSMContext):
     
     # Отправляем панель управления заново после сообщения пользователя
     snippet = await get_snippet_by_id_api(snippet_id)
-    current_message = snippet.get('message', '')[:50] if snippet else ''
+    current_message = snippet.message[:50] if snippet else ''
     text = f"Введите новый текст/описание для сниппета (текущий: {current_message}...), если необходимо прикрепите одно изображение или видео"
     keyboard = build_skip_keyboard()
     
@@ -928,7 +937,7 @@ async def process_edit_message_input(message: Message, state: FSMContext):
     if not trigger:
         snippet = await get_snippet_by_id_api(snippet_id)
         if snippet:
-            trigger = snippet.get('trigger')
+            trigger = snippet.trigger
     
     # Проверяем наличие медиа
     media = None
@@ -948,7 +957,7 @@ async def process_edit_message_input(message: Message, state: FSMContext):
         asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, error_msg.message_id))
         # Отправляем панель заново после сообщения об ошибке
         snippet = await get_snippet_by_id_api(snippet_id)
-        current_message = snippet.get('message', '')[:50] if snippet else ''
+        current_message = snippet.message[:50] if snippet else ''
         text = f"Введите новый текст/описание для сниппета (текущий: {current_message}...), если необходимо прикрепите одно изображение или видео"
         keyboard = build_skip_keyboard()
         panel_message = await message.answer(text, reply_markup=keyboard)
@@ -963,7 +972,7 @@ async def process_edit_message_input(message: Message, state: FSMContext):
         asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, error_msg.message_id))
         # Отправляем панель заново после сообщения об ошибке
         snippet = await get_snippet_by_id_api(snippet_id)
-        current_message = snippet.get('message', '')[:50] if snippet else ''
+        current_message = snippet.message[:50] if snippet else ''
         text = f"Введите новый текст/описание для сниппета (текущий: {current_message}...), если необходимо прикрепите одно изображение или видео"
         keyboard = build_skip_keyboard()
         panel_message = await message.answer(text, reply_markup=keyboard)
@@ -981,7 +990,7 @@ async def process_edit_message_input(message: Message, state: FSMContext):
         asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, error_msg.message_id))
         # Отправляем панель заново после сообщения об ошибке
         snippet = await get_snippet_by_id_api(snippet_id)
-        current_message = snippet.get('message', '')[:50] if snippet else ''
+        current_message = snippet.message[:50] if snippet else ''
         text = f"Введите новый текст/описание для сниппета (текущий: {current_message}...), если необходимо прикрепите одно изображение или видео"
         keyboard = build_skip_keyboard()
         panel_message = await message.answer(text, reply_markup=keyboard)
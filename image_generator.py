@@ -1,12 +1,59 @@
+"""
+Генерация картинок Гёдзена как фоновые задачи.
+
+Задача проходит через image_scheduler (общий лимит, очередь по пользователям,
+склейка одинаковых запросов), картинка скачивается один раз и отдаётся
+байтами для загрузки в Telegram. Полученный file_id кэшируется по хэшу
+нормализованного запроса, так что повтор отдаётся мгновенно.
+"""
+
+import hashlib
 import logging
-from openai import OpenAI
-from config import OPENAI_API_KEY, IMAGE_MODEL, IMAGE_SIZE
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from ai_cache import ResponseCache, normalize_prompt
+from ai_providers import http_client, make_client
+from ai_scheduler import PositionCallback, image_scheduler
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, IMAGE_MODEL, IMAGE_SIZE, IMAGE_DOWNLOAD_TIMEOUT,
+    IMAGE_CACHE_MAX_ENTRIES, IMAGE_CACHE_PATH, IMAGE_CACHE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+# DALL·E всегда через OpenAI, но HTTP-пул общий с ai_client
+client = make_client(OPENAI_API_KEY, OPENAI_BASE_URL)
+
+# Этапы задачи для сообщения ожидания
+STAGE_DRAWING = "drawing"
+STAGE_DOWNLOADING = "downloading"
+
+StageCallback = Callable[[str], Awaitable[None]]
+
+
+def image_cache_key(prompt: str) -> str:
+    """Ключ кэша картинок: sha256 нормализованного запроса ("" — не кэшируем)."""
+    normalized = normalize_prompt(prompt)
+    if not normalized:
+        return ""
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+image_file_cache = ResponseCache(
+    max_entries=IMAGE_CACHE_MAX_ENTRIES,
+    ttl=IMAGE_CACHE_TTL,
+    path=Path(__file__).resolve().parent / IMAGE_CACHE_PATH if IMAGE_CACHE_PATH else None,
+    key_func=image_cache_key,
+    name="кэш картинок",
+)
+image_file_cache.load()
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 
 async def generate_image(prompt: str) -> str | None:
+    """URL сгенерированной картинки (живёт около часа) или None."""
     try:
-        resp = client.images.generate(
+        resp = await client.images.generate(
             model=IMAGE_MODEL,
             prompt=prompt,
             size=IMAGE_SIZE,
@@ -16,3 +63,60 @@ async def generate_image(prompt: str) -> str | None:
     except Exception as e:
         logging.error(f"Image generation error: {e}")
         return None
+
+
+async def download_image(url: str) -> bytes | None:
+    """Скачивает картинку через общий пул соединений."""
+    try:
+        resp = await http_client.get(url, timeout=IMAGE_DOWNLOAD_TIMEOUT)
+        resp.raise_for_status()
+        return resp.content
+    except Exception as e:
+        logger.error(f"Не удалось скачать картинку: {e}")
+        return None
+
+
+async def render_image(
+    user_id: int,
+    prompt: str,
+    *,
+    on_position: PositionCallback | None = None,
+    on_stage: StageCallback | None = None,
+) -> tuple[str | None, bytes | None]:
+    """
+    Картинка по запросу: (file_id, None) из кэша или (None, байты) новой картинки.
+    (None, None) — не получилось. После загрузки байтов в Telegram вызывающий
+    сохраняет file_id через remember_file_id().
+    """
+    file_id = image_file_cache.get(prompt)
+    if file_id is not None:
+        logger.info("Картинка из кэша file_id, генерация не нужна")
+        return file_id, None
+
+    async def _job() -> bytes | None:
+        if on_stage:
+            await on_stage(STAGE_DRAWING)
+        url = await generate_image(prompt)
+        if not url:
+            return None
+        if on_stage:
+            await on_stage(STAGE_DOWNLOADING)
+        return await download_image(url)
+
+    data = await image_scheduler.run(
+        user_id,
+        _job,
+        key=image_cache_key(prompt) or None,
+        on_position=on_position,
+    )
+    # Пока картинка рисовалась, её мог загрузить склеенный с нами запрос
+    file_id = image_file_cache.get(prompt)
+    if file_id is not None:
+        return file_id, None
+    return None, data
+
+
+def remember_file_id(prompt: str, file_id: str) -> None:
+    """Запоминает file_id загруженной картинки (кэш картинок пишется на диск сразу)."""
+    image_file_cache.put(prompt, file_id)
+    image_file_cache.save()
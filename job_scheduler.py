@@ -0,0 +1,286 @@
+"""
+Планировщик периодических задач бота: cron-расписания, куча таймеров,
+сохранённое состояние запусков, догоняющий запуск, джиттер и таймауты.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, tzinfo
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from config import JOB_STATE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Дольше не спим, даже если до задачи далеко: переживаем перевод часов и сон машины
+MAX_SLEEP = 60.0
+# Насколько далеко вперёд ищем следующее срабатывание cron-выражения
+_SEARCH_LIMIT = timedelta(days=366 * 5)
+# Сколько пропущенных срабатываний перебираем, чтобы найти последнее
+_MAX_MISSED_SCAN = 10_000
+
+
+class CronSpec:
+    """
+    Cron-выражение из пяти полей: минута, час, день месяца, месяц, день недели
+    (0 или 7 — воскресенье). Поддерживаются «*», списки «1,15», диапазоны «1-5»
+    и шаги «*/10». Если заданы и день месяца, и день недели, достаточно
+    совпадения любого из них (как в классическом cron).
+    """
+
+    _RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expr: str):
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron-выражение должно состоять из 5 полей: {expr!r}")
+        self.expr = expr
+        fields = [self._parse(part, lo, hi) for part, (lo, hi) in zip(parts, self._RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        self.weekdays = {d % 7 for d in weekdays}
+        self._any_day = parts[2] == "*"
+        self._any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse(part: str, lo: int, hi: int) -> set[int]:
+        values: set[int] = set()
+        for item in part.split(","):
+            body, _, step = item.partition("/")
+            if body == "*":
+                start, end = lo, hi
+            elif "-" in body:
+                start, end = (int(x) for x in body.split("-", 1))
+            else:
+                start = end = int(body)
+            if not (lo <= start <= end <= hi):
+                raise ValueError(f"значение вне диапазона {lo}-{hi}: {item!r}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        # datetime.weekday(): понедельник = 0; в cron понедельник = 1, воскресенье = 0
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """Первое срабатывание строго позже after (в таймзоне after)."""
+        tz = after.tzinfo
+        # Считаем в «настенном» времени, таймзону прикладываем в конце
+        dt = after.replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + _SEARCH_LIMIT
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt.replace(tzinfo=tz)
+        raise ValueError(f"cron-выражение {self.expr!r} не срабатывает")
+
+
+JobFunc = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class Job:
+    """Периодическая задача планировщика."""
+
+    name: str
+    schedule: str                   # cron-выражение, см. CronSpec
+    func: JobFunc
+    tz: tzinfo
+    timeout: float = 300.0          # сек. на один запуск, затем задача отменяется
+    jitter: float = 0.0             # случайная задержка запуска 0..jitter сек.
+    catch_up_grace: float = 0.0     # пропущенный запуск догоняем, если опоздали не больше чем на столько сек.
+    spec: CronSpec = field(init=False)
+
+    def __post_init__(self):
+        self.spec = CronSpec(self.schedule)
+
+    def next_slot(self, after: float) -> float:
+        """Следующий плановый момент (timestamp) строго после after."""
+        return self.spec.next_after(datetime.fromtimestamp(after, self.tz)).timestamp()
+
+
+class JobScheduler:
+    """
+    Держит кучу (время запуска, задача) и спит до ближайшего срабатывания.
+
+    Плановый момент запуска сохраняется на диск до вызова задачи, поэтому
+    перезапуск бота в ту же минуту не повторяет задачу. Пропущенный за время
+    простоя запуск выполняется один раз, если опоздание не больше catch_up_grace.
+    Следующий запуск считается от планового момента, а не от фактического,
+    так что долгая задача не сдвигает расписание и не «съедает» минуту.
+    """
+
+    def __init__(self, state_path: Path | None = None):
+        self.state_path = state_path
+        self._jobs: dict[str, Job] = {}
+        self._state: dict[str, dict] = {}
+        # (время запуска с джиттером, плановый момент, порядковый номер, имя задачи)
+        self._heap: list[tuple[float, float, int, str]] = []
+        self._seq = 0
+        self._running: dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def add(self, job: Job) -> None:
+        if job.name in self._jobs:
+            raise ValueError(f"задача {job.name!r} уже добавлена")
+        self._jobs[job.name] = job
+        if self._task is not None:
+            self._schedule_initial(job, time.time())
+            self._wakeup.set()
+
+    def start(self) -> asyncio.Task:
+        self._load()
+        now = time.time()
+        for job in self._jobs.values():
+            self._schedule_initial(job, now)
+        self._task = asyncio.create_task(self._loop())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(
+            *(t for t in [self._task, *self._running.values()] if t is not None),
+            return_exceptions=True,
+        )
+        self._task = None
+        self._save()
+
+    def stats(self) -> dict:
+        upcoming = {name: fire_at for fire_at, _, _, name in self._heap}
+        return {
+            name: {
+                "next_run": upcoming.get(name),
+                "running": name in self._running,
+                **self._state.get(name, {}),
+            }
+            for name in self._jobs
+        }
+
+    def _schedule_initial(self, job: Job, now: float) -> None:
+        last_slot = self._state.get(job.name, {}).get("last_slot")
+        if last_slot is not None:
+            # Последний плановый момент, пропущенный за время простоя
+            missed = None
+            slot = job.next_slot(last_slot)
+            for _ in range(_MAX_MISSED_SCAN):
+                if slot > now:
+                    break
+                missed, slot = slot, job.next_slot(slot)
+            if missed is not None:
+                late = now - missed
+                if late <= job.catch_up_grace:
+                    logger.info(f"Задача {job.name}: пропущен запуск {late:.0f} c назад, догоняем")
+                    self._push(job, missed, now)
+                    return
+                logger.info(f"Задача {job.name}: пропущенный запуск слишком старый, ждём следующего")
+        self._push(job, job.next_slot(now))
+
+    def _push(self, job: Job, slot: float, not_before: float | None = None) -> None:
+        fire_at = max(slot, not_before or slot) + random.uniform(0, job.jitter)
+        self._seq += 1
+        heapq.heappush(self._heap, (fire_at, slot, self._seq, job.name))
+
+    async def _loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, slot, _, name = heapq.heappop(self._heap)
+                job = self._jobs[name]
+                self._fire(job, slot)
+                self._push(job, job.next_slot(max(slot, now)))
+            delay = MAX_SLEEP
+            if self._heap:
+                delay = min(delay, max(0.0, self._heap[0][0] - now))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, job: Job, slot: float) -> None:
+        if job.name in self._running:
+            logger.warning(f"Задача {job.name}: предыдущий запуск ещё идёт, пропускаем")
+            return
+        # Отмечаем запуск до выполнения: перезапуск бота посреди задачи её не повторит
+        self._state[job.name] = {**self._state.get(job.name, {}), "last_slot": slot}
+        self._save()
+        task = asyncio.create_task(self._run(job, slot))
+        self._running[job.name] = task
+        task.add_done_callback(lambda _: self._running.pop(job.name, None))
+
+    async def _run(self, job: Job, slot: float) -> None:
+        started = time.monotonic()
+        status = "ok"
+        try:
+            await asyncio.wait_for(job.func(), timeout=job.timeout)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logger.error(f"Задача {job.name}: не уложилась в {job.timeout:g} c")
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            status = "error"
+            logger.exception(f"Задача {job.name}: ошибка: {e}")
+        finally:
+            duration = time.monotonic() - started
+            self._state[job.name] = {
+                **self._state.get(job.name, {}),
+                "last_status": status,
+                "last_finished": time.time(),
+                "last_duration": round(duration, 2),
+            }
+            self._save()
+            if status == "ok":
+                logger.info(f"Задача {job.name}: выполнена за {duration:.1f} c")
+
+    def _load(self) -> None:
+        if not self.state_path or not self.state_path.exists():
+            return
+        try:
+            self._state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать состояние планировщика {self.state_path}: {e}")
+
+    def _save(self) -> None:
+        if not self.state_path:
+            return
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.state_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self._state, ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp_path.replace(self.state_path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить состояние планировщика {self.state_path}: {e}")
+
+
+job_scheduler = JobScheduler(
+    Path(__file__).resolve().parent / JOB_STATE_PATH if JOB_STATE_PATH else None
+)
@@ -0,0 +1,34 @@
+"""
+Быстрый JSON для ответов API и сессии aiogram: orjson, если установлен,
+иначе стандартный json. Интерфейс одинаковый: loads(str | bytes), dumps -> str.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен — работаем на стандартном json
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+if orjson is not None:
+
+    def loads(data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+    def dumps(value: Any) -> str:
+        # aiogram ждёт строку; OPT_NON_STR_KEYS — как json.dumps, ключи-числа допустимы
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+else:
+
+    def loads(data: str | bytes) -> Any:
+        return json.loads(data)
+
+    def dumps(value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,78 @@
+"""Локальный BM25-поиск по лору Гёдзена: в промпт идут только нужные разделы."""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+
+from dialogue_styles import LORE_SECTIONS
+
+_WORD_RE = re.compile(r"\w+")
+
+# Служебные слова, которые не помогают выбрать раздел
+_STOPWORDS = frozenset(
+    "и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по "
+    "только ее мне было вот от меня еще нет о из ему теперь когда даже ну вдруг ли если "
+    "уже или ни быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей "
+    "может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего раз "
+    "тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь этом "
+    "один почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при наконец "
+    "два об другой хоть после над больше тот через эти нас про всего них какая много разве "
+    "три эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой им более "
+    "всегда конечно всю между это расскажи скажи гедзен гедзена гедзену гедзеном".split()
+)
+
+STEM_LENGTH = 5
+
+
+def tokenize(text: str) -> list[str]:
+    """Слова в нижнем регистре без «ё» и стоп-слов, обрезанные до STEM_LENGTH (грубый стемминг)."""
+    tokens = []
+    for word in _WORD_RE.findall(text.casefold().replace("ё", "е")):
+        if word in _STOPWORDS or word.isdigit():
+            continue
+        tokens.append(word[:STEM_LENGTH])
+    return tokens
+
+
+class LoreRetriever:
+    """BM25 (Okapi) по разделам лора; индекс строится один раз при импорте."""
+
+    def __init__(self, sections: list[tuple[str, str]], k1: float = 1.5, b: float = 0.75):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        self._docs = [Counter(tokenize(f"{title} {text}")) for title, text in sections]
+        self._lengths = [sum(doc.values()) for doc in self._docs]
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        df: Counter[str] = Counter()
+        for doc in self._docs:
+            df.update(doc.keys())
+        n = len(self._docs)
+        self._idf = {
+            term: math.log(1 + (n - freq + 0.5) / (freq + 0.5))
+            for term, freq in df.items()
+        }
+
+    def scores(self, query: str) -> list[float]:
+        terms = set(tokenize(query)) & self._idf.keys()
+        result = []
+        for doc, length in zip(self._docs, self._lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length)
+            for term in terms:
+                tf = doc.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            result.append(score)
+        return result
+
+    def select(self, query: str, top_k: int) -> list[tuple[str, str]]:
+        """До top_k разделов с ненулевым счётом, в исходном порядке корпуса."""
+        scored = [(score, i) for i, score in enumerate(self.scores(query)) if score > 0]
+        best = sorted(scored, reverse=True)[:top_k]
+        return [self.sections[i] for _, i in sorted(best, key=lambda item: item[1])]
+
+
+lore_retriever = LoreRetriever(LORE_SECTIONS)
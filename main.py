@@ -4,7 +4,16 @@ import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
 from config import BOT_TOKEN
+import ai_client
+import api_client
+import deadline
+import json_codec
+import metrics
+from ai_cache import response_cache
+from broadcast import broadcaster
+from subscription_index import subscription_index
 from handlers import (
     gyozen,
     waves_new,
@@ -30,7 +39,9 @@ async def main():
 
     bot = Bot(
         token=BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode="HTML")
+        default=DefaultBotProperties(parse_mode="HTML"),
+        # Ответы Telegram (getUpdates и др.) разбираются быстрым JSON
+        session=AiohttpSession(json_loads=json_codec.loads, json_dumps=json_codec.dumps),
     )
     dp = Dispatcher()
 
@@ -52,7 +63,32 @@ async def main():
         group_events.router, # обработка событий выхода из группы
     )
 
-    # Запускаем планировщик утренних приветствий параллельно с polling
+    # Дедлайн для обработчиков с flags={"slo": ...}: от даты сообщения + SLO; без флага — без дедлайна
+    deadline_middleware = deadline.DeadlineMiddleware()
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(deadline_middleware)
+
+    # Общая сессия к miniapp_api: открывается при запуске, закрывается при остановке
+    dp.startup.register(api_client.start)
+    dp.shutdown.register(api_client.close)
+    # Метрики Prometheus на локальном порту (задержки и ошибки API по эндпоинтам)
+    dp.startup.register(metrics.start_server)
+    dp.shutdown.register(metrics.stop_server)
+    # Индекс подписок на уведомления: загрузка и обновление по кругу в фоне
+    dp.startup.register(subscription_index.start)
+    dp.shutdown.register(subscription_index.stop)
+    # Воркеры рассылки уведомлений (общий лимит Telegram на вызовы); при запуске
+    # продолжается недоставленное из журнала рассылок (outbox, json/outbox.db)
+    dp.startup.register(broadcaster.start)
+    dp.shutdown.register(broadcaster.stop)
+    # Закрываем общий пул соединений к AI-провайдерам при остановке
+    dp.shutdown.register(ai_client.close)
+    # Сохраняем кэш ответов на диск, чтобы после перезапуска он был «тёплым»
+    dp.shutdown.register(response_cache.save)
+    # Останавливаем планировщик задач и сохраняем время последних запусков
+    dp.shutdown.register(scheduler.stop_scheduler)
+
+    # Запускаем планировщик задач (утреннее приветствие и др.) параллельно с polling
     scheduler_task = await scheduler.start_scheduler(bot)
 
     logging.info("Запуск polling...")
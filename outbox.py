@@ -0,0 +1,300 @@
+"""
+Журнал рассылок на диске (SQLite в режиме WAL). Рассылка и статус доставки
+каждому получателю переживают перезапуск и падение бота.
+
+broadcast.py записывает рассылку до того, как поставит её в очередь. Потом он
+отмечает каждый выполненный шаг доставки и итог по получателю. При запуске
+недоставленное читается обратно и доставляется с того шага, на котором
+остановилось. Ключ рассылки уникален: пост, пришедший повторно, вторую
+рассылку не создаёт (Telegram отдаёт апдейт заново, если бот упал до его
+подтверждения).
+
+Когда рассылка завершена, строки получателей сразу удаляются. Заголовок с
+ключом хранится ещё OUTBOX_RETENTION секунд — для защиты от дублей.
+
+Повтор возможен только для одного шага: если бот упал между вызовом Telegram и
+отметкой шага, после перезапуска этот шаг выполнится ещё раз. Остальные шаги и
+получатели не дублируются.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+import aiosqlite
+
+import json_codec
+from config import OUTBOX_DB_PATH, OUTBOX_RESUME_MAX_AGE, OUTBOX_RETENTION
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WRITE_SECONDS = registry.histogram(
+    "gyozenbot_outbox_write_seconds", "Запись в журнал рассылок (транзакция)", ("operation",)
+)
+OUTBOX_RESUMED = registry.counter(
+    "gyozenbot_outbox_resumed_total", "Доставки, возобновлённые из журнала после перезапуска"
+)
+OUTBOX_DUPLICATES = registry.counter(
+    "gyozenbot_outbox_duplicates_total", "Рассылки, пропущенные как повтор (ключ уже в журнале)"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    label TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    posted_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS broadcasts_finished_at ON broadcasts (finished_at);
+CREATE TABLE IF NOT EXISTS deliveries (
+    broadcast_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    step INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY (broadcast_id, user_id)
+) WITHOUT ROWID;
+"""
+
+# Статусы доставки: pending — ещё в работе; delivered, failed — итог;
+# expired — не доставлялось после перезапуска, пост старше OUTBOX_RESUME_MAX_AGE
+PENDING, DELIVERED, FAILED, EXPIRED = "pending", "delivered", "failed", "expired"
+
+SQL_ADD_BROADCAST = (
+    "INSERT OR IGNORE INTO broadcasts (key, kind, label, payload, posted_at) VALUES (?, ?, ?, ?, ?)"
+)
+SQL_ADD_DELIVERY = (
+    "INSERT OR IGNORE INTO deliveries (broadcast_id, user_id, priority) VALUES (?, ?, ?)"
+)
+SQL_CHECKPOINT = "UPDATE deliveries SET step = ?, attempts = ? WHERE broadcast_id = ? AND user_id = ?"
+SQL_COMPLETE = "UPDATE deliveries SET status = ? WHERE broadcast_id = ? AND user_id = ?"
+SQL_FINISH = "UPDATE broadcasts SET finished_at = ? WHERE id = ? AND finished_at IS NULL"
+SQL_PENDING_BROADCASTS = (
+    "SELECT id, kind, label, payload, posted_at FROM broadcasts WHERE finished_at IS NULL ORDER BY id"
+)
+SQL_PENDING_DELIVERIES = (
+    "SELECT broadcast_id, user_id, priority, step, attempts FROM deliveries WHERE status = 'pending'"
+)
+SQL_EXPIRE = (
+    "UPDATE deliveries SET status = 'expired' WHERE status = 'pending' AND broadcast_id IN "
+    "(SELECT id FROM broadcasts WHERE finished_at IS NULL AND posted_at < ?)"
+)
+# Сжатие: закрываем рассылки без pending (бот упал после последней доставки), удаляем строки
+# получателей завершённых рассылок и заголовки старше срока хранения
+SQL_CLOSE_DONE = (
+    "UPDATE broadcasts SET finished_at = ? WHERE finished_at IS NULL AND NOT EXISTS "
+    "(SELECT 1 FROM deliveries WHERE broadcast_id = broadcasts.id AND status = 'pending')"
+)
+SQL_DROP_DELIVERIES = (
+    "DELETE FROM deliveries WHERE broadcast_id IN (SELECT id FROM broadcasts WHERE finished_at IS NOT NULL)"
+)
+SQL_DROP_BROADCASTS = "DELETE FROM broadcasts WHERE finished_at < ?"
+
+
+@dataclass(slots=True)
+class PendingBroadcast:
+    """Незавершённая рассылка из журнала: что доставлять после перезапуска."""
+
+    id: int
+    kind: str
+    label: str
+    payload: dict[str, Any]
+    posted_at: float
+    # (user_id, приоритет, следующий шаг, попыток)
+    deliveries: list[tuple[int, int, int, int]] = field(default_factory=list)
+
+
+class Outbox:
+    """
+    Журнал рассылок: одно соединение aiosqlite. Запись идёт транзакциями под
+    общей блокировкой, чтобы операции из разных воркеров не смешивались в
+    одной транзакции.
+
+    WAL + synchronous=NORMAL: зафиксированная транзакция переживает падение
+    процесса; fsync делается при контрольных точках, а не на каждую отметку.
+    """
+
+    def __init__(self, path: str | None, retention: float, resume_max_age: float):
+        self.path = path
+        self.retention = retention
+        self.resume_max_age = resume_max_age
+        self._connection: aiosqlite.Connection | None = None
+        self._lock = asyncio.Lock()
+        self.disabled_reason: str | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.disabled_reason is None
+
+    @property
+    def is_open(self) -> bool:
+        return self._connection is not None
+
+    async def open(self) -> None:
+        if self._connection is not None or not self.enabled:
+            return
+        async with self._lock:
+            if self._connection is not None or not self.enabled:
+                return
+            try:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                # isolation_level=None — транзакции только явные (BEGIN IMMEDIATE в _write)
+                connection = await aiosqlite.connect(self.path, isolation_level=None, cached_statements=32)
+                try:
+                    await connection.execute("PRAGMA journal_mode = WAL")
+                    await connection.execute("PRAGMA synchronous = NORMAL")
+                    await connection.executescript(SCHEMA)
+                except sqlite3.Error:
+                    await connection.close()
+                    raise
+            except (sqlite3.Error, OSError) as e:
+                self.disabled_reason = str(e)
+                logger.warning(f"Журнал рассылок отключён, рассылки только в памяти: {e}")
+                return
+            self._connection = connection
+        removed = await self.compact()
+        logger.info(f"Журнал рассылок: {self.path}, удалено завершённых строк {removed}")
+
+    async def close(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                await connection.close()
+            except sqlite3.Error:
+                pass
+
+    async def _write(self, operation: str, statements: Iterable[tuple[str, Any]]) -> int:
+        """Выполняет выражения одной транзакцией; (sql, args) или (sql, [args, ...]) для executemany."""
+        started = time.perf_counter()
+        changed = 0
+        async with self._lock:
+            connection = self._connection
+            if connection is None:
+                raise sqlite3.OperationalError("журнал рассылок не открыт")
+            await connection.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, args in statements:
+                    if isinstance(args, list):
+                        cursor = await connection.executemany(sql, args)
+                    else:
+                        cursor = await connection.execute(sql, args)
+                    changed += max(cursor.rowcount, 0)
+                await connection.execute("COMMIT")
+            except BaseException:
+                await connection.execute("ROLLBACK")
+                raise
+        OUTBOX_WRITE_SECONDS.observe(time.perf_counter() - started, operation=operation)
+        return changed
+
+    async def add(
+        self,
+        key: str,
+        kind: str,
+        label: str,
+        payload: dict[str, Any],
+        posted_at: float,
+        recipients: list[tuple[int, int]],
+    ) -> int | None:
+        """Записывает рассылку с получателями; id рассылки или None, если ключ уже в журнале."""
+        started = time.perf_counter()
+        async with self._lock:
+            connection = self._connection
+            if connection is None:
+                raise sqlite3.OperationalError("журнал рассылок не открыт")
+            await connection.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = await connection.execute(
+                    SQL_ADD_BROADCAST, (key, kind, label, json_codec.dumps(payload), posted_at)
+                )
+                if cursor.rowcount == 0:
+                    await connection.execute("ROLLBACK")
+                    OUTBOX_DUPLICATES.inc()
+                    return None
+                broadcast_id = cursor.lastrowid
+                await connection.executemany(
+                    SQL_ADD_DELIVERY, [(broadcast_id, user_id, priority) for user_id, priority in recipients]
+                )
+                await connection.execute("COMMIT")
+            except BaseException:
+                await connection.execute("ROLLBACK")
+                raise
+        OUTBOX_WRITE_SECONDS.observe(time.perf_counter() - started, operation="add")
+        return broadcast_id
+
+    async def checkpoint(self, broadcast_id: int, user_id: int, step: int, attempts: int) -> None:
+        """Шаг доставки выполнен: после перезапуска начнём со step."""
+        await self._write("checkpoint", [(SQL_CHECKPOINT, (step, attempts, broadcast_id, user_id))])
+
+    async def complete(self, broadcast_id: int, user_id: int, delivered: bool) -> None:
+        """Итог доставки получателю: больше не доставляется."""
+        status = DELIVERED if delivered else FAILED
+        await self._write("complete", [(SQL_COMPLETE, (status, broadcast_id, user_id))])
+
+    async def finish(self, broadcast_id: int) -> None:
+        """Рассылка завершена: строки получателей удаляются, заголовок остаётся для защиты от дублей."""
+        now = time.time()
+        await self._write(
+            "finish",
+            [
+                (SQL_FINISH, (now, broadcast_id)),
+                ("DELETE FROM deliveries WHERE broadcast_id = ?", (broadcast_id,)),
+                (SQL_DROP_BROADCASTS, (now - self.retention,)),
+            ],
+        )
+
+    async def compact(self) -> int:
+        """Удаляет завершённое (строки получателей и старые заголовки); число удалённых строк."""
+        now = time.time()
+        return await self._write(
+            "compact",
+            [
+                (SQL_CLOSE_DONE, (now,)),
+                (SQL_DROP_DELIVERIES, ()),
+                (SQL_DROP_BROADCASTS, (now - self.retention,)),
+            ],
+        )
+
+    async def pending(self) -> list[PendingBroadcast]:
+        """
+        Незавершённые рассылки с недоставленными получателями. Посты старше
+        resume_max_age не возобновляются: получатели помечаются expired.
+        """
+        expired = await self._write("expire", [(SQL_EXPIRE, (time.time() - self.resume_max_age,))])
+        if expired:
+            logger.info(f"Журнал рассылок: {expired} доставок не возобновлены — пост слишком старый")
+        await self.compact()
+        async with self._lock:
+            broadcasts = {
+                row[0]: PendingBroadcast(row[0], row[1], row[2], json_codec.loads(row[3]), row[4])
+                for row in await self._connection.execute_fetchall(SQL_PENDING_BROADCASTS)
+            }
+            for broadcast_id, user_id, priority, step, attempts in await self._connection.execute_fetchall(
+                SQL_PENDING_DELIVERIES
+            ):
+                if broadcast_id in broadcasts:
+                    broadcasts[broadcast_id].deliveries.append((user_id, priority, step, attempts))
+        return [broadcast for broadcast in broadcasts.values() if broadcast.deliveries]
+
+    async def stats(self) -> dict:
+        async with self._lock:
+            if self._connection is None:
+                return {"open": False}
+            rows = await self._connection.execute_fetchall(
+                "SELECT status, COUNT(*) FROM deliveries GROUP BY status"
+            )
+            (broadcasts,), = await self._connection.execute_fetchall("SELECT COUNT(*) FROM broadcasts")
+        return {"open": True, "broadcasts": broadcasts, **{status: count for status, count in rows}}
+
+
+outbox = Outbox(OUTBOX_DB_PATH, OUTBOX_RETENTION, OUTBOX_RESUME_MAX_AGE)
@@ -0,0 +1,59 @@
+"""Склейка одинаковых одновременных вызовов (singleflight): один вызов — общий результат."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Пока вызов с ключом key выполняется, повторные вызовы с тем же ключом
+    не запускают factory, а ждут результат (или исключение) первого.
+
+    Общий вызов идёт в отдельной задаче с чистым контекстом: дедлайн и отмена
+    того, кто его начал, не передаются остальным. Каждый ждёт через shield в
+    пределах своего дедлайна (его задаёт вызывающий, например deadline.limit);
+    когда не остаётся ни одного ждущего, общий вызов отменяется.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.leaders = 0   # сколько раз factory реально вызывалась
+        self.shared = 0    # сколько вызовов получили чужой результат
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Возвращает (результат, shared), где shared=True — результат чужого вызова."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.create_task(factory(), context=contextvars.Context())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.leaders += 1
+        else:
+            self.shared += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Результат больше никому не нужен
+                    task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Исключение без ждущих не должно попадать в лог как «never retrieved»
+        if not task.cancelled():
+            task.exception()
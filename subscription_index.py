@@ -0,0 +1,170 @@
+"""
+Индекс подписок на уведомления LEGENDS: для каждого режима — множество
+user_id подписчиков в памяти.
+
+Загружается при запуске (все режимы параллельно), дальше по кругу
+обновляется по одному режиму — самому давнему, так что каждый режим
+перечитывается раз в NOTIFICATION_INDEX_REFRESH секунд. Переключение
+подписки в боте (toggle_notification) применяется к индексу сразу.
+На горячем пути (пост в LEGENDS) объединение подписчиков — операции над
+множествами без запросов к API; режим, который ещё не загружен, читается
+из API и сразу попадает в индекс.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Iterable
+
+from api_client import api_get
+from api_models import SubscriberList
+from config import NOTIFICATION_INDEX_REFRESH
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUBSCRIBERS = registry.gauge(
+    "gyozenbot_subscription_index_subscribers", "Подписчиков режима в индексе", ("notification_type",)
+)
+INDEX_AGE_SECONDS = registry.gauge(
+    "gyozenbot_subscription_index_age_seconds",
+    "Возраст данных режима в индексе на момент поста",
+    ("notification_type",),
+)
+INDEX_MISSES = registry.counter(
+    "gyozenbot_subscription_index_misses_total", "Посты, для которых режим пришлось читать из API"
+)
+
+
+class SubscriptionIndex:
+    """Подписчики по режимам уведомлений; обновление — по одному режиму за шаг."""
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.types: list[str] = []
+        self._subscribers: dict[str, set[int]] = {}
+        self._loaded_at: dict[str, float] = {}
+        # Переключения, сделанные во время чтения режима из API: применяются поверх ответа,
+        # чтобы обновление не откатило их к снимку, снятому до переключения
+        self._toggles: dict[str, dict[int, tuple[bool, float]]] = {}
+        self._task: asyncio.Task | None = None
+        self.refreshes = 0
+        self.changes = 0
+
+    def track(self, types: Iterable[str]) -> None:
+        """Режимы, которые держим в индексе (загружаются при start)."""
+        for notification_type in types:
+            if notification_type not in self.types:
+                self.types.append(notification_type)
+
+    async def start(self) -> None:
+        """Запускает загрузку и обновление по кругу в фоне (вызывается при запуске бота)."""
+        if self._task is None:
+            # Чистый контекст: фоновое обновление не наследует дедлайн апдейта
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def subscribers(self, notification_type: str) -> frozenset[int]:
+        """Подписчики режима: из индекса, а если режим не загружен — из API (с записью в индекс)."""
+        if notification_type in self._subscribers:
+            INDEX_AGE_SECONDS.set(
+                time.monotonic() - self._loaded_at[notification_type], notification_type=notification_type
+            )
+            return frozenset(self._subscribers[notification_type])
+        INDEX_MISSES.inc()
+        self.track((notification_type,))
+        await self.refresh(notification_type)
+        return frozenset(self._subscribers.get(notification_type, ()))
+
+    def apply_toggle(self, user_id: int, notification_type: str, enabled: bool) -> None:
+        """Подписка изменена через API — индекс обновляется сразу, не дожидаясь перечитывания."""
+        self._toggles.setdefault(notification_type, {})[user_id] = (enabled, time.monotonic())
+        subscribers = self._subscribers.get(notification_type)
+        if subscribers is None:
+            return
+        if enabled:
+            subscribers.add(user_id)
+        else:
+            subscribers.discard(user_id)
+        INDEX_SUBSCRIBERS.set(len(subscribers), notification_type=notification_type)
+
+    async def refresh(self, notification_type: str) -> bool:
+        """Перечитывает режим из API и применяет разницу. False — не удалось, в индексе прежние данные."""
+        started = time.monotonic()
+        try:
+            # Мимо кэша: индекс сам держит данные и обновляет их по расписанию
+            async with await api_get(
+                f"/api/notifications/{notification_type}", use_bot_token=True, use_cache=False
+            ) as response:
+                if response.status != 200:
+                    logger.warning(f"Индекс подписок: {notification_type} — статус {response.status}")
+                    return False
+                fetched = set(SubscriberList.from_dict(notification_type, await response.json()).subscribers)
+                if response.stale:
+                    # Сохранённый список годится, пока режима нет в индексе, но не вместо свежих данных
+                    if notification_type in self._subscribers:
+                        return False
+                    logger.warning(f"Индекс подписок: {notification_type} — сохранённый список, API недоступен")
+        except Exception as e:
+            logger.warning(f"Индекс подписок: не удалось обновить {notification_type}: {e}")
+            return False
+
+        toggles = self._toggles.get(notification_type, {})
+        for user_id, (enabled, at) in list(toggles.items()):
+            if at >= started:
+                (fetched.add if enabled else fetched.discard)(user_id)
+            else:
+                # Ответ API снят после переключения и уже его учитывает
+                del toggles[user_id]
+
+        previous = self._subscribers.get(notification_type)
+        if previous is None:
+            self._subscribers[notification_type] = fetched
+        else:
+            added, removed = fetched - previous, previous - fetched
+            if added or removed:
+                self.changes += len(added) + len(removed)
+                logger.info(f"Индекс подписок {notification_type}: +{len(added)} −{len(removed)}")
+                previous |= added
+                previous -= removed
+        self._loaded_at[notification_type] = time.monotonic()
+        self.refreshes += 1
+        INDEX_SUBSCRIBERS.set(len(fetched), notification_type=notification_type)
+        return True
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "types": len(self._subscribers),
+            "subscribers": len(set().union(*self._subscribers.values())),
+            "oldest": max((now - at for at in self._loaded_at.values()), default=0.0),
+            "refreshes": self.refreshes,
+            "changes": self.changes,
+        }
+
+    async def _run(self) -> None:
+        # Недоступный при запуске API не задерживает старт: пока режим не загружен,
+        # пост читает его из API сам
+        results = await asyncio.gather(*(self.refresh(t) for t in self.types), return_exceptions=True)
+        stats = self.stats()
+        logger.info(
+            f"Индекс подписок: загружено режимов {sum(r is True for r in results)} из {len(self.types)}, "
+            f"подписчиков {stats['subscribers']}"
+        )
+        while True:
+            # Шаг так, чтобы каждый режим перечитывался раз в refresh_interval
+            await asyncio.sleep(self.refresh_interval / max(1, len(self.types)))
+            if self.types:
+                stalest = min(self.types, key=lambda t: self._loaded_at.get(t, 0.0))
+                await self.refresh(stalest)
+
+
+subscription_index = SubscriptionIndex(NOTIFICATION_INDEX_REFRESH)
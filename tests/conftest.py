@@ -0,0 +1,11 @@
+"""Общая настройка тестов: модули бота лежат в корне репозитория, config.py требует переменные окружения."""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault("BOT_TOKEN", "0:test")
+os.environ.setdefault("AI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
@@ -0,0 +1,133 @@
+"""AIScheduler: общий лимит, раздача слотов по кругу между пользователями, склейка дублей."""
+
+import asyncio
+
+from ai_scheduler import AIScheduler
+
+
+async def _hold(scheduler: AIScheduler, release: asyncio.Event) -> asyncio.Task:
+    """Занимает единственный слот, пока не выставлен release."""
+    task = asyncio.create_task(scheduler.run(0, release.wait))
+    await asyncio.sleep(0)
+    return task
+
+
+def test_slots_are_handed_out_round_robin():
+    async def scenario():
+        scheduler = AIScheduler("test", 1)
+        release = asyncio.Event()
+        holder = await _hold(scheduler, release)
+        order: list[str] = []
+
+        def job(name):
+            async def factory():
+                order.append(name)
+            return factory
+
+        # Пользователь 1 поставил в очередь три запроса раньше, чем 2 и 3 — по одному
+        tasks = [asyncio.create_task(scheduler.run(1, job(f"a{i}"))) for i in range(3)]
+        tasks.append(asyncio.create_task(scheduler.run(2, job("b"))))
+        tasks.append(asyncio.create_task(scheduler.run(3, job("c"))))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["a0", "b", "c", "a1", "a2"]
+
+
+def test_concurrency_never_exceeds_limit():
+    async def scenario():
+        scheduler = AIScheduler("test", 2)
+        active = peak = 0
+
+        async def factory():
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.001)
+            active -= 1
+
+        await asyncio.gather(*(scheduler.run(user % 3, factory) for user in range(12)))
+        return peak, scheduler.stats()
+
+    peak, stats = asyncio.run(scenario())
+    assert peak == 2
+    assert stats == {"active": 0, "queued": 0, "coalesced": 0}
+
+
+def test_queue_positions_follow_round_robin_order():
+    async def scenario():
+        scheduler = AIScheduler("test", 1)
+        release = asyncio.Event()
+        holder = await _hold(scheduler, release)
+        positions: dict[str, list[int]] = {}
+
+        def notifier(name):
+            async def on_position(position):
+                positions.setdefault(name, []).append(position)
+            return on_position
+
+        async def noop():
+            return None
+
+        tasks = [
+            asyncio.create_task(scheduler.run(user, noop, on_position=notifier(name)))
+            for user, name in ((1, "a0"), (1, "a1"), (2, "b"))
+        ]
+        await asyncio.sleep(0.01)
+        snapshot = {name: values[-1] for name, values in positions.items()}
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        return snapshot
+
+    # Второй запрос пользователя 1 пропускает вперёд первый запрос пользователя 2
+    assert asyncio.run(scenario()) == {"a0": 1, "b": 2, "a1": 3}
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = AIScheduler("test", 1)
+        release = asyncio.Event()
+        holder = await _hold(scheduler, release)
+        ran: list[str] = []
+
+        def job(name):
+            async def factory():
+                ran.append(name)
+            return factory
+
+        dropped = asyncio.create_task(scheduler.run(1, job("dropped")))
+        kept = asyncio.create_task(scheduler.run(2, job("kept")))
+        await asyncio.sleep(0)
+        dropped.cancel()
+        await asyncio.sleep(0)
+        queued = scheduler.stats()["queued"]
+        release.set()
+        await asyncio.gather(holder, kept)
+        return ran, queued, scheduler.stats()
+
+    ran, queued, stats = asyncio.run(scenario())
+    assert ran == ["kept"]
+    assert queued == 1
+    assert stats["active"] == 0
+
+
+def test_same_key_is_coalesced_into_one_call():
+    async def scenario():
+        scheduler = AIScheduler("test", 4)
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "ответ"
+
+        results = await asyncio.gather(*(scheduler.run(user, factory, key="вопрос") for user in range(3)))
+        return calls, results, scheduler.stats()["coalesced"]
+
+    calls, results, coalesced = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["ответ"] * 3
+    assert coalesced == 2
@@ -0,0 +1,60 @@
+"""Ответы реплики совпадают с ответами REST API miniapp_api."""
+
+import asyncio
+import json
+import sqlite3
+from pathlib import Path
+
+from api_models import UserInfo
+from api_replica import ReadReplica
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _create_db(path: Path, user: dict) -> None:
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode = WAL")
+    # Колонки не в порядке ответа и со служебными полями, которых в REST нет
+    db.execute(
+        "CREATE TABLE users (balance INTEGER, user_id INTEGER PRIMARY KEY, auth_token TEXT, "
+        "psn_id TEXT, username TEXT, created_at TEXT)"
+    )
+    db.execute(
+        "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)",
+        (user["balance"], user["user_id"], "secret", user["psn_id"], user["username"], "2024-01-01"),
+    )
+    db.commit()
+    db.close()
+
+
+async def _get(path: Path, url: str):
+    replica = ReadReplica(str(path), {"user_info"}, 1)
+    try:
+        return await replica.get(url)
+    finally:
+        await replica.close()
+
+
+def test_user_info_matches_rest(tmp_path):
+    rest = json.loads((FIXTURES / "user_info.json").read_text(encoding="utf-8"))
+    db_path = tmp_path / "miniapp.db"
+    _create_db(db_path, rest)
+
+    response = asyncio.run(_get(db_path, f"/api/user_info/{rest['user_id']}"))
+
+    assert response.status == 200
+    payload = json.loads(response.body)
+    assert payload == rest
+    assert list(payload) == list(rest)
+    assert UserInfo.from_dict(payload) == UserInfo.from_dict(rest)
+
+
+def test_user_info_not_found(tmp_path):
+    rest = json.loads((FIXTURES / "user_info.json").read_text(encoding="utf-8"))
+    db_path = tmp_path / "miniapp.db"
+    _create_db(db_path, rest)
+
+    response = asyncio.run(_get(db_path, "/api/user_info/1"))
+
+    assert response.status == 404
+    assert json.loads(response.body) == {"detail": "User not found"}
@@ -0,0 +1,115 @@
+"""CircuitBreaker: переходы closed → open → half_open → closed/open."""
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемые часы вместо time.monotonic в circuit_breaker."""
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    options = {"window": 10, "min_calls": 4, "failure_ratio": 0.5, "recovery_time": 30.0}
+    return CircuitBreaker("test", **{**options, **kwargs})
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_stays_closed_below_failure_ratio(clock):
+    breaker = _breaker()
+    for ok in (True, True, False, True, False, True):
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_opens_at_failure_ratio_and_rejects(clock):
+    breaker = _breaker()
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_after_recovery_time(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock[0] += 29.9
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 0.1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_half_open_admits_limited_probes(clock):
+    breaker = _breaker(half_open_max=2)
+    _open(breaker)
+    clock[0] += 30
+    assert breaker.allow()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_probe_success_closes(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    # Окно очищено: одна ошибка после восстановления не открывает выключатель
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_probe_failure_reopens_for_full_recovery_time(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_released_probe_frees_the_slot(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock[0] += 30
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_release_probe_is_noop_when_closed(clock):
+    breaker = _breaker()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
@@ -0,0 +1,95 @@
+"""CronSpec: разбор cron-выражений и поиск следующего срабатывания."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from job_scheduler import CronSpec
+
+MSK = timezone(timedelta(hours=3))
+
+
+def test_parses_steps_ranges_and_lists():
+    spec = CronSpec("*/15 9-17 1,15 * 1-5")
+    assert spec.minutes == {0, 15, 30, 45}
+    assert spec.hours == set(range(9, 18))
+    assert spec.days == {1, 15}
+    assert spec.months == set(range(1, 13))
+    assert spec.weekdays == {1, 2, 3, 4, 5}
+
+
+def test_range_with_step():
+    assert CronSpec("10-30/10 * * * *").minutes == {10, 20, 30}
+
+
+@pytest.mark.parametrize("expr", ["0 0 * * 0", "0 0 * * 7"])
+def test_sunday_is_zero_or_seven(expr):
+    assert CronSpec(expr).weekdays == {0}
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        "* * * *",           # четыре поля
+        "* * * * * *",       # шесть полей
+        "60 * * * *",        # минута вне диапазона
+        "* 24 * * *",        # час вне диапазона
+        "* * 0 * *",         # день месяца с нуля
+        "* * * 13 *",        # месяц вне диапазона
+        "* * * * 8",         # день недели вне диапазона
+        "30-10 * * * *",     # диапазон наоборот
+        "a * * * *",         # не число
+    ],
+)
+def test_rejects_invalid_expressions(expr):
+    with pytest.raises(ValueError):
+        CronSpec(expr)
+
+
+def test_next_after_is_strictly_later():
+    spec = CronSpec("30 9 * * *")
+    at = datetime(2024, 5, 10, 9, 30, tzinfo=MSK)
+    assert spec.next_after(at) == datetime(2024, 5, 11, 9, 30, tzinfo=MSK)
+    assert spec.next_after(at - timedelta(seconds=1)) == at
+
+
+def test_next_after_drops_seconds():
+    spec = CronSpec("* * * * *")
+    at = datetime(2024, 5, 10, 9, 30, 59, 999, tzinfo=MSK)
+    assert spec.next_after(at) == datetime(2024, 5, 10, 9, 31, tzinfo=MSK)
+
+
+def test_next_after_rolls_over_year():
+    spec = CronSpec("0 0 1 1 *")
+    assert spec.next_after(datetime(2024, 12, 31, 23, 59, tzinfo=MSK)) == datetime(2025, 1, 1, tzinfo=MSK)
+
+
+def test_day_of_month_or_weekday_when_both_set():
+    # 13-е число или пятница — что раньше (как в классическом cron)
+    spec = CronSpec("0 12 13 * 5")
+    after = datetime(2024, 9, 1, tzinfo=MSK)  # воскресенье
+    assert spec.next_after(after) == datetime(2024, 9, 6, 12, 0, tzinfo=MSK)  # пятница
+    assert spec.next_after(datetime(2024, 9, 12, 13, 0, tzinfo=MSK)) == datetime(2024, 9, 13, 12, 0, tzinfo=MSK)
+
+
+def test_weekday_only():
+    spec = CronSpec("0 8 * * 1")
+    # Среда → ближайший понедельник
+    assert spec.next_after(datetime(2024, 9, 4, 10, 0, tzinfo=MSK)) == datetime(2024, 9, 9, 8, 0, tzinfo=MSK)
+
+
+def test_leap_day():
+    spec = CronSpec("0 0 29 2 *")
+    assert spec.next_after(datetime(2025, 1, 1, tzinfo=MSK)) == datetime(2028, 2, 29, tzinfo=MSK)
+
+
+def test_keeps_timezone():
+    spec = CronSpec("0 9 * * *")
+    result = spec.next_after(datetime(2024, 5, 10, 10, 0, tzinfo=MSK))
+    assert result.tzinfo is MSK
+    assert result == datetime(2024, 5, 11, 6, 0, tzinfo=timezone.utc)
+
+
+def test_never_matching_expression_raises():
+    with pytest.raises(ValueError):
+        CronSpec("0 0 30 2 *").next_after(datetime(2024, 1, 1, tzinfo=MSK))
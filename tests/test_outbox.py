@@ -0,0 +1,153 @@
+"""Журнал рассылок: переживает падение посреди рассылки и продолжает с сохранённого шага."""
+
+import asyncio
+import time
+
+from broadcast import BroadcastEngine
+from outbox import Outbox
+
+KEY = "legends:-100:1"
+PAYLOAD = {"chat_id": -100, "message_id": 1}
+
+
+def _outbox(path, **kwargs) -> Outbox:
+    options = {"retention": 3600, "resume_max_age": 3600}
+    return Outbox(str(path), **{**options, **kwargs})
+
+
+class FakeBot:
+    """Заглушка Telegram: записывает вызовы; шаг blocked_on не завершается никогда (бот «падает» на нём)."""
+
+    def __init__(self, blocked_on: tuple[int, str] | None = None):
+        self.calls: list[tuple[int, str]] = []
+        self.blocked_on = blocked_on
+        self.blocked = asyncio.Event()
+
+    async def call(self, user_id: int, method: str) -> None:
+        if (user_id, method) == self.blocked_on:
+            self.blocked.set()
+            await asyncio.Event().wait()
+        self.calls.append((user_id, method))
+
+
+def _steps(bot: FakeBot, user_id: int, payload: dict):
+    return [lambda: bot.call(user_id, "forward"), lambda: bot.call(user_id, "buttons")]
+
+
+def _engine(journal: Outbox) -> BroadcastEngine:
+    engine = BroadcastEngine(1e6, 1000, workers=1, max_attempts=3, outbox=journal)
+    engine.register("legends", _steps)
+    return engine
+
+
+def test_add_rejects_duplicate_key(tmp_path):
+    async def scenario():
+        journal = _outbox(tmp_path / "outbox.db")
+        await journal.open()
+        first = await journal.add(KEY, "legends", "post", PAYLOAD, time.time(), [(1, 0), (2, 1)])
+        second = await journal.add(KEY, "legends", "post", PAYLOAD, time.time(), [(3, 0)])
+        pending = await journal.pending()
+        await journal.close()
+        return first, second, pending
+
+    first, second, pending = asyncio.run(scenario())
+    assert first is not None
+    assert second is None
+    assert len(pending) == 1
+    assert sorted(pending[0].deliveries) == [(1, 0, 0, 0), (2, 1, 0, 0)]
+
+
+def test_checkpoints_survive_reopen(tmp_path):
+    path = tmp_path / "outbox.db"
+
+    async def crash():
+        journal = _outbox(path)
+        await journal.open()
+        bid = await journal.add(KEY, "legends", "post", PAYLOAD, time.time(), [(1, 0), (2, 0), (3, 1)])
+        await journal.checkpoint(bid, 1, 1, 2)
+        await journal.complete(bid, 2, delivered=True)
+        # Падение: ни finish, ни аккуратного закрытия рассылки
+        await journal.close()
+
+    async def restart():
+        journal = _outbox(path)
+        await journal.open()
+        pending = await journal.pending()
+        await journal.close()
+        return pending
+
+    asyncio.run(crash())
+    pending = asyncio.run(restart())
+    assert len(pending) == 1
+    assert pending[0].kind == "legends"
+    assert pending[0].payload == PAYLOAD
+    assert sorted(pending[0].deliveries) == [(1, 0, 1, 2), (3, 1, 0, 0)]
+
+
+def test_old_posts_are_not_resumed(tmp_path):
+    async def scenario():
+        journal = _outbox(tmp_path / "outbox.db", resume_max_age=60)
+        await journal.open()
+        await journal.add(KEY, "legends", "post", PAYLOAD, time.time() - 120, [(1, 0)])
+        pending = await journal.pending()
+        stats = await journal.stats()
+        await journal.close()
+        return pending, stats
+
+    pending, stats = asyncio.run(scenario())
+    assert pending == []
+    # Рассылка без pending закрыта, строки получателей удалены
+    assert stats == {"open": True, "broadcasts": 1}
+
+
+def test_finished_key_blocks_duplicates_until_retention(tmp_path):
+    async def scenario(retention):
+        journal = _outbox(tmp_path / f"outbox-{retention}.db", retention=retention)
+        await journal.open()
+        bid = await journal.add(KEY, "legends", "post", PAYLOAD, time.time(), [(1, 0)])
+        await journal.complete(bid, 1, delivered=True)
+        await journal.finish(bid)
+        await asyncio.sleep(0.01)
+        await journal.compact()
+        again = await journal.add(KEY, "legends", "post", PAYLOAD, time.time(), [(1, 0)])
+        await journal.close()
+        return again
+
+    assert asyncio.run(scenario(3600)) is None
+    assert asyncio.run(scenario(0)) is not None
+
+
+def test_engine_resumes_after_crash_without_repeating_steps(tmp_path):
+    path = tmp_path / "outbox.db"
+    recipients = [(user_id, user_id) for user_id in range(6)]
+
+    async def crash():
+        # Воркер один, приоритет = user_id: доставка идёт строго по порядку
+        bot = FakeBot(blocked_on=(3, "buttons"))
+        engine = _engine(_outbox(path))
+        await engine.submit_durable(bot, "legends", KEY, "post", recipients, PAYLOAD)
+        await asyncio.wait_for(bot.blocked.wait(), 5)
+        await engine.stop()
+        return bot.calls
+
+    async def restart():
+        bot = FakeBot()
+        journal = _outbox(path)
+        engine = _engine(journal)
+        await engine.start(bot)
+        duplicate = await engine.submit_durable(bot, "legends", KEY, "post", recipients, PAYLOAD)
+        await asyncio.wait_for(engine._queue.join(), 5)
+        stats = await journal.stats()
+        await engine.stop()
+        return bot.calls, duplicate, stats
+
+    before = asyncio.run(crash())
+    after, duplicate, stats = asyncio.run(restart())
+
+    assert before == [(u, m) for u in range(3) for m in ("forward", "buttons")] + [(3, "forward")]
+    # Получатель 3 продолжает со второго шага, 0–2 не получают ничего повторно
+    assert after == [(3, "buttons")] + [(u, m) for u in (4, 5) for m in ("forward", "buttons")]
+    # Пост, пришедший повторно, второй рассылки не создаёт
+    assert duplicate is None
+    # Рассылка завершена: строк получателей не осталось, заголовок хранится для защиты от дублей
+    assert stats == {"open": True, "broadcasts": 1}
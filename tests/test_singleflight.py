@@ -0,0 +1,144 @@
+"""SingleFlight: склейка одинаковых вызовов и отмена общего вызова по числу ждущих."""
+
+import asyncio
+
+import pytest
+
+import deadline
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_factory_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        results = await asyncio.gather(*(flight.do("key", factory) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert [result for result, _ in results] == ["ok"] * 5
+    assert sorted(shared for _, shared in results) == [False] + [True] * 4
+    assert (flight.leaders, flight.shared, len(flight)) == (1, 4, 0)
+
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def factory():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        return await asyncio.gather(*(flight.do("key", factory) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_leader_cancellation_does_not_cancel_followers():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def factory():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(flight.do("key", factory))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", factory))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return leader, await follower
+
+    leader, follower_result = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert follower_result == ("done", True)
+
+
+def test_shared_call_is_cancelled_when_last_waiter_leaves():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def factory():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.create_task(flight.do("key", factory)) for _ in range(2)]
+        await started.wait()
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        # Один ждущий остался — общий вызов продолжается
+        still_running = not cancelled.is_set()
+        waiters[1].cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return flight, still_running, waiters
+
+    flight, still_running, waiters = asyncio.run(scenario())
+    assert still_running
+    assert all(waiter.cancelled() for waiter in waiters)
+    assert len(flight) == 0
+
+
+def test_new_call_after_completion_runs_factory_again():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        first = await flight.do("key", factory)
+        second = await flight.do("key", factory)
+        return first, second
+
+    assert asyncio.run(scenario()) == ((1, False), (2, False))
+
+
+def test_leader_deadline_does_not_leak_into_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def factory():
+            # Общий вызов идёт с чистым контекстом: дедлайна ведущего здесь нет
+            return deadline.time_left()
+
+        with deadline.scope(5):
+            return await flight.do("key", factory)
+
+    assert asyncio.run(scenario()) == (None, False)
+
+
+@pytest.mark.parametrize("count", [1, 3])
+def test_waiter_counts_are_released(count):
+    async def scenario():
+        flight = SingleFlight()
+
+        async def factory():
+            await asyncio.sleep(0)
+            return 1
+
+        await asyncio.gather(*(flight.do("key", factory) for _ in range(count)))
+        return flight
+
+    flight = asyncio.run(scenario())
+    assert flight._waiters == {}
@@ -0,0 +1,144 @@
+"""Индекс подписок: загрузка из API, применение разницы, переключения во время чтения."""
+
+import asyncio
+import contextlib
+
+import pytest
+from aiohttp import web
+
+import api_client
+from subscription_index import SubscriptionIndex
+
+
+class NotificationsAPI:
+    """Локальный /api/notifications/{type} на aiohttp: списки подписчиков и задержка ответа по запросу."""
+
+    def __init__(self):
+        self.subscribers: dict[str, list[int]] = {}
+        self.requests = 0
+        self.hold: asyncio.Event | None = None
+        self.received = asyncio.Event()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.received.set()
+        if self.hold is not None:
+            await self.hold.wait()
+        notification_type = request.match_info["notification_type"]
+        if notification_type not in self.subscribers:
+            return web.json_response({"detail": "Unknown notification type"}, status=404)
+        return web.json_response({"subscribers": self.subscribers[notification_type]})
+
+    @contextlib.asynccontextmanager
+    async def serve(self):
+        app = web.Application()
+        app.router.add_get("/api/notifications/{notification_type}", self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        api_client.API_BASE_URL = f"http://127.0.0.1:{port}"
+        try:
+            yield self
+        finally:
+            await api_client.close()
+            await runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def _local_api(monkeypatch):
+    monkeypatch.setattr(api_client, "API_BASE_URL", api_client.API_BASE_URL)
+    monkeypatch.setattr(api_client, "API_TRANSPORT", None)
+    monkeypatch.setattr(api_client.replica, "endpoints", set())
+
+
+def test_unknown_type_is_read_once_then_served_from_memory():
+    async def scenario():
+        api = NotificationsAPI()
+        api.subscribers["legends"] = [1, 2, 3]
+        index = SubscriptionIndex(3600)
+        async with api.serve():
+            first = await index.subscribers("legends")
+            second = await index.subscribers("legends")
+        return api.requests, first, second, index.types
+
+    requests, first, second, types = asyncio.run(scenario())
+    assert requests == 1
+    assert first == second == frozenset({1, 2, 3})
+    assert types == ["legends"]
+
+
+def test_refresh_applies_difference():
+    async def scenario():
+        api = NotificationsAPI()
+        api.subscribers["legends"] = [1, 2, 3]
+        index = SubscriptionIndex(3600)
+        async with api.serve():
+            await index.refresh("legends")
+            api.subscribers["legends"] = [2, 3, 4, 5]
+            ok = await index.refresh("legends")
+            current = await index.subscribers("legends")
+        return ok, current, index.changes
+
+    ok, current, changes = asyncio.run(scenario())
+    assert ok
+    assert current == frozenset({2, 3, 4, 5})
+    assert changes == 3
+
+
+def test_failed_refresh_keeps_previous_data():
+    async def scenario():
+        api = NotificationsAPI()
+        api.subscribers["legends"] = [1, 2]
+        index = SubscriptionIndex(3600)
+        async with api.serve():
+            await index.refresh("legends")
+            del api.subscribers["legends"]
+            ok = await index.refresh("legends")
+            current = await index.subscribers("legends")
+        return ok, current
+
+    ok, current = asyncio.run(scenario())
+    assert not ok
+    assert current == frozenset({1, 2})
+
+
+def test_toggle_during_refresh_is_not_rolled_back():
+    async def scenario():
+        api = NotificationsAPI()
+        api.subscribers["legends"] = [1, 2]
+        index = SubscriptionIndex(3600)
+        async with api.serve():
+            await index.refresh("legends")
+            # Переключение до начала чтения: ответ API его уже учитывает
+            index.apply_toggle(1, "legends", enabled=False)
+            api.subscribers["legends"] = [2]
+            api.hold, api.received = asyncio.Event(), asyncio.Event()
+            refresh = asyncio.create_task(index.refresh("legends"))
+            await api.received.wait()
+            # Переключения во время чтения: снимок API их ещё не видит
+            index.apply_toggle(7, "legends", enabled=True)
+            index.apply_toggle(2, "legends", enabled=False)
+            api.hold.set()
+            await refresh
+            current = await index.subscribers("legends")
+        return current
+
+    assert asyncio.run(scenario()) == frozenset({7})
+
+
+def test_toggle_before_load_is_applied_on_first_read():
+    async def scenario():
+        api = NotificationsAPI()
+        api.subscribers["legends"] = [1]
+        index = SubscriptionIndex(3600)
+        async with api.serve():
+            api.hold, api.received = asyncio.Event(), asyncio.Event()
+            read = asyncio.create_task(index.subscribers("legends"))
+            await api.received.wait()
+            index.apply_toggle(5, "legends", enabled=True)
+            api.hold.set()
+            return await read
+
+    assert asyncio.run(scenario()) == frozenset({1, 5})